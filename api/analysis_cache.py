@@ -0,0 +1,120 @@
+# Cache of finished contract analyses, keyed by what actually determines the model output
+# Re-clicking Analyze, refreshing, or submitting a shared template skips the OpenAI call entirely
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+try:
+    from api.openai_adapter import ANALYSIS_MODEL, ANALYSIS_PROMPT_VERSION
+except ImportError:
+    from openai_adapter import ANALYSIS_MODEL, ANALYSIS_PROMPT_VERSION
+
+ANALYSIS_CACHE_TTL_SECONDS = int(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", "86400"))
+# Oldest entries are evicted once the cache holds more than this many results
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "1000"))
+
+# Used when Redis isn't configured (local dev); holds (expires_at, result)
+_local_cache: "OrderedDict[str, tuple]" = OrderedDict()
+
+
+def normalize_contract_text(text: str) -> str:
+    """Collapse whitespace so re-pasted or re-extracted copies of a contract hash the same"""
+    return " ".join(text.split())
+
+
+def analysis_cache_key(prefix: str, text: str, questions: Optional[List[str]] = None) -> str:
+    """Cache key from normalized text, sorted questions, model and prompt version"""
+    fingerprint = json.dumps({
+        "text": normalize_contract_text(text),
+        "questions": sorted(q.strip() for q in (questions or []) if q and q.strip()),
+        "model": ANALYSIS_MODEL,
+        "prompt": ANALYSIS_PROMPT_VERSION,
+    }, sort_keys=True)
+    digest = hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+    return f"{prefix}:cache:analysis:{digest}"
+
+
+def _index_key(key: str) -> str:
+    # Sorted set of cached keys by insert time, used for size-bounded eviction
+    return key.rsplit(":", 1)[0] + ":index"
+
+
+async def get_cached_analysis(redis, key: str) -> Optional[Dict[str, Any]]:
+    """Return a cached analysis result, or None on a miss (cache errors count as a miss)"""
+    if not redis:
+        entry = _local_cache.get(key)
+        if not entry:
+            return None
+        expires_at, result = entry
+        if expires_at < time.time():
+            _local_cache.pop(key, None)
+            return None
+        _local_cache.move_to_end(key)
+        return result
+
+    try:
+        cached = await redis.get(key)
+        if not cached:
+            return None
+        return json.loads(cached) if isinstance(cached, str) else cached
+    except Exception as e:
+        print(f"Analysis cache read failed: {e}")
+        return None
+
+
+async def store_analysis(redis, key: str, result: Dict[str, Any]):
+    """Cache a successful analysis result, evicting the oldest entries past the size limit"""
+    if not result or result.get("error") or "clauses" not in result:
+        return
+
+    if not redis:
+        _local_cache[key] = (time.time() + ANALYSIS_CACHE_TTL_SECONDS, result)
+        _local_cache.move_to_end(key)
+        while len(_local_cache) > ANALYSIS_CACHE_MAX_ENTRIES:
+            _local_cache.popitem(last=False)
+        return
+
+    try:
+        index_key = _index_key(key)
+        # Write + index + size check in one round trip
+        _, _, size = await (
+            redis.pipeline()
+            .set(key, json.dumps(result), ex=ANALYSIS_CACHE_TTL_SECONDS)
+            .zadd(index_key, {key: time.time()})
+            .zcard(index_key)
+            .execute()
+        )
+        overflow = size - ANALYSIS_CACHE_MAX_ENTRIES
+        if overflow > 0:
+            evicted = [member for member, _ in await redis.zpopmin(index_key, overflow)]
+            if evicted:
+                await redis.delete(*evicted)
+    except Exception as e:
+        print(f"Analysis cache write failed: {e}")
+
+
+async def iter_cached_analysis_events(result: Dict[str, Any]) -> AsyncGenerator[Dict[str, Any], None]:
+    """Replay a cached result as the same events analyze_contract_stream would yield"""
+    clauses = result.get("clauses", [])
+    total = len(clauses)
+
+    yield {"type": "status", "data": {"status": "streaming", "message": "Loaded previous analysis..."}}
+    for i, clause in enumerate(clauses):
+        yield {
+            "type": "progress",
+            "data": {"current": i + 1, "total": total, "message": f"Analyzing {clause.get('title', 'clause')}..."}
+        }
+        yield {"type": "clause", "data": clause}
+    yield {
+        "type": "summary",
+        "data": {
+            "overallRisk": result.get("overallRisk", "medium"),
+            "summary": result.get("summary", "Analysis complete."),
+            "totalClauses": total,
+            "cached": True
+        }
+    }
+    yield {"type": "complete", "data": {"status": "done"}}
@@ -0,0 +1,107 @@
+# Benchmark: bytes saved and encode/decode cost of the Redis value codec (cache_codec.py)
+# Usage: python -m api.benchmarks.cache_compression [file ...]
+# Without files, runs on synthetic extracted contract text, a job result and negotiation tips.
+# No Redis needed: this measures what is sent over the wire and the CPU added per GET/SET.
+import json
+import random
+import sys
+import time
+import zlib
+
+try:
+    from api import cache_codec
+    from api.cache_codec import decode_value, encode_value
+except ImportError:
+    import cache_codec
+    from cache_codec import decode_value, encode_value
+
+CLAUSE_TEMPLATES = [
+    "{n}. Term. This Agreement commences on the Effective Date and continues for {years} years unless terminated earlier in accordance with Section {ref}.",
+    "{n}. Payment. Customer shall pay all undisputed invoices within {days} days of receipt. Late amounts accrue interest at {rate}% per month.",
+    "{n}. Confidentiality. Each party shall protect the other party's Confidential Information with at least reasonable care and shall not disclose it to any third party except as permitted under Section {ref}.",
+    "{n}. Limitation of Liability. Except for breaches of Section {ref}, neither party's aggregate liability shall exceed the fees paid in the {months} months preceding the claim.",
+    "{n}. Indemnification. Supplier shall defend, indemnify and hold harmless Customer from any third-party claim arising out of Supplier's gross negligence or willful misconduct.",
+    "{n}. Governing Law. This Agreement is governed by the laws of the State of {state}, without regard to its conflict of laws principles.",
+]
+
+
+def sample_contract(clauses: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    lines = ["MASTER SERVICES AGREEMENT", ""]
+    for n in range(1, clauses + 1):
+        lines.append(rng.choice(CLAUSE_TEMPLATES).format(
+            n=n, years=rng.randint(1, 5), ref=rng.randint(1, clauses), days=rng.choice([15, 30, 45, 60]),
+            rate=rng.choice([1, 1.5, 2]), months=rng.choice([6, 12, 24]), state=rng.choice(["Delaware", "New York", "California"]),
+        ))
+    return "\n\n".join(lines)
+
+
+def sample_job_result(text: str) -> str:
+    clauses = [
+        {
+            "id": f"clause-{i}", "type": "liability", "risk": ["low", "medium", "high"][i % 3],
+            "title": paragraph[:40], "originalText": paragraph,
+            "summary": "Caps liability at recent fees.", "whyItMatters": "Limits what you can recover.",
+            "suggestedEdit": "Exclude data breaches from the cap.",
+        }
+        for i, paragraph in enumerate(text.split("\n\n")[1:])
+    ]
+    return json.dumps({"status": "done", "result": {"summary": "Standard services agreement.", "clauses": clauses}})
+
+
+def sample_tips() -> str:
+    return json.dumps({"tips": [
+        {"title": f"Tip {i}", "detail": "Ask for a mutual cap and carve out confidentiality breaches.", "priority": "high"}
+        for i in range(8)
+    ]})
+
+
+def measure(label: str, value: str, iterations: int):
+    raw_bytes = len(value.encode("utf-8"))
+    encoded = encode_value(value)
+    stored_bytes = len(encoded.encode("utf-8"))
+    assert decode_value(encoded) == value
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        encode_value(value)
+    encode_us = (time.perf_counter() - started) / iterations * 1e6
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        decode_value(encoded)
+    decode_us = (time.perf_counter() - started) / iterations * 1e6
+
+    saved = 1 - stored_bytes / raw_bytes
+    print(
+        f"{label:<28} {raw_bytes:>9} B -> {stored_bytes:>9} B  saved {saved:>6.1%}  "
+        f"encode {encode_us:>8.1f} us  decode {decode_us:>7.1f} us"
+    )
+
+
+def main(paths):
+    samples = []
+    if paths:
+        for path in paths:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                samples.append((path[-28:], f.read()))
+    else:
+        contract = sample_contract(300)
+        samples = [
+            ("extracted text (small)", sample_contract(20)),
+            ("extracted text (large)", contract),
+            ("job result", sample_job_result(contract)),
+            ("negotiation tips", sample_tips()),
+            ("job state (queued)", json.dumps({"status": "queued", "id": "job-1"})),
+        ]
+
+    print(
+        f"zlib level {cache_codec.REDIS_COMPRESSION_LEVEL} ({zlib.ZLIB_RUNTIME_VERSION}), "
+        f"threshold {cache_codec.REDIS_COMPRESSION_MIN_BYTES} B\n"
+    )
+    for label, value in samples:
+        measure(label, value, iterations=max(20, 2_000_000 // max(len(value), 1)))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
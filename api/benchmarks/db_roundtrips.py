@@ -0,0 +1,142 @@
+# Benchmark: per-query SET search_path (old db_helper) vs per-connection search_path + prepared statements
+# Usage: DATABASE_URL=postgresql://... python -m api.benchmarks.db_roundtrips [iterations]
+# Inserts one throwaway job and a few messages under a random project id, and deletes them afterwards.
+# Round trips are counted from libpq's protocol trace of the pool's single connection (BEGIN and
+# COMMIT included), not assumed.
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+from dotenv import load_dotenv
+from psycopg import pq
+
+load_dotenv()
+
+try:
+    from api import db_helper
+    from api.db_helper import (
+        init_async_db_pool, close_async_db_pool, get_async_db_connection,
+        execute_query_async, execute_raw_sql_async, execute_insert_async, get_schema
+    )
+    from api.main import JOB_LOOKUP_SQL, MESSAGES_DEFAULT_PAGE_SIZE, MESSAGES_LIST_SQL
+except ImportError:
+    import db_helper
+    from db_helper import (
+        init_async_db_pool, close_async_db_pool, get_async_db_connection,
+        execute_query_async, execute_raw_sql_async, execute_insert_async, get_schema
+    )
+    from main import JOB_LOOKUP_SQL, MESSAGES_DEFAULT_PAGE_SIZE, MESSAGES_LIST_SQL
+
+JOB_STATUS_UPDATE_SQL = "UPDATE jobs SET status = %s, updated_at = NOW() WHERE id = %s"
+
+
+async def legacy_execute(query: str, params: tuple):
+    """What every helper call did before: SET search_path, then the statement (2 round trips)"""
+    async with get_async_db_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(f"SET search_path TO {get_schema()}, public", prepare=False)
+            await cur.execute(query, params, prepare=False)
+            if cur.description:
+                await cur.fetchall()
+
+
+async def current_execute(query: str, params: tuple):
+    await execute_raw_sql_async(query, params, prepare=True)
+
+
+class RoundTripCounter:
+    """Counts request/response exchanges on the pool's only connection from libpq's protocol trace"""
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile(mode="w+")
+
+    async def start(self):
+        async with db_helper._async_db_pool.connection() as conn:
+            self._pgconn = conn.pgconn
+        self._pgconn.trace(self._file.fileno())
+        self._pgconn.set_trace_flags(pq.Trace.SUPPRESS_TIMESTAMPS | pq.Trace.REGRESS_MODE)
+
+    def take(self) -> int:
+        """Round trips since the last call: each run of frontend messages answered by the backend"""
+        self._pgconn.untrace()  # flushes libpq's buffered trace output
+        self._file.seek(0)
+        round_trips, previous = 0, None
+        for line in self._file:
+            direction = line.split("\t", 1)[0]
+            if direction == "B" and previous == "F":
+                round_trips += 1
+            if direction in ("F", "B"):
+                previous = direction
+        self._file.seek(0)
+        self._file.truncate()
+        self._pgconn.trace(self._file.fileno())
+        self._pgconn.set_trace_flags(pq.Trace.SUPPRESS_TIMESTAMPS | pq.Trace.REGRESS_MODE)
+        return round_trips
+
+
+async def run(label: str, execute, workload, iterations: int, counter: RoundTripCounter):
+    # Warm up the pool and (for prepared statements) the connection's statement cache
+    for query, params in workload:
+        await execute(query, params)
+    counter.take()
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for query, params in workload:
+            await execute(query, params)
+    elapsed = time.perf_counter() - started
+
+    queries = iterations * len(workload)
+    print(
+        f"{label:<34} {queries / elapsed:>9.0f} queries/s  "
+        f"{elapsed / queries * 1e6:>7.0f} us/query  "
+        f"{counter.take() / queries:.2f} round trips/query"
+    )
+
+
+async def main(iterations: int):
+    # One connection, so the trace sees every statement
+    db_helper.DB_POOL_MIN_SIZE = db_helper.DB_POOL_MAX_SIZE = 1
+    await init_async_db_pool()
+    await db_helper._async_db_pool.wait()
+    counter = RoundTripCounter()
+    await counter.start()
+    project_id = str(uuid.uuid4())
+    job_id = await execute_insert_async("jobs", {
+        "project_id": project_id, "kind": "benchmark", "status": "queued", "payload": json.dumps({})
+    })
+    for i in range(20):
+        await execute_insert_async("messages", {
+            "project_id": project_id, "role": "user", "content": f"message {i}", "meta": json.dumps({})
+        })
+
+    workload = [
+        (JOB_LOOKUP_SQL, (job_id,)),
+        (MESSAGES_LIST_SQL, (project_id, MESSAGES_DEFAULT_PAGE_SIZE)),
+        (JOB_STATUS_UPDATE_SQL, ("running", job_id)),
+    ]
+    print(f"{iterations} iterations of job lookup + message listing + job status update\n")
+    try:
+        await run("SET search_path per query", legacy_execute, workload, iterations, counter)
+        await run("search_path per conn + prepared", current_execute, workload, iterations, counter)
+        if not db_helper._settings_per_transaction:
+            # What every checkout costs behind the transaction pooler (set_config per transaction)
+            db_helper._settings_per_transaction = True
+            try:
+                await run("set_config per transaction", current_execute, workload, iterations, counter)
+            finally:
+                db_helper._settings_per_transaction = False
+    finally:
+        await execute_raw_sql_async("DELETE FROM messages WHERE project_id = %s", (project_id,))
+        await execute_raw_sql_async("DELETE FROM jobs WHERE id = %s", (job_id,))
+        await close_async_db_pool()
+
+
+if __name__ == "__main__":
+    if not os.getenv("DATABASE_URL"):
+        sys.exit("DATABASE_URL is required")
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
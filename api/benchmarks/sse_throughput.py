@@ -0,0 +1,137 @@
+# Benchmark: SSE serialization and transport throughput (streaming.py)
+# Usage: python -m api.benchmarks.sse_throughput [events]
+# Reports events per second per core (events / CPU seconds of the event-loop thread) and the number of
+# writes, for the old one-write-per-event path and for sse_stream. Each write goes to a real socket
+# (drained by another thread), since per-write syscalls are what batching saves. Best of 3 runs.
+import asyncio
+import json
+import socket
+import sys
+import threading
+import time
+
+try:
+    from api import streaming
+    from api.streaming import encode_sse_event, sse_stream
+except ImportError:
+    import streaming
+    from streaming import encode_sse_event, sse_stream
+
+CLAUSE = {
+    "id": "3f1c2a9e-8d4b-4b1e-9a57-0c2d4e6f8a1b",
+    "type": "liability",
+    "risk": "high",
+    "title": "Limitation of Liability",
+    "originalText": "Except for breaches of Section 9, neither party's aggregate liability shall exceed the fees paid in the twelve months preceding the claim. " * 3,
+    "summary": "Caps damages at one year of fees.",
+    "whyItMatters": "You may not recover the full cost of a data breach.",
+    "suggestedEdit": "Exclude confidentiality and data protection breaches from the cap.",
+}
+PROGRESS = {"current": 12, "total": 40, "message": "Analyzing Limitation of Liability..."}
+
+
+def legacy_format(event_type, data):
+    """format_sse_event before the SSE engine: stdlib json.dumps into a str"""
+    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+def events(count):
+    # A realistic mix: two progress events per clause
+    for i in range(count):
+        yield ("clause", CLAUSE) if i % 3 == 2 else ("progress", PROGRESS)
+
+
+def report(label, count, cpu_seconds, writes=None):
+    rate = count / cpu_seconds if cpu_seconds else float("inf")
+    suffix = f"  {writes:>7} writes" if writes is not None else ""
+    print(f"{label:<44} {rate:>12,.0f} events/s/core{suffix}")
+
+
+def best_of(runs, fn):
+    results = [fn() for _ in range(runs)]
+    return min(results, key=lambda result: result[0])
+
+
+def bench_serialization(count):
+    def legacy():
+        started = time.thread_time()
+        for event_type, data in events(count):
+            legacy_format(event_type, data).encode("utf-8")
+        return time.thread_time() - started, None
+
+    def current():
+        started = time.thread_time()
+        for i, (event_type, data) in enumerate(events(count)):
+            encode_sse_event(event_type, data, i + 1)
+        return time.thread_time() - started, None
+
+    report("serialize: json.dumps (previous)", count, best_of(3, legacy)[0])
+    serializer = "orjson" if streaming.orjson else "stdlib json, orjson not installed"
+    report(f"serialize: encode_sse_event ({serializer})", count, best_of(3, current)[0])
+
+
+class SocketClient:
+    """The response socket: every write is a send() syscall; a thread drains the other end"""
+
+    def __init__(self):
+        self.server, self.peer = socket.socketpair()
+        self._drain = threading.Thread(target=self._read, daemon=True)
+        self._drain.start()
+
+    def _read(self):
+        while self.peer.recv(1 << 20):
+            pass
+
+    def close(self):
+        self.server.close()
+        self._drain.join()
+        self.peer.close()
+
+
+async def consume(body, client: SocketClient, slow_client: bool):
+    writes = 0
+    async for chunk in body:
+        client.server.sendall(chunk)
+        writes += 1
+        if slow_client:
+            # A congested connection: the server yields to the loop while the write drains
+            await asyncio.sleep(0)
+    return writes
+
+
+def bench_transport(count, slow_client: bool):
+    async def source():
+        for i, (event_type, data) in enumerate(events(count)):
+            yield encode_sse_event(event_type, data, i + 1)
+            # The producer awaits between events (log appends, model chunks)
+            await asyncio.sleep(0)
+
+    def run(make_body):
+        async def timed():
+            client = SocketClient()
+            try:
+                started = time.thread_time()
+                writes = await consume(make_body(source()), client, slow_client)
+                return time.thread_time() - started, writes
+            finally:
+                client.close()
+        return asyncio.run(timed())
+
+    client = "slow client" if slow_client else "fast client"
+    cpu, writes = best_of(3, lambda: run(lambda body: body))
+    report(f"transport: one write per event, {client}", count, cpu, writes)
+    for coalesce_ms in (0, 5):
+        cpu, writes = best_of(3, lambda: run(lambda body: sse_stream(body, coalesce_ms=coalesce_ms)))
+        report(f"transport: sse_stream {coalesce_ms}ms window, {client}", count, cpu, writes)
+
+
+def main(count):
+    print(f"{count} events (1 clause : 2 progress)\n")
+    bench_serialization(count)
+    print()
+    bench_transport(count, slow_client=False)
+    bench_transport(count, slow_client=True)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
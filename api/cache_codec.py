@@ -0,0 +1,40 @@
+# Transparent compression of large Redis values (extracted contract text, job results, tips)
+# Compressed values are "<header><base64 of zlib stream>": both Redis backends here exchange text
+# (Upstash REST is JSON, redis-py runs with decode_responses), so the payload must stay a string.
+# Anything without the header is returned unchanged, so values written before compression stay readable.
+import base64
+import binascii
+import os
+import zlib
+from typing import Any
+
+# Values shorter than this (UTF-8 bytes) are stored as-is; 0 disables compression
+REDIS_COMPRESSION_MIN_BYTES = int(os.getenv("REDIS_COMPRESSION_MIN_BYTES", "1024"))
+# zlib level 1-9: 6 is zlib's default balance of ratio and CPU
+REDIS_COMPRESSION_LEVEL = int(os.getenv("REDIS_COMPRESSION_LEVEL", "6"))
+
+# Unit separator + codec + format version; never the start of JSON or extracted document text
+COMPRESSED_HEADER = "\x1fz1:"
+
+
+def encode_value(value: Any) -> Any:
+    """Compress a string value past the size threshold; other values pass through untouched"""
+    if not isinstance(value, str) or REDIS_COMPRESSION_MIN_BYTES <= 0:
+        return value
+    raw = value.encode("utf-8")
+    if len(raw) < REDIS_COMPRESSION_MIN_BYTES:
+        return value
+    encoded = COMPRESSED_HEADER + base64.b64encode(zlib.compress(raw, REDIS_COMPRESSION_LEVEL)).decode("ascii")
+    # Already-compressed or random-looking text can grow once base64 is added
+    return encoded if len(encoded) < len(raw) else value
+
+
+def decode_value(value: Any) -> Any:
+    """Inverse of encode_value; plain (legacy or small) values are returned as stored"""
+    if not isinstance(value, str) or not value.startswith(COMPRESSED_HEADER):
+        return value
+    try:
+        return zlib.decompress(base64.b64decode(value[len(COMPRESSED_HEADER):])).decode("utf-8")
+    except (binascii.Error, zlib.error, UnicodeDecodeError) as e:
+        print(f"Failed to decode compressed cache value: {e}")
+        return None
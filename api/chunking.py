@@ -0,0 +1,118 @@
+# Splitting long contracts into section-aligned chunks and merging per-chunk analyses
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+RISK_ORDER = {"low": 0, "medium": 1, "high": 2}
+
+# A new line that starts a numbered clause or an article/section/schedule heading, e.g.
+# "12. Indemnification", "4.2 Fees", "ARTICLE IV", "Section 7", "Schedule A"
+SECTION_BOUNDARY = re.compile(
+    r"\n(?=[ \t]*(?:"
+    r"(?:ARTICLE|Article|SECTION|Section|SCHEDULE|Schedule|EXHIBIT|Exhibit|ANNEX|Annex)\s+[0-9IVXLCA-Z]+"
+    r"|\d{1,3}(?:\.\d{1,3})*[.)]?\s+[A-Z]"
+    r"))"
+)
+
+
+def _split_oversized(section: str, max_chars: int) -> List[str]:
+    """Split a section that alone exceeds max_chars on paragraph, then line, then hard boundaries"""
+    if len(section) <= max_chars:
+        return [section]
+
+    for separator in ("\n\n", "\n"):
+        parts = section.split(separator)
+        if len(parts) > 1:
+            pieces = []
+            current = ""
+            for part in parts:
+                candidate = f"{current}{separator}{part}" if current else part
+                if len(candidate) <= max_chars:
+                    current = candidate
+                    continue
+                if current:
+                    pieces.append(current)
+                current = part
+            if current:
+                pieces.append(current)
+            return [piece for part in pieces for piece in _split_oversized(part, max_chars)]
+
+    return [section[i:i + max_chars] for i in range(0, len(section), max_chars)]
+
+
+def split_contract(text: str, max_chars: int) -> List[str]:
+    """
+    Split contract text into chunks of at most max_chars, breaking on section headings where possible.
+    No text is dropped: only the line breaks at split points are not carried over.
+    """
+    if len(text) <= max_chars:
+        return [text]
+
+    sections = [s for s in SECTION_BOUNDARY.split(text) if s.strip()]
+    chunks = []
+    current = ""
+    for section in sections:
+        for piece in _split_oversized(section, max_chars):
+            candidate = f"{current}\n{piece}" if current else piece
+            if len(candidate) <= max_chars:
+                current = candidate
+            else:
+                chunks.append(current)
+                current = piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _normalize(value: Optional[str]) -> str:
+    return " ".join((value or "").lower().split())
+
+
+def clause_keys(clause: Dict[str, Any]) -> List[str]:
+    """Keys under which two clauses count as the same finding (same quoted text, or same type and title)"""
+    clause_type = _normalize(clause.get("type"))
+    original_text = _normalize(clause.get("originalText"))[:200]
+    title = _normalize(clause.get("title"))
+    keys = []
+    if original_text:
+        keys.append(f"{clause_type}:text:{original_text}")
+    if title:
+        keys.append(f"{clause_type}:title:{title}")
+    return keys
+
+
+def is_duplicate_clause(clause: Dict[str, Any], seen: Set[str]) -> bool:
+    """Check a clause against the keys seen so far, recording its keys if it is new"""
+    keys = clause_keys(clause)
+    if any(key in seen for key in keys):
+        return True
+    seen.update(keys)
+    return False
+
+
+def merge_clauses(clause_lists: Iterable[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Merge per-chunk clause lists in document order, dropping duplicates.
+    When the same clause is found twice, the higher-risk assessment wins.
+    """
+    merged: List[Dict[str, Any]] = []
+    index_by_key: Dict[str, int] = {}
+
+    for clauses in clause_lists:
+        for clause in clauses:
+            keys = clause_keys(clause)
+            existing = next((index_by_key[k] for k in keys if k in index_by_key), None)
+            if existing is None:
+                index_by_key.update({k: len(merged) for k in keys})
+                merged.append(clause)
+            elif RISK_ORDER.get(clause.get("risk"), 1) > RISK_ORDER.get(merged[existing].get("risk"), 1):
+                merged[existing] = clause
+                index_by_key.update({k: existing for k in keys})
+    return merged
+
+
+def combine_overall_risk(risks: Iterable[Optional[str]]) -> str:
+    """A contract is as risky as its riskiest part"""
+    known = [risk for risk in risks if risk in RISK_ORDER]
+    if not known:
+        return "medium"
+    return max(known, key=RISK_ORDER.__getitem__)
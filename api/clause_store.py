@@ -0,0 +1,110 @@
+# Normalized clause rows (see db/004-clauses.sql) for cross-contract queries
+# Written with the job's other completion writes; queried with filters and aggregates in SQL
+import hashlib
+from typing import Any, Dict, List, Optional
+
+try:
+    from api.db_helper import UnitOfWork, execute_query_async
+    from api.chunking import RISK_ORDER
+except ImportError:
+    from db_helper import UnitOfWork, execute_query_async
+    from chunking import RISK_ORDER
+
+CLAUSE_COLUMNS = """
+    id, job_id, project_id, position, clause_key, type, risk, title, original_text,
+    summary, why_it_matters, suggested_edit, text_hash, created_at
+"""
+
+
+def clause_text_hash(text: Optional[str]) -> Optional[str]:
+    """Hash of the clause text ignoring case and whitespace, so re-extracted copies match"""
+    normalized = " ".join((text or "").lower().split())
+    if not normalized:
+        return None
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def clause_row(job_id: str, project_id: str, position: int, clause: Dict[str, Any]) -> Dict[str, Any]:
+    risk = (clause.get("risk") or "").strip().lower()
+    return {
+        "job_id": job_id,
+        "project_id": project_id,
+        "position": position,
+        "clause_key": clause.get("id"),
+        "type": (clause.get("type") or "other").strip().lower() or "other",
+        # Model output isn't constrained; keep the column to the three known levels
+        "risk": risk if risk in RISK_ORDER else "medium",
+        "title": clause.get("title"),
+        "original_text": clause.get("originalText"),
+        "summary": clause.get("summary"),
+        "why_it_matters": clause.get("whyItMatters"),
+        "suggested_edit": clause.get("suggestedEdit"),
+        "text_hash": clause_text_hash(clause.get("originalText")),
+    }
+
+
+def add_clauses(unit: UnitOfWork, job_id: str, project_id: str, clauses: List[Dict[str, Any]]):
+    """
+    Replace a job's clause rows as part of its completion unit of work (one multi-row INSERT).
+    Deleting first keeps a retried or re-claimed job from writing its clauses twice.
+    """
+    unit.execute("DELETE FROM clauses WHERE job_id = %s", (job_id,), prepare=True)
+    for position, clause in enumerate(clauses or []):
+        if isinstance(clause, dict):
+            unit.insert("clauses", clause_row(job_id, project_id, position, clause))
+
+
+async def query_clauses(
+    project_id: str,
+    clause_type: Optional[str] = None,
+    risk: Optional[str] = None,
+    text_hash: Optional[str] = None,
+    job_id: Optional[str] = None,
+    limit: int = 100
+) -> List[Dict[str, Any]]:
+    """Clauses in a project, newest analyses first, optionally filtered by type/risk/text/job"""
+    conditions = ["project_id = %s"]
+    params: List[Any] = [project_id]
+    for column, value in (("type", clause_type), ("risk", risk), ("text_hash", text_hash), ("job_id", job_id)):
+        if value:
+            conditions.append(f"{column} = %s")
+            params.append(value.strip().lower() if column in ("type", "risk") else value)
+    params.append(limit)
+    return await execute_query_async(
+        f"SELECT {CLAUSE_COLUMNS} FROM clauses WHERE {' AND '.join(conditions)} "
+        "ORDER BY created_at DESC, job_id, position LIMIT %s",
+        tuple(params)
+    )
+
+
+async def clause_stats(project_id: str) -> Dict[str, Any]:
+    """Clause counts per type and risk level, plus clause texts that recur across contracts"""
+    by_type = await execute_query_async(
+        """
+        SELECT type,
+               COUNT(*) AS total,
+               COUNT(*) FILTER (WHERE risk = 'high') AS high,
+               COUNT(*) FILTER (WHERE risk = 'medium') AS medium,
+               COUNT(*) FILTER (WHERE risk = 'low') AS low,
+               COUNT(DISTINCT job_id) AS contracts
+        FROM clauses WHERE project_id = %s
+        GROUP BY type ORDER BY high DESC, total DESC
+        """,
+        (project_id,),
+        prepare=True
+    )
+    recurring = await execute_query_async(
+        """
+        SELECT text_hash, MIN(type) AS type, MIN(title) AS title,
+               COUNT(DISTINCT job_id) AS contracts,
+               (ARRAY['low', 'medium', 'high'])[
+                   MAX(CASE risk WHEN 'high' THEN 3 WHEN 'medium' THEN 2 ELSE 1 END)
+               ] AS max_risk
+        FROM clauses WHERE project_id = %s AND text_hash IS NOT NULL
+        GROUP BY text_hash HAVING COUNT(DISTINCT job_id) > 1
+        ORDER BY contracts DESC LIMIT 20
+        """,
+        (project_id,),
+        prepare=True
+    )
+    return {"byType": by_type, "recurring": recurring}
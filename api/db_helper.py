@@ -3,17 +3,71 @@
 import psycopg2
 import psycopg2.pool
 from psycopg2.extras import RealDictCursor
-from typing import Optional, Dict, Any, List
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+from typing import Optional, Dict, Any, List, Tuple
+import asyncio
 import os
 import json
-from contextlib import contextmanager
+from contextlib import contextmanager, asynccontextmanager
+from functools import lru_cache
+from urllib.parse import urlparse
+
+# Pool sizing is per process (API worker or job worker)
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+# How long a request waits for a free connection before failing instead of queueing forever
+DB_POOL_ACQUIRE_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT_SECONDS", "5"))
+# Server-side cap on any single statement (0 disables)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+# Server-side prepared statements: "auto" (default) enables them only for direct connections, since a
+# transaction-mode pooler (Supabase/Supavisor or pgbouncer on :6543) can't keep them across transactions
+DB_PREPARED_STATEMENTS = os.getenv("DB_PREPARED_STATEMENTS", "auto").lower()
+# Write-behind: persist() queues units of work and a background task commits them in batches
+DB_WRITE_BEHIND = os.getenv("DB_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+DB_WRITE_BEHIND_MAX_BATCH = int(os.getenv("DB_WRITE_BEHIND_MAX_BATCH", "50"))
+DB_WRITE_BEHIND_INTERVAL_MS = int(os.getenv("DB_WRITE_BEHIND_INTERVAL_MS", "50"))
 
 # Connection pool for database queries
 _db_pool: Optional[psycopg2.pool.SimpleConnectionPool] = None
+# Async pool used from request handlers and the job worker so queries don't block the event loop
+_async_db_pool: Optional[AsyncConnectionPool] = None
+
+# Set when the pools are opened: behind a transaction-mode pooler the settings are applied per transaction
+_settings_per_transaction = False
+
+def _connection_options() -> str:
+    # Applied by the server when the connection is opened, so queries never need a SET round trip
+    return f"-c search_path={get_schema()},public -c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+
+# Transaction-scoped fallback: a transaction-mode pooler hands each transaction a different server
+# connection and doesn't reliably pass startup options through, so they are set again on every checkout
+SESSION_SETTINGS_SQL = "SELECT set_config('search_path', %s, true), set_config('statement_timeout', %s, true)"
+
+def _session_settings() -> tuple:
+    return (f"{get_schema()}, public", str(DB_STATEMENT_TIMEOUT_MS))
+
+def behind_transaction_pooler(db_url: str) -> bool:
+    """Whether db_url points at a transaction-mode pooler (Supabase/Supavisor or pgbouncer on :6543)"""
+    parsed = urlparse(db_url)
+    try:
+        port = parsed.port
+    except ValueError:
+        port = None
+    return port == 6543 or "pooler" in (parsed.hostname or "")
+
+def prepared_statements_enabled(db_url: str) -> bool:
+    if DB_PREPARED_STATEMENTS != "auto":
+        return DB_PREPARED_STATEMENTS in ("1", "true", "yes")
+    return not behind_transaction_pooler(db_url)
+
+def _connection_kwargs(db_url: str) -> Dict[str, Any]:
+    """Startup options for direct connections; none behind the pooler (settings go per transaction)"""
+    return {} if behind_transaction_pooler(db_url) else {"options": _connection_options()}
 
 def init_db_pool():
     """Initialize the database connection pool"""
-    global _db_pool
+    global _db_pool, _settings_per_transaction
     
     # Get PostgreSQL connection string from env
     # Supabase provides this in Settings → Database → Connection string
@@ -26,15 +80,18 @@ def init_db_pool():
         return
     
     try:
-        # Create connection pool (min 1, max 10 connections)
-        _db_pool = psycopg2.pool.SimpleConnectionPool(1, 10, db_url)
+        _settings_per_transaction = behind_transaction_pooler(db_url)
+        _db_pool = psycopg2.pool.SimpleConnectionPool(
+            DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, db_url, **_connection_kwargs(db_url)
+        )
         print("Database connection pool initialized")
     except Exception as e:
         print(f"Failed to initialize database pool: {e}")
         _db_pool = None
 
+@lru_cache(maxsize=None)
 def get_schema() -> str:
-    """Get the schema name from environment"""
+    """Get the schema name from environment (read once; call after load_dotenv)"""
     return os.getenv("SUPABASE_SCHEMA", "contractcoach")
 
 @contextmanager
@@ -49,6 +106,9 @@ def get_db_connection():
     
     conn = _db_pool.getconn()
     try:
+        if _settings_per_transaction:
+            with conn.cursor() as cur:
+                cur.execute(SESSION_SETTINGS_SQL, _session_settings())
         yield conn
         conn.commit()
     except Exception as e:
@@ -61,15 +121,11 @@ def execute_query(query: str, params: Optional[tuple] = None) -> List[Dict[str,
     """Execute a SELECT query and return results as list of dicts
     Table names in query should be unqualified (no schema prefix) as search_path is set
     """
-    schema = get_schema()
-    
     if params is None:
         params = ()
     
     with get_db_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            # Set search_path to use the schema first, then public as fallback
-            cur.execute(f"SET search_path TO {schema}, public")
             cur.execute(query, params)
             if cur.description:
                 return [dict(row) for row in cur.fetchall()]
@@ -115,14 +171,11 @@ def execute_raw_sql(query: str, params: Optional[tuple] = None) -> Any:
     """Execute raw SQL query (use with caution)
     Returns list of dicts for SELECT, rowcount for UPDATE/INSERT/DELETE
     """
-    schema = get_schema()
-    
     if params is None:
         params = ()
     
     with get_db_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(f"SET search_path TO {schema}, public")
             cur.execute(query, params)
             conn.commit()
             if cur.description:
@@ -132,3 +185,285 @@ def execute_raw_sql(query: str, params: Optional[tuple] = None) -> Any:
                 # UPDATE/INSERT/DELETE - return rowcount
                 return cur.rowcount
 
+
+
+# ============================================
+# ASYNC VARIANTS (psycopg 3)
+# Same signatures and return shapes as the sync helpers above
+# ============================================
+
+async def init_async_db_pool():
+    """Open the async connection pool (call from the running event loop)"""
+    global _async_db_pool, _settings_per_transaction
+    if _async_db_pool:
+        return
+
+    db_url = os.getenv("DATABASE_URL")
+    if not db_url:
+        print("Warning: DATABASE_URL not set. Async database pool not initialized.")
+        return
+
+    pool = AsyncConnectionPool(
+        db_url,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        timeout=DB_POOL_ACQUIRE_TIMEOUT_SECONDS,
+        kwargs={
+            **_connection_kwargs(db_url),
+            # None disables preparing entirely, including prepare=True
+            "prepare_threshold": 5 if prepared_statements_enabled(db_url) else None,
+        },
+        open=False,
+    )
+    try:
+        # Don't block startup on the database; connections are filled in the background
+        await pool.open(wait=False)
+        _settings_per_transaction = behind_transaction_pooler(db_url)
+        _async_db_pool = pool
+        print("Async database connection pool initialized")
+    except Exception as e:
+        print(f"Failed to initialize async database pool: {e}")
+
+async def close_async_db_pool():
+    global _async_db_pool
+    if _async_db_pool:
+        pool, _async_db_pool = _async_db_pool, None
+        await pool.close()
+
+@asynccontextmanager
+async def get_async_db_connection():
+    """Async context manager for pooled connections (commits on success, rolls back on error)"""
+    if not _async_db_pool:
+        await init_async_db_pool()
+
+    if not _async_db_pool:
+        raise Exception("Database pool not initialized. Set DATABASE_URL environment variable.")
+
+    # Raises psycopg_pool.PoolTimeout after DB_POOL_ACQUIRE_TIMEOUT_SECONDS
+    async with _async_db_pool.connection() as conn:
+        if _settings_per_transaction:
+            # Opens the transaction the pool commits on exit; never prepared, so it works behind any pooler
+            await conn.execute(SESSION_SETTINGS_SQL, _session_settings(), prepare=False)
+        yield conn
+
+async def execute_query_async(query: str, params: Optional[tuple] = None, prepare: Optional[bool] = None) -> List[Dict[str, Any]]:
+    """Async execute_query
+    prepare=True uses a server-side prepared statement from the first call (cached per connection);
+    pass it for fixed hot queries. None leaves it to psycopg's prepare threshold.
+    """
+    async with get_async_db_connection() as conn:
+        async with conn.cursor(row_factory=dict_row) as cur:
+            await cur.execute(query, params or (), prepare=prepare)
+            if cur.description:
+                return await cur.fetchall()
+            return []
+
+async def execute_insert_async(table: str, data: Dict[str, Any]) -> str:
+    """Async execute_insert"""
+    schema = get_schema()
+    columns = ", ".join([f'"{k}"' for k in data.keys()])
+    placeholders = ", ".join(["%s"] * len(data))
+    query = f'INSERT INTO "{schema}"."{table}" ({columns}) VALUES ({placeholders}) RETURNING id'
+
+    async with get_async_db_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(query, tuple(data.values()))
+            row_id = (await cur.fetchone())[0]
+            return str(row_id)
+
+async def execute_update_async(table: str, data: Dict[str, Any], where_clause: str, where_params: tuple) -> int:
+    """Async execute_update"""
+    schema = get_schema()
+    set_clause = ", ".join([f'"{k}" = %s' for k in data.keys()])
+    query = f'UPDATE "{schema}"."{table}" SET {set_clause} WHERE {where_clause}'
+
+    async with get_async_db_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(query, tuple(data.values()) + where_params)
+            return cur.rowcount
+
+async def execute_raw_sql_async(query: str, params: Optional[tuple] = None, prepare: Optional[bool] = None) -> Any:
+    """Async execute_raw_sql (see execute_query_async for prepare)"""
+    async with get_async_db_connection() as conn:
+        async with conn.cursor(row_factory=dict_row) as cur:
+            await cur.execute(query, params or (), prepare=prepare)
+            if cur.description:
+                return await cur.fetchall()
+            return cur.rowcount
+
+
+# ============================================
+# UNIT OF WORK / WRITE-BEHIND
+# ============================================
+
+class UnitOfWork:
+    """
+    Collects inserts and statements and commits them in one transaction, pipelined into a single round trip.
+    Consecutive inserts into the same table with the same columns become one multi-row INSERT.
+    """
+
+    def __init__(self):
+        # ("insert", table, row) or ("sql", query, params, prepare), in the order they were added
+        self._operations: List[tuple] = []
+
+    def __len__(self) -> int:
+        return len(self._operations)
+
+    def insert(self, table: str, data: Dict[str, Any]) -> "UnitOfWork":
+        self._operations.append(("insert", table, data))
+        return self
+
+    def execute(self, query: str, params: Optional[tuple] = None, prepare: Optional[bool] = None) -> "UnitOfWork":
+        """Queue a statement; unqualified table names resolve through the connection's search_path"""
+        self._operations.append(("sql", query, params or (), prepare))
+        return self
+
+    def extend(self, other: "UnitOfWork") -> "UnitOfWork":
+        self._operations.extend(other._operations)
+        return self
+
+    def statements(self) -> List[Tuple[str, tuple, Optional[bool]]]:
+        """The (query, params, prepare) list commit() will send"""
+        schema = get_schema()
+        statements = []
+        i = 0
+        while i < len(self._operations):
+            op = self._operations[i]
+            if op[0] == "sql":
+                statements.append(op[1:])
+                i += 1
+                continue
+
+            table, columns = op[1], list(op[2].keys())
+            rows = []
+            while (i < len(self._operations) and self._operations[i][0] == "insert"
+                   and self._operations[i][1] == table and list(self._operations[i][2].keys()) == columns):
+                rows.append(self._operations[i][2])
+                i += 1
+
+            column_list = ", ".join([f'"{k}"' for k in columns])
+            row_placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+            values = ", ".join([row_placeholders] * len(rows))
+            params = tuple(row[k] for row in rows for k in columns)
+            statements.append((f'INSERT INTO "{schema}"."{table}" ({column_list}) VALUES {values}', params, False))
+        return statements
+
+    async def commit(self):
+        statements = self.statements()
+        if not statements:
+            return
+        async with get_async_db_connection() as conn:
+            # Pipeline mode sends every statement before reading any result; the pooled
+            # connection commits once on exit, or rolls everything back if one fails
+            async with conn.pipeline():
+                async with conn.cursor() as cur:
+                    for query, params, prepare in statements:
+                        await cur.execute(query, params, prepare=prepare)
+        self._operations.clear()
+
+
+class WriteBehindBuffer:
+    """
+    Batches units of work from many concurrent jobs into one transaction per flush.
+    If a merged batch fails, its units are retried one by one so a bad row only fails its own unit.
+    """
+
+    def __init__(self, max_batch: int = DB_WRITE_BEHIND_MAX_BATCH, interval_ms: int = DB_WRITE_BEHIND_INTERVAL_MS):
+        self.max_batch = max_batch
+        self.interval = interval_ms / 1000
+        self._pending: List[Tuple[UnitOfWork, asyncio.Future]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def start(self):
+        if not self._task:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def submit(self, unit: UnitOfWork) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        # Callers may not await it; retrieve the exception so it isn't reported as unhandled
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._pending.append((unit, future))
+        if len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+        return future
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._pending:
+                await self.flush()
+
+    async def flush(self):
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        if not batch:
+            return
+        merged = UnitOfWork()
+        for unit, _ in batch:
+            merged.extend(unit)
+        try:
+            await merged.commit()
+            for _, future in batch:
+                future.set_result(None)
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                print(f"Write-behind flush failed: {e}")
+                batch[0][1].set_exception(e)
+                return
+            print(f"Write-behind batch of {len(batch)} failed, committing individually: {e}")
+
+        for unit, future in batch:
+            try:
+                await unit.commit()
+                future.set_result(None)
+            except Exception as e:
+                print(f"Write-behind flush failed: {e}")
+                future.set_exception(e)
+
+    async def stop(self):
+        """Stop the flush loop and write everything still pending"""
+        if self._task:
+            # Let the loop finish the flush it is in (cancelling it would drop the batch it took
+            # off _pending) and drain the rest before it exits
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        while self._pending:
+            await self.flush()
+
+
+_write_behind: Optional[WriteBehindBuffer] = None
+
+def start_write_behind():
+    """Start the write-behind buffer if DB_WRITE_BEHIND is enabled (call from the running event loop)"""
+    global _write_behind
+    if DB_WRITE_BEHIND and not _write_behind:
+        _write_behind = WriteBehindBuffer()
+        _write_behind.start()
+
+async def stop_write_behind():
+    global _write_behind
+    if _write_behind:
+        buffer, _write_behind = _write_behind, None
+        await buffer.stop()
+
+async def persist(unit: UnitOfWork, wait: bool = False):
+    """
+    Commit a unit of work. With write-behind enabled it is queued for the next batch and this
+    returns immediately; flush errors are only logged. With wait=True it returns once the unit is
+    committed and raises if that fails.
+    """
+    if _write_behind:
+        future = _write_behind.submit(unit)
+        if wait:
+            await future
+        return
+    await unit.commit()
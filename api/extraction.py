@@ -0,0 +1,383 @@
+# Document text extraction (PDF, DOCX, plain text)
+# Parsing is CPU-bound, so it runs in a bounded process pool instead of on the event loop
+import asyncio
+import io
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+try:
+    import docx
+except ImportError:
+    docx = None
+
+logger = logging.getLogger("extraction")
+logger.setLevel(logging.INFO)
+
+PDF_MIME_TYPE = "application/pdf"
+DOCX_MIME_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+# Bump when extraction output changes so content-addressed caches don't serve old text
+EXTRACTOR_VERSION = "2"
+
+# Number of extraction processes (0 = run in a thread instead of a process pool)
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "2"))
+# Parse timeout in seconds, counted from when a worker picks the document up (not time spent queued);
+# for PDFs it is the longest a worker may go without finishing a page
+EXTRACTION_TIMEOUT_SECONDS = float(os.getenv("EXTRACTION_TIMEOUT_SECONDS", "60"))
+# Overall budget for a PDF parsed page by page, so a long document can't hold a worker indefinitely
+EXTRACTION_DOCUMENT_TIMEOUT_SECONDS = float(os.getenv("EXTRACTION_DOCUMENT_TIMEOUT_SECONDS", "300"))
+# Documents larger than this are rejected before parsing
+EXTRACTION_MAX_BYTES = int(os.getenv("EXTRACTION_MAX_BYTES", str(25 * 1024 * 1024)))
+
+
+def iter_document_pages(content: bytes, mime_type: str) -> Iterator[str]:
+    """Yield a document's text one page (PDF) or whole body (DOCX/text) at a time"""
+    if mime_type == PDF_MIME_TYPE:
+        if not PdfReader:
+            yield "[PDF extraction unavailable - install pypdf]"
+            return
+        reader = PdfReader(io.BytesIO(content))
+        for page in reader.pages:
+            yield page.extract_text() or ""
+    elif mime_type == DOCX_MIME_TYPE:
+        if not docx:
+            yield "[Docx extraction unavailable - install python-docx]"
+            return
+        doc = docx.Document(io.BytesIO(content))
+        yield "\n".join(para.text for para in doc.paragraphs)
+    else:
+        # Assume text/plain
+        yield content.decode('utf-8', errors='ignore')
+
+
+def extract_text_from_bytes(content: bytes, mime_type: str) -> str:
+    """Extract plain text from a document synchronously.
+    Runs inside the pool workers, so it must stay a top-level (picklable) function.
+    """
+    try:
+        # Join once at the end instead of growing a string page by page
+        return "\n".join(iter_document_pages(content, mime_type))
+    except Exception as e:
+        print(f"Extraction error: {e}")
+        return f"[Error extracting text: {str(e)}]"
+
+
+def iter_pdf_pages(content: bytes, offset: int = 0) -> Iterator[Tuple[int, str]]:
+    """Yield (total pages, text) for each page from `offset` on (pool worker entry point).
+    The document is parsed once and its pages streamed back, instead of re-parsing it per batch.
+    """
+    reader = PdfReader(io.BytesIO(content))
+    total = len(reader.pages)
+    for i in range(offset, total):
+        yield total, reader.pages[i].extract_text() or ""
+
+
+_pool: Optional["_ExtractionPool"] = None
+_task_ids = itertools.count(1)
+# Set inside pool workers: where they report which process picked up a task
+_worker_events = None
+
+
+def _init_worker(events):
+    global _worker_events
+    _worker_events = events
+
+
+def _run_task(task_id: int, func, args):
+    """Pool worker entry point: report this process's pid, then run the call"""
+    _worker_events.put((task_id, "start", os.getpid()))
+    return func(*args)
+
+
+def _stream_task(task_id: int, func, args):
+    """Pool worker entry point for generators: send each item back as soon as it is produced"""
+    _worker_events.put((task_id, "start", os.getpid()))
+    for item in func(*args):
+        _worker_events.put((task_id, "item", item))
+    _worker_events.put((task_id, "end", None))
+
+
+class _PoolTask:
+    """One call submitted to the pool; learns the pid of the worker running it"""
+
+    def __init__(self):
+        self.id = next(_task_ids)
+        self.loop = asyncio.get_running_loop()
+        self.started = asyncio.Event()
+        self.pid: Optional[int] = None
+        # ("item", value) and ("end", None) from _stream_task
+        self.items: asyncio.Queue = asyncio.Queue()
+
+    def deliver(self, kind: str, value):
+        """Called from the pool's event reader thread"""
+        try:
+            self.loop.call_soon_threadsafe(self._on_event, kind, value)
+        except RuntimeError:
+            # The loop that submitted the task is gone
+            pass
+
+    def _on_event(self, kind: str, value):
+        if kind == "start":
+            self.pid = value
+            self.started.set()
+        else:
+            self.items.put_nowait((kind, value))
+
+
+class _ExtractionPool:
+    """
+    A process pool plus the queue its workers report on. Each pool has its own queue, so a worker
+    killed mid-write can't wedge the queue of the pool that replaces it.
+    """
+
+    def __init__(self, workers: int):
+        # spawn (not fork) so workers don't inherit the server's event loop and sockets
+        context = multiprocessing.get_context("spawn")
+        self.events = context.Queue()
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.events,),
+        )
+        self.tasks: Dict[int, _PoolTask] = {}
+        self.retired = False
+        self._reader = threading.Thread(target=self._read_events, name="extraction-events", daemon=True)
+        self._reader.start()
+
+    def _read_events(self):
+        while not (self.retired and not self.tasks):
+            try:
+                task_id, kind, value = self.events.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            task = self.tasks.get(task_id)
+            if task:
+                task.deliver(kind, value)
+
+    def submit(self, task: _PoolTask, entry, func, args) -> "asyncio.Future":
+        self.tasks[task.id] = task
+        return asyncio.wrap_future(self.executor.submit(entry, task.id, func, args))
+
+    def retire(self, kill_pid: Optional[int] = None):
+        """Stop taking work. Tasks already queued here still run unless kill_pid breaks the pool."""
+        self.retired = True
+        if kill_pid:
+            # ProcessPoolExecutor has no public way to kill a running task. The pool breaks and the
+            # other callers' tasks in it are resubmitted to the replacement pool by _run_in_pool.
+            try:
+                os.kill(kill_pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.executor.shutdown(wait=False)
+
+
+def init_extraction_pool():
+    """Initialize the extraction process pool"""
+    global _pool
+
+    if _pool or EXTRACTION_WORKERS <= 0:
+        return
+
+    _pool = _ExtractionPool(EXTRACTION_WORKERS)
+    logger.info(f"Extraction pool initialized ({EXTRACTION_WORKERS} workers)")
+
+
+def shutdown_extraction_pool(wait: bool = True):
+    """Shut down the extraction process pool"""
+    global _pool
+
+    if _pool:
+        _pool.retired = True
+        _pool.executor.shutdown(wait=wait, cancel_futures=True)
+        _pool = None
+
+
+def _retire_pool(pool: _ExtractionPool, kill_pid: Optional[int] = None):
+    """Take a pool out of service; new calls go to a fresh one. Never touches its replacement."""
+    global _pool
+
+    if _pool is pool:
+        _pool = None
+    pool.retire(kill_pid)
+
+
+async def _wait_started(task: _PoolTask, future: "asyncio.Future"):
+    """Wait until a worker picks the task up (or it fails first)"""
+    started = asyncio.ensure_future(task.started.wait())
+    try:
+        await asyncio.wait({future, started}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        started.cancel()
+    if future.done() and not task.started.is_set():
+        future.result()
+
+
+async def _next_item(task: _PoolTask, future: "asyncio.Future", timeout: float):
+    """The next ("item", value) or ("end", None) of a streaming task; raises if its worker failed"""
+    # Already parsed while the caller was busy: no waiting, so it can't run into a deadline
+    if not task.items.empty():
+        return task.items.get_nowait()
+    getter = asyncio.ensure_future(task.items.get())
+    try:
+        done, _ = await asyncio.wait({getter, future}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if getter in done:
+            return getter.result()
+        if future in done:
+            future.result()
+            # Finished cleanly: its last items are still on their way through the events queue
+            return await asyncio.wait_for(getter, timeout=timeout)
+        raise asyncio.TimeoutError()
+    finally:
+        getter.cancel()
+
+
+async def _run_in_pool(func, *args, timeout: float = EXTRACTION_TIMEOUT_SECONDS):
+    """
+    Run a blocking call in the extraction pool (or a thread if the pool is disabled).
+    Time spent queued behind other documents doesn't count towards `timeout`, only time on a worker.
+    Raises asyncio.TimeoutError if it runs longer than that, BrokenProcessPool if its worker crashed.
+    """
+    init_extraction_pool()
+    if not _pool:
+        return await asyncio.wait_for(asyncio.to_thread(func, *args), timeout=timeout)
+
+    # A second attempt only for pools broken by someone else (a killed stuck worker or a crash)
+    for attempt in range(2):
+        init_extraction_pool()
+        pool = _pool
+        task = _PoolTask()
+        future = None
+        try:
+            future = pool.submit(task, _run_task, func, args)
+            await _wait_started(task, future)
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            # Only the stuck worker is killed; everything else in its pool moves to the replacement
+            _retire_pool(pool, kill_pid=task.pid)
+            raise
+        except BrokenProcessPool:
+            _retire_pool(pool)
+            if attempt:
+                raise
+            logger.warning("Extraction pool broke under a task, resubmitting it")
+        finally:
+            if future:
+                future.cancel()
+            pool.tasks.pop(task.id, None)
+
+
+async def _iter_in_pool(
+    func, *args,
+    timeout: float = EXTRACTION_TIMEOUT_SECONDS,
+    deadline: float = EXTRACTION_DOCUMENT_TIMEOUT_SECONDS,
+) -> AsyncIterator:
+    """
+    Run a generator in one pool worker and yield its items as they arrive. func is called as
+    func(*args, offset) and must skip its first `offset` items, so a resubmitted task resumes
+    where the broken one stopped. Once the task is running, `timeout` bounds the wait for each item
+    and `deadline` the whole run (a resubmitted task keeps the original deadline).
+    """
+    init_extraction_pool()
+    if not _pool:
+        # No streaming without a pool; the thread still keeps parsing off the event loop
+        items = await asyncio.wait_for(asyncio.to_thread(lambda: list(func(*args, 0))), timeout=deadline)
+        for item in items:
+            yield item
+        return
+
+    loop = asyncio.get_running_loop()
+    expires_at = None
+    produced = 0
+    for attempt in range(2):
+        init_extraction_pool()
+        pool = _pool
+        task = _PoolTask()
+        future = None
+        try:
+            future = pool.submit(task, _stream_task, func, args + (produced,))
+            await _wait_started(task, future)
+            if expires_at is None:
+                expires_at = loop.time() + deadline
+            while True:
+                remaining = max(expires_at - loop.time(), 0)
+                kind, value = await _next_item(task, future, min(timeout, remaining))
+                if kind == "end":
+                    return
+                produced += 1
+                yield value
+        except asyncio.TimeoutError:
+            _retire_pool(pool, kill_pid=task.pid)
+            raise
+        except BrokenProcessPool:
+            _retire_pool(pool)
+            if attempt:
+                raise
+            logger.warning("Extraction pool broke under a task, resubmitting it")
+        finally:
+            if future:
+                future.cancel()
+            pool.tasks.pop(task.id, None)
+
+
+async def iter_extracted_pages(content: bytes, mime_type: str) -> AsyncIterator[Tuple[int, int, str]]:
+    """Extract a document page by page without blocking the event loop.
+    Yields (page_number, total_pages, text) in page order as soon as each page is parsed.
+    Raises ValueError if the document is too large, can't be parsed, or parsing times out.
+    """
+    if len(content) > EXTRACTION_MAX_BYTES:
+        raise ValueError(
+            f"Document is too large to extract ({len(content)} bytes, limit {EXTRACTION_MAX_BYTES})"
+        )
+
+    # Plain text only needs a decode, not worth a round trip to another process
+    if mime_type not in (PDF_MIME_TYPE, DOCX_MIME_TYPE):
+        yield 1, 1, extract_text_from_bytes(content, mime_type)
+        return
+
+    try:
+        if mime_type != PDF_MIME_TYPE or not PdfReader:
+            yield 1, 1, await _run_in_pool(extract_text_from_bytes, content, mime_type)
+            return
+
+        # One worker per document: the PDF is shipped and parsed once, other documents keep the
+        # remaining workers, and pages stream back as they are extracted
+        page_number = 0
+        async for total, page_text in _iter_in_pool(iter_pdf_pages, content):
+            page_number += 1
+            yield page_number, total, page_text
+    except asyncio.TimeoutError:
+        limits = f"{EXTRACTION_TIMEOUT_SECONDS:.0f}s per page, {EXTRACTION_DOCUMENT_TIMEOUT_SECONDS:.0f}s per document"
+        logger.error(f"Extraction timed out ({limits}, {len(content)} bytes)")
+        raise ValueError(f"Text extraction timed out ({limits})")
+    except BrokenProcessPool:
+        logger.error("Extraction worker died")
+        raise ValueError("Text extraction failed: worker process crashed")
+    except ValueError:
+        raise
+    except Exception as e:
+        logger.error(f"Extraction error: {e}")
+        raise ValueError(f"Error extracting text: {str(e)}")
+
+
+async def extract_text(content: bytes, mime_type: str) -> str:
+    """Extract a document's full text without blocking the event loop.
+    Raises ValueError if the document is too large or parsing times out.
+    """
+    pages = [page_text async for _, _, page_text in iter_extracted_pages(content, mime_type)]
+    return "\n".join(pages)
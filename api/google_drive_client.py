@@ -84,6 +84,7 @@ def exchange_code_for_tokens(code: str, redirect_uri: str) -> Dict[str, Any]:
 def fetch_file_metadata(file_id: str, access_token: str) -> Dict[str, Any]:
     """
     Fetches metadata for a Google Drive file.
+    md5Checksum is only set for binary files; native Google Docs expose modifiedTime/version instead.
     """
     try:
         creds = Credentials(token=access_token)
@@ -91,7 +92,7 @@ def fetch_file_metadata(file_id: str, access_token: str) -> Dict[str, Any]:
         
         file_metadata = service.files().get(
             fileId=file_id, 
-            fields="id, name, mimeType, size, createdTime"
+            fields="id, name, mimeType, size, createdTime, modifiedTime, version, md5Checksum"
         ).execute()
         
         return file_metadata
@@ -0,0 +1,99 @@
+# Idempotency keys for /agent/run and /agent/run/stream
+# A retried request gets the first request's job back (or its stream replayed) instead of starting
+# another analysis. Clients send an Idempotency-Key header; requests without one are keyed by a hash
+# of their content for a short window, which catches double submits and blind network retries.
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from api.local_cache import LocalTTLCache
+    from api.single_flight import release_lock
+except ImportError:
+    from local_cache import LocalTTLCache
+    from single_flight import release_lock
+
+# How long a client-supplied Idempotency-Key is remembered
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# Identical requests without a key are treated as retries for this long (0 disables)
+IDEMPOTENCY_DERIVED_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_DERIVED_TTL_SECONDS", "60"))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# Used when Redis isn't configured (local dev)
+_local_records = LocalTTLCache(max_entries=2000)
+
+
+def request_fingerprint(project_id: str, input_data: Dict[str, Any]) -> str:
+    """SHA-256 of the request as it affects the analysis (the Drive access token doesn't)"""
+    payload = {key: value for key, value in input_data.items() if key != "accessToken"}
+    canonical = json.dumps({"projectId": project_id, "input": payload}, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def idempotency_key(
+    prefix: str,
+    route: str,
+    project_id: str,
+    header_key: Optional[str],
+    fingerprint: str
+) -> Optional[Tuple[str, int]]:
+    """
+    (Redis key, retention seconds) for a request, or None when it isn't deduplicated.
+    Client keys are scoped to the route and project, so two projects can't collide on the same key.
+    """
+    if header_key:
+        scoped = hashlib.sha256(f"{project_id}\0{header_key}".encode("utf-8")).hexdigest()
+        return f"{prefix}:idem:{route}:key:{scoped}", IDEMPOTENCY_TTL_SECONDS
+    if IDEMPOTENCY_DERIVED_TTL_SECONDS > 0:
+        return f"{prefix}:idem:{route}:content:{fingerprint}", IDEMPOTENCY_DERIVED_TTL_SECONDS
+    return None
+
+
+def _encode(record: Dict[str, Any]) -> str:
+    # Deterministic, so release_idempotency_key can compare it with the stored value
+    return json.dumps(record, sort_keys=True)
+
+
+async def get_idempotent_response(redis, key: str) -> Optional[Dict[str, Any]]:
+    """The response recorded for key, if any (read errors count as a miss)"""
+    if not redis:
+        return _local_records.get(key)
+    try:
+        stored = await redis.get(key)
+    except Exception as e:
+        print(f"Idempotency lookup failed: {e}")
+        return None
+    return json.loads(stored) if isinstance(stored, str) else stored
+
+
+async def claim_idempotency_key(redis, key: str, ttl_seconds: int, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Atomically record the first response for key (SET NX). Returns None if this request is the first,
+    otherwise the response recorded by the request that got there first.
+    """
+    if not redis:
+        existing = _local_records.get(key)
+        if existing is not None:
+            return existing
+        _local_records.set(key, record, ttl_seconds)
+        return None
+    try:
+        if await redis.set(key, _encode(record), nx=True, ex=ttl_seconds):
+            return None
+        stored = await redis.get(key)
+    except Exception as e:
+        # Fail open: a duplicate analysis is better than refusing the request
+        print(f"Idempotency claim failed: {e}")
+        return None
+    # Expired between the two calls: nothing to replay, so this request goes ahead
+    return json.loads(stored) if isinstance(stored, str) else stored
+
+
+async def release_idempotency_key(redis, key: str, record: Dict[str, Any]):
+    """Forget our record after the request failed before creating its job, so a retry can start over"""
+    if not redis:
+        if _local_records.get(key) == record:
+            _local_records.invalidate(key)
+        return
+    await release_lock(redis, key, _encode(record))
@@ -0,0 +1,100 @@
+# Incremental JSON parsing for streamed LLM output
+# Lets analyze_contract_stream emit each clause as soon as the model finishes writing it
+import json
+from typing import Any, Dict, List, Optional, Set
+
+
+class ArrayItemStreamParser:
+    """
+    Finds complete objects inside a top-level array while the JSON document is still arriving.
+
+    Feed it text chunks as they stream in; feed() returns every object in
+    `{"<array_key>": [ {...}, {...} ]}` whose closing brace has been seen since the last call.
+    Anything outside the top-level object (e.g. markdown code fences) is ignored.
+    Each character is scanned once and only the item currently being written is buffered.
+    `emitted` holds the array positions of the items returned so far, so the caller can tell which
+    items of the final document were never streamed (e.g. one that failed to decode mid-stream).
+    """
+
+    def __init__(self, array_key: str = "clauses"):
+        self.array_key = array_key
+        self._chunks: List[str] = []
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._key_chars: Optional[List[str]] = None
+        self._last_key: Optional[str] = None
+        self._array_depth: Optional[int] = None
+        self._item_parts: Optional[List[str]] = None
+        self._item_index = 0
+        self.emitted: Set[int] = set()
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far"""
+        return "".join(self._chunks)
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Append a chunk and return the array items completed by it"""
+        self._chunks.append(chunk)
+        items = []
+        # Start of the current item within this chunk (0 if it began in an earlier chunk)
+        item_from = 0 if self._item_parts is not None else None
+
+        for pos, char in enumerate(chunk):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._key_chars is not None:
+                        self._last_key = "".join(self._key_chars)
+                        self._key_chars = None
+                    continue
+                if self._key_chars is not None:
+                    self._key_chars.append(char)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                # Remember strings directly inside the top-level object, they may be keys
+                self._key_chars = [] if len(self._stack) == 1 else None
+            elif char in "{[":
+                if (
+                    char == "["
+                    and self._array_depth is None
+                    and len(self._stack) == 1
+                    and self._last_key == self.array_key
+                ):
+                    self._array_depth = len(self._stack) + 1
+                    self._item_index = 0
+                elif char == "{" and self._array_depth is not None and len(self._stack) == self._array_depth:
+                    self._item_parts = []
+                    item_from = pos
+                self._stack.append(char)
+            elif char == "," and self._array_depth is not None and len(self._stack) == self._array_depth:
+                self._item_index += 1
+            elif char in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if char == "}" and self._item_parts is not None and len(self._stack) == self._array_depth:
+                    self._item_parts.append(chunk[item_from:pos + 1])
+                    try:
+                        items.append(json.loads("".join(self._item_parts)))
+                        self.emitted.add(self._item_index)
+                    except json.JSONDecodeError:
+                        # Leave it to the final full parse
+                        pass
+                    self._item_parts = None
+                    item_from = None
+                elif char == "]" and self._array_depth is not None and len(self._stack) == self._array_depth - 1:
+                    # Only the first matching array is streamed
+                    self._array_depth = None
+                    self._last_key = None
+
+        if self._item_parts is not None:
+            self._item_parts.append(chunk[item_from:])
+
+        return items
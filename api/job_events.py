@@ -0,0 +1,141 @@
+# Job status push (see db/002-job-events.sql)
+# A single LISTEN connection per process fans Postgres NOTIFYs out to /jobs/{id}/events subscribers
+import asyncio
+import json
+import os
+import select
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import psycopg2
+
+try:
+    from api.db_helper import get_schema, behind_transaction_pooler
+except ImportError:
+    from db_helper import get_schema, behind_transaction_pooler
+
+# Per-subscriber buffer; a job only has a handful of transitions, so this never fills in practice
+SUBSCRIBER_QUEUE_SIZE = 32
+
+
+def listen_url() -> Optional[str]:
+    """
+    Connection string for the LISTEN connection. A transaction-mode pooler hands each transaction to
+    any backend, so notifications would never reach us through it: use DATABASE_DIRECT_URL when set,
+    and don't listen at all when the only URL goes through the pooler.
+    """
+    direct_url = os.getenv("DATABASE_DIRECT_URL")
+    if direct_url:
+        return direct_url
+    db_url = os.getenv("DATABASE_URL")
+    if db_url and behind_transaction_pooler(db_url):
+        print(
+            "WARNING: DATABASE_URL goes through the transaction pooler, which can't deliver NOTIFY. "
+            "Job events are disabled (clients fall back to re-checking job state); "
+            "set DATABASE_DIRECT_URL to a direct or session-mode connection to enable them."
+        )
+        return None
+    return db_url
+
+
+class JobEventHub:
+    """
+    Routes job status notifications to the asyncio queues of the clients watching that job.
+    The LISTEN loop runs in a daemon thread (psycopg2 is blocking) and hands events to the
+    event loop with call_soon_threadsafe.
+    """
+
+    def __init__(self, channel: Optional[str] = None):
+        self.channel = channel
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        # Called with every event, e.g. to invalidate per-process caches of job state
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._url: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.listening = False
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(job_id)
+        if subscribers:
+            subscribers.discard(queue)
+            if not subscribers:
+                self._subscribers.pop(job_id, None)
+
+    def add_listener(self, callback: Callable[[Dict[str, Any]], None]):
+        self._listeners.append(callback)
+
+    def publish(self, event: Dict[str, Any]):
+        """Deliver an event to everyone watching its job (must run on the event loop)"""
+        for callback in self._listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"Job event listener failed: {e}")
+        for queue in list(self._subscribers.get(str(event.get("id")), ())):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Subscribers re-read the job state on every wake-up, so dropping one is harmless
+                pass
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Start the LISTEN thread (no-op without a usable URL; clients then fall back to re-checks)"""
+        if self._thread:
+            return
+        self._url = listen_url()
+        if not self._url:
+            return
+        self._loop = loop
+        # Resolved here rather than at import so .env has been loaded (matches db/002-job-events.sql)
+        self.channel = self.channel or f"{get_schema()}_job_events"
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen, name="job-events-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def _listen(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self._url)
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f'LISTEN "{self.channel}"')
+                self.listening = True
+                backoff = 1.0
+                print(f"Listening for job events on {self.channel}")
+
+                while not self._stop.is_set():
+                    # Wake up periodically to notice stop()
+                    if select.select([conn], [], [], 5.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        try:
+                            event = json.loads(notify.payload)
+                        except json.JSONDecodeError:
+                            continue
+                        self._loop.call_soon_threadsafe(self.publish, event)
+            except Exception as e:
+                print(f"Job event listener error, reconnecting in {backoff:.0f}s: {e}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                self.listening = False
+                if conn:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
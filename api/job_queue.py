@@ -0,0 +1,159 @@
+# Durable job queue on the jobs table (see db/001-job-queue.sql)
+# Jobs survive deploys and crashes, and run in worker processes instead of the web process
+# Every statement here runs on each worker poll or job transition, so all are server-side prepared
+import json
+import os
+import random
+from typing import Any, Dict, List, Optional
+
+from psycopg.rows import dict_row
+
+try:
+    from api.db_helper import execute_raw_sql_async, get_async_db_connection, UnitOfWork
+except ImportError:
+    from db_helper import execute_raw_sql_async, get_async_db_connection, UnitOfWork
+
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# A running job whose heartbeat is older than this is considered abandoned and re-claimed
+JOB_VISIBILITY_TIMEOUT_SECONDS = int(os.getenv("JOB_VISIBILITY_TIMEOUT_SECONDS", "120"))
+# Retry delay is base * 2^(attempt-1), capped, with jitter
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "5"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "300"))
+
+
+# Runnable jobs: queued and due, or running with a stale heartbeat (their worker died)
+RUNNABLE_JOBS_SQL = """
+    SELECT id, run_at, batch_id FROM jobs
+    WHERE kind = %s
+      AND (
+        (status = 'queued' AND run_at <= NOW())
+        OR (status = 'running' AND heartbeat_at < NOW() - make_interval(secs => %s))
+      )
+"""
+
+# Step 1: lock the batches that have runnable jobs. Workers holding a batch's lock are the only ones
+# that can claim its jobs, until their transaction commits; other workers skip those batches.
+LOCK_BATCHES_SQL = f"""
+    SELECT id FROM batches
+    WHERE id IN (SELECT batch_id FROM ({RUNNABLE_JOBS_SQL}) runnable WHERE batch_id IS NOT NULL)
+    FOR UPDATE SKIP LOCKED
+"""
+
+# Step 2, in the same transaction: a new statement takes a new snapshot (READ COMMITTED), so the
+# running count below includes every claim committed before we got the lock. Counting inside the
+# locking statement would use a snapshot from before the lock and could overfill a batch.
+# A locked batch's jobs are ranked by run_at and only the first <free slots> of them are eligible;
+# jobs of batches another worker has locked are left for the next poll.
+CLAIM_JOBS_SQL = f"""
+    UPDATE jobs
+    SET status = 'running', attempts = attempts + 1, locked_by = %s,
+        heartbeat_at = NOW(), updated_at = NOW()
+    WHERE id IN (
+        WITH runnable AS ({RUNNABLE_JOBS_SQL}),
+        batch_slots AS (
+            SELECT b.id, b.max_concurrency - (
+                SELECT count(*) FROM jobs r
+                WHERE r.batch_id = b.id AND r.status = 'running'
+                  AND r.heartbeat_at >= NOW() - make_interval(secs => %s)
+            ) AS free
+            FROM batches b
+            WHERE b.id = ANY(%s::uuid[])
+        ),
+        batch_candidates AS (
+            SELECT id, batch_id, row_number() OVER (PARTITION BY batch_id ORDER BY run_at) AS position
+            FROM runnable
+            WHERE batch_id IS NOT NULL
+        )
+        SELECT id FROM jobs
+        WHERE id IN (
+            SELECT id FROM runnable WHERE batch_id IS NULL
+            UNION ALL
+            SELECT c.id FROM batch_candidates c JOIN batch_slots s ON s.id = c.batch_id
+            WHERE c.position <= s.free
+        )
+        ORDER BY run_at
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, project_id, payload, attempts, max_attempts
+"""
+
+async def claim_jobs(worker_id: str, limit: int, kind: str = "contract_review") -> List[Dict[str, Any]]:
+    """
+    Atomically claim up to `limit` runnable jobs for this worker.
+    SKIP LOCKED lets any number of workers poll concurrently without blocking or double-claiming.
+    Jobs of a batch are only claimed while fewer than the batch's max_concurrency are running;
+    the batch row stays locked from the count until the claims commit.
+    """
+    if limit <= 0:
+        return []
+
+    async with get_async_db_connection() as conn:
+        async with conn.cursor(row_factory=dict_row) as cur:
+            await cur.execute(LOCK_BATCHES_SQL, (kind, JOB_VISIBILITY_TIMEOUT_SECONDS), prepare=True)
+            batch_ids = [row["id"] for row in await cur.fetchall()]
+            await cur.execute(CLAIM_JOBS_SQL, (
+                worker_id, kind, JOB_VISIBILITY_TIMEOUT_SECONDS, JOB_VISIBILITY_TIMEOUT_SECONDS, batch_ids, limit
+            ), prepare=True)
+            rows = await cur.fetchall()
+    # The batch locks are released when the transaction commits, with our claims visible
+
+    jobs = []
+    for row in rows:
+        job = dict(row)
+        job["id"] = str(job["id"])
+        if isinstance(job.get("payload"), str):
+            job["payload"] = json.loads(job["payload"])
+        jobs.append(job)
+    return jobs
+
+
+async def heartbeat_jobs(worker_id: str, job_ids: List[str]) -> int:
+    """Extend the lease on jobs this worker is still running"""
+    if not job_ids:
+        return 0
+    return await execute_raw_sql_async(
+        "UPDATE jobs SET heartbeat_at = NOW() WHERE id = ANY(%s::uuid[]) AND locked_by = %s AND status = 'running'",
+        (job_ids, worker_id),
+        prepare=True
+    )
+
+
+def retry_delay_seconds(attempt: int) -> float:
+    delay = min(JOB_RETRY_MAX_SECONDS, JOB_RETRY_BASE_SECONDS * (2 ** max(0, attempt - 1)))
+    # Full jitter on the top half so a burst of failures doesn't retry in lockstep
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+async def schedule_retry(job_id: str, error: str, attempt: int) -> float:
+    """Put a failed job back in the queue after a backoff delay; returns the delay"""
+    delay = retry_delay_seconds(attempt)
+    await execute_raw_sql_async(
+        """
+        UPDATE jobs
+        SET status = 'queued', run_at = NOW() + make_interval(secs => %s),
+            locked_by = NULL, heartbeat_at = NULL, last_error = %s, updated_at = NOW()
+        WHERE id = %s
+        """,
+        (delay, error, job_id),
+        prepare=True
+    )
+    return delay
+
+
+FINISH_JOB_SQL = """
+    UPDATE jobs
+    SET status = %s, result = %s, last_error = %s,
+        locked_by = NULL, heartbeat_at = NULL, updated_at = NOW()
+    WHERE id = %s
+"""
+
+
+async def finish_job(job_id: str, status: str, result: Dict[str, Any], error: Optional[str] = None):
+    """Record a terminal state (done/error) and release the job's lease"""
+    await execute_raw_sql_async(FINISH_JOB_SQL, (status, json.dumps(result), error, job_id), prepare=True)
+
+
+def add_finish_job(unit: UnitOfWork, job_id: str, status: str, result: Dict[str, Any], error: Optional[str] = None):
+    """finish_job as part of a unit of work, so it commits together with the job's messages"""
+    unit.execute(FINISH_JOB_SQL, (status, json.dumps(result), error, job_id), prepare=True)
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, Query, BackgroundTasks, Request
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
@@ -7,82 +7,250 @@ import uuid
 import time
 import json
 import asyncio
-import io
-from typing import Any, Dict, Optional, List
+import hashlib
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, List, Set, Tuple
 from dotenv import load_dotenv
 
-from upstash_redis import Redis
 
 # Database helper for direct PostgreSQL connection (bypasses PostgREST)
 try:
     from api.db_helper import (
-        init_db_pool,
-        execute_insert,
-        execute_update,
-        execute_query,
-        execute_raw_sql,
-        get_schema
+        init_async_db_pool,
+        close_async_db_pool,
+        execute_insert_async,
+        execute_query_async,
+        execute_raw_sql_async,
+        get_schema,
+        UnitOfWork,
+        persist,
+        start_write_behind,
+        stop_write_behind
     )
 except ImportError:
     from db_helper import (
-        init_db_pool,
-        execute_insert,
-        execute_update,
-        execute_query,
-        execute_raw_sql,
-        get_schema
+        init_async_db_pool,
+        close_async_db_pool,
+        execute_insert_async,
+        execute_query_async,
+        execute_raw_sql_async,
+        get_schema,
+        UnitOfWork,
+        persist,
+        start_write_behind,
+        stop_write_behind
     )
 
 # External Integrations
 try:
-    from api.openai_adapter import analyze_contract, analyze_contract_stream, generate_negotiation_tips
+    from api.openai_adapter import (
+        analyze_contract,
+        analyze_contract_stream,
+        generate_negotiation_tips,
+        init_openai_client,
+        close_openai_client
+    )
     from api.google_drive_client import (
         get_auth_url, 
         exchange_code_for_tokens, 
         download_file_content,
         fetch_file_metadata
     )
-    from api.streaming import format_sse_event, StreamingEventTypes
+    from api.streaming import format_sse_event, encode_sse_event, sse_stream, StreamingEventTypes
+    from api.analysis_cache import analysis_cache_key, get_cached_analysis, store_analysis, iter_cached_analysis_events
+    from api.tips_cache import TIPS_LOCK_TTL_SECONDS, TIPS_LOCK_POLL_SECONDS, tips_cache_key, get_cached_tips, store_tips
+    from api.single_flight import SingleFlight, acquire_lock, release_lock, lock_held
+    from api.job_queue import JOB_MAX_ATTEMPTS, schedule_retry, finish_job, add_finish_job
+    from api.extraction import EXTRACTOR_VERSION, iter_extracted_pages, init_extraction_pool, shutdown_extraction_pool
+    from api.job_events import JobEventHub
+    from api.local_cache import LocalTTLCache
+    from api.clause_store import add_clauses, query_clauses, clause_stats
+    from api.redis_client import AsyncRedis, create_redis
+    from api.stream_log import StreamLog
+    from api.stream_hub import StreamHub
+    from api.idempotency import (
+        IDEMPOTENCY_KEY_MAX_LENGTH, request_fingerprint, idempotency_key,
+        get_idempotent_response, claim_idempotency_key, release_idempotency_key
+    )
+    from api.rate_limit import (
+        RateLimitCheck, RateLimitResult, check_rate_limits, estimate_analysis_tokens,
+        ROUTE_POLICIES, PROJECT_POLICY, TOKEN_POLICY
+    )
 except ImportError:
     # Fallback for Railway if running from root without 'api' package awareness
-    from openai_adapter import analyze_contract, analyze_contract_stream, generate_negotiation_tips
+    from openai_adapter import (
+        analyze_contract,
+        analyze_contract_stream,
+        generate_negotiation_tips,
+        init_openai_client,
+        close_openai_client
+    )
     from google_drive_client import (
         get_auth_url, 
         exchange_code_for_tokens, 
         download_file_content,
         fetch_file_metadata
     )
-    from streaming import format_sse_event, StreamingEventTypes
-
-# Text Extraction
-try:
-    from pypdf import PdfReader
-except ImportError:
-    PdfReader = None
-
-try:
-    import docx
-except ImportError:
-    docx = None
+    from streaming import format_sse_event, encode_sse_event, sse_stream, StreamingEventTypes
+    from analysis_cache import analysis_cache_key, get_cached_analysis, store_analysis, iter_cached_analysis_events
+    from tips_cache import TIPS_LOCK_TTL_SECONDS, TIPS_LOCK_POLL_SECONDS, tips_cache_key, get_cached_tips, store_tips
+    from single_flight import SingleFlight, acquire_lock, release_lock, lock_held
+    from job_queue import JOB_MAX_ATTEMPTS, schedule_retry, finish_job, add_finish_job
+    from extraction import EXTRACTOR_VERSION, iter_extracted_pages, init_extraction_pool, shutdown_extraction_pool
+    from job_events import JobEventHub
+    from local_cache import LocalTTLCache
+    from clause_store import add_clauses, query_clauses, clause_stats
+    from redis_client import AsyncRedis, create_redis
+    from stream_log import StreamLog
+    from stream_hub import StreamHub
+    from idempotency import (
+        IDEMPOTENCY_KEY_MAX_LENGTH, request_fingerprint, idempotency_key,
+        get_idempotent_response, claim_idempotency_key, release_idempotency_key
+    )
+    from rate_limit import (
+        RateLimitCheck, RateLimitResult, check_rate_limits, estimate_analysis_tokens,
+        ROUTE_POLICIES, PROJECT_POLICY, TOKEN_POLICY
+    )
 
 load_dotenv()
 
 APP_NAME = "contractcoach"
 PREFIX = os.getenv("REDIS_PREFIX", "contractcoach")
 SUPABASE_SCHEMA = os.getenv("SUPABASE_SCHEMA", "contractcoach")
-REDIS_URL = os.getenv("UPSTASH_REDIS_REST_URL")
-REDIS_TOKEN = os.getenv("UPSTASH_REDIS_REST_TOKEN")
 PUBLIC_DOMAIN = os.getenv("RAILWAY_PUBLIC_DOMAIN", "http://localhost:3000")
+# Extracted text is content-addressed, so entries can live much longer than the file's Drive session
+EXTRACTION_CACHE_TTL_SECONDS = int(os.getenv("EXTRACTION_CACHE_TTL_SECONDS", "86400"))
+# Drive access tokens handed to the job worker expire with the token itself
+JOB_CREDENTIALS_TTL_SECONDS = int(os.getenv("JOB_CREDENTIALS_TTL_SECONDS", "3600"))
+# Cross-worker lock so only one worker runs a given analysis; expires if the owner dies
+ANALYSIS_LOCK_TTL_SECONDS = int(os.getenv("ANALYSIS_LOCK_TTL_SECONDS", "300"))
+# How often a waiting worker checks whether the lock owner has published its result
+ANALYSIS_LOCK_POLL_SECONDS = float(os.getenv("ANALYSIS_LOCK_POLL_SECONDS", "1"))
+# /jobs/{id}/events re-reads the job this often even without a notification (also the SSE keep-alive interval)
+JOB_EVENTS_RECHECK_SECONDS = float(os.getenv("JOB_EVENTS_RECHECK_SECONDS", "15"))
+# SSE connections are closed after this long; EventSource reconnects on its own
+JOB_EVENTS_MAX_SECONDS = float(os.getenv("JOB_EVENTS_MAX_SECONDS", "600"))
+JOB_TERMINAL_STATUSES = ("done", "error")
+# In-process job status cache in front of Redis: finished jobs never change, running ones briefly cached
+JOB_CACHE_MAX_ENTRIES = int(os.getenv("JOB_CACHE_MAX_ENTRIES", "2000"))
+JOB_CACHE_TERMINAL_TTL_SECONDS = float(os.getenv("JOB_CACHE_TERMINAL_TTL_SECONDS", "3600"))
+JOB_CACHE_ACTIVE_TTL_SECONDS = float(os.getenv("JOB_CACHE_ACTIVE_TTL_SECONDS", "1"))
+# Reconnect delay suggested to SSE clients of /agent/run/stream (the `retry:` field)
+STREAM_RETRY_MS = int(os.getenv("STREAM_RETRY_MS", "3000"))
+# On shutdown, running stream analyses get this long to finish and save before they are cancelled
+STREAM_SHUTDOWN_GRACE_SECONDS = float(os.getenv("STREAM_SHUTDOWN_GRACE_SECONDS", "30"))
+# Most inputs accepted by one POST /agent/run/batch
+BATCH_MAX_JOBS = int(os.getenv("BATCH_MAX_JOBS", "500"))
+# Jobs of one batch the workers run at once, when the request doesn't say; requests can go up to the max
+BATCH_DEFAULT_CONCURRENCY = int(os.getenv("BATCH_DEFAULT_CONCURRENCY", "4"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+# Drive files of queued batch jobs downloaded and extracted ahead of their turn, at once per process
+DRIVE_PREFETCH_CONCURRENCY = int(os.getenv("DRIVE_PREFETCH_CONCURRENCY", "4"))
+
+# Hot queries, run as server-side prepared statements. Columns are listed explicitly because a
+# prepared SELECT * fails once a migration adds a column to the table.
+JOB_LOOKUP_SQL = """
+    SELECT id, project_id, kind, status, payload, result, attempts, max_attempts, last_error, version,
+           batch_id, created_at, updated_at
+    FROM jobs WHERE id = %s LIMIT 1
+"""
+# One row per batch with its jobs counted by status (idx_jobs_batch_status, db/005-batches.sql)
+BATCH_PROGRESS_SQL = """
+    SELECT b.id, b.project_id, b.total, b.max_concurrency, b.created_at,
+           count(j.id) FILTER (WHERE j.status = 'queued') AS queued,
+           count(j.id) FILTER (WHERE j.status = 'running') AS running,
+           count(j.id) FILTER (WHERE j.status = 'done') AS done,
+           count(j.id) FILTER (WHERE j.status = 'error') AS error,
+           max(j.updated_at) AS updated_at
+    FROM batches b LEFT JOIN jobs j ON j.batch_id = b.id
+    WHERE b.id = %s
+    GROUP BY b.id
+"""
+JOB_STATE_SQL = "SELECT id, project_id, status, version, result, last_error, updated_at FROM jobs WHERE id = %s LIMIT 1"
+# Keyset pages over idx_messages_project_created_id (db/003-messages-keyset.sql)
+MESSAGES_DEFAULT_PAGE_SIZE = 50
+MESSAGES_LIST_SQL = """
+    SELECT id, project_id, role, content, meta, created_at
+    FROM messages WHERE project_id = %s
+    ORDER BY created_at DESC, id DESC LIMIT %s
+"""
+MESSAGES_PAGE_SQL = """
+    SELECT id, project_id, role, content, meta, created_at
+    FROM messages WHERE project_id = %s AND (created_at, id) < (%s, %s)
+    ORDER BY created_at DESC, id DESC LIMIT %s
+"""
 
 # Initialize clients
-# Direct PostgreSQL connection (bypasses PostgREST, no schema exposure needed)
-init_db_pool()
+# Async client: native RESP when REDIS_URL is set, otherwise Upstash REST
+redis: Optional[AsyncRedis] = create_redis()
+
+# Identical analyses running in this worker, keyed by analysis cache key
+analysis_flights = SingleFlight()
+# Identical tips generations (misses and stale refreshes) running in this worker, keyed by tips cache key
+tips_flights = SingleFlight()
+# Strong references to background tips refreshes so they aren't garbage collected mid-call
+tips_refresh_tasks: Set[asyncio.Task] = set()
+# Live fan-out of streaming analyses to every viewer of a job, across workers via Redis pub/sub
+stream_hub = StreamHub(PREFIX)
+# Events of each streaming analysis, so a dropped client can resume from its Last-Event-ID
+stream_log = StreamLog(PREFIX, stream_hub)
+# Running stream producers; they outlive the request that started them
+stream_producers: Set[asyncio.Task] = set()
+# Background reads of batch jobs' Drive files (see prefetch_drive_document), bounded per process
+drive_prefetch_tasks: Set[asyncio.Task] = set()
+drive_prefetch_slots = asyncio.Semaphore(DRIVE_PREFETCH_CONCURRENCY)
+# Job status transitions pushed by Postgres NOTIFY (db/002-job-events.sql)
+job_events = JobEventHub()
+# GET /jobs/{id} responses; status changes made by other processes arrive via job_events
+job_status_cache = LocalTTLCache(JOB_CACHE_MAX_ENTRIES)
+job_events.add_listener(lambda event: job_status_cache.invalidate(str(event.get("id"))))
 
-redis: Optional[Redis] = None
-if REDIS_URL and REDIS_TOKEN:
-    redis = Redis(url=REDIS_URL, token=REDIS_TOKEN)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Direct PostgreSQL connection (bypasses PostgREST, no schema exposure needed); async so queries don't stall streams
+    await init_async_db_pool()
+    # Optional batching of end-of-job writes across concurrent jobs (DB_WRITE_BEHIND)
+    start_write_behind()
+    # Text extraction runs in worker processes so large PDFs don't stall the event loop
+    init_extraction_pool()
+    # One pooled OpenAI client for the whole process keeps connections warm between analyses
+    init_openai_client()
+    # Push job status changes to /jobs/{id}/events instead of clients polling /jobs/{id}
+    job_events.start(asyncio.get_running_loop())
+    # Receive live stream events produced by other workers
+    await stream_hub.start(redis)
+    # Optionally process queued jobs in this process too (single-process local dev)
+    embedded_worker = None
+    if os.getenv("JOB_WORKER_EMBEDDED", "false").lower() in ("1", "true", "yes"):
+        try:
+            from api.worker import run_worker
+        except ImportError:
+            from worker import run_worker
+        embedded_worker = asyncio.create_task(run_worker())
+    yield
+    if embedded_worker:
+        embedded_worker.cancel()
+    # Unfinished Drive prefetches are only a head start: the worker reads those files itself
+    for task in list(drive_prefetch_tasks):
+        task.cancel()
+    # Stream producers outlive their requests; let them save their results (and close their logs)
+    # while the pools they need are still open
+    if stream_producers:
+        _, unfinished = await asyncio.wait(list(stream_producers), timeout=STREAM_SHUTDOWN_GRACE_SECONDS)
+        for producer in unfinished:
+            producer.cancel()
+        await asyncio.gather(*unfinished, return_exceptions=True)
+    job_events.stop()
+    await stream_hub.stop()
+    await close_openai_client()
+    shutdown_extraction_pool()
+    await stop_write_behind()
+    await close_async_db_pool()
+    if redis:
+        await redis.close()
 
-app = FastAPI(title="OpenAI ContractCoach API")
+app = FastAPI(title="OpenAI ContractCoach API", lifespan=lifespan)
 
 # CORS
 origins = [
@@ -109,125 +277,361 @@ class RunBody(BaseModel):
     projectId: str
     input: AgentInput
 
+class BatchRunBody(BaseModel):
+    projectId: str
+    inputs: List[AgentInput]
+    maxConcurrency: Optional[int] = None
+
 class ExchangeCodeBody(BaseModel):
     code: str
 
-# Rate Limiting Helper (Redis is synchronous with Upstash REST client)
-def check_rate_limit(key: str, limit: int, window: int) -> bool:
-    if not redis:
-        return True
+# Rate Limiting Helper (see rate_limit.py for policies; works without Redis via a local fallback)
+async def check_rate_limit(
+    request: Request,
+    route: str,
+    project_id: Optional[str] = None,
+    tokens: int = 0
+) -> RateLimitResult:
+    """Check the route budget per client IP, plus the per-project and per-client token budgets"""
+    client_ip = request.client.host if request.client else "unknown"
+    checks = [RateLimitCheck(f"{PREFIX}:rate:{route}:{client_ip}", ROUTE_POLICIES.get(route))]
+    if project_id:
+        checks.append(RateLimitCheck(f"{PREFIX}:rate:project:{project_id}", PROJECT_POLICY))
+    if tokens:
+        checks.append(RateLimitCheck(f"{PREFIX}:rate:tokens:{client_ip}", TOKEN_POLICY, tokens))
+    try:
+        return await check_rate_limits(redis, checks)
+    except Exception as e:
+        # Fail open: a limiter bug must not take the API down
+        print(f"Rate limit check failed: {e}")
+        return RateLimitResult(True)
+
+def rate_limit_headers(result: RateLimitResult) -> Dict[str, str]:
+    return {"Retry-After": str(result.retry_after), "X-RateLimit-Policy": result.policy or ""}
+
+def request_idempotency_key(request: Request, route: str, project_id: str, fingerprint: str):
+    """(Redis key, retention) from the Idempotency-Key header, or the request content without one"""
+    header_key = request.headers.get("idempotency-key")
+    if header_key is not None and not 0 < len(header_key) <= IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{IDEMPOTENCY_KEY_MAX_LENGTH} characters")
+    return idempotency_key(PREFIX, route, project_id, header_key, fingerprint)
+
+def replayed_job_id(record: Optional[Dict[str, Any]], fingerprint: str) -> Optional[str]:
+    """The original job of a repeated request; 422 if its key was first used for a different request"""
+    if not record:
+        return None
+    if record.get("fingerprint") != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    return record.get("jobId")
+
+def content_hash(content: bytes) -> str:
+    """SHA-256 of raw document bytes, used to content-address extraction results"""
+    return hashlib.sha256(content).hexdigest()
+
+def extraction_cache_key(digest: str) -> str:
+    return f"{PREFIX}:cache:text:v{EXTRACTOR_VERSION}:{digest}"
+
+def drive_revision_cache_key(file_id: str, meta: Dict[str, Any]) -> Optional[str]:
+    """
+    Key mapping a specific Drive file revision to the SHA-256 of its bytes.
+    Binary files are keyed by md5Checksum so copies shared between users hit the same entry;
+    native Google Docs only expose modifiedTime/version. Returns None if Drive gave us neither.
+    """
+    if meta.get("md5Checksum"):
+        return f"{PREFIX}:cache:drive:md5:{meta['md5Checksum']}"
+    if meta.get("modifiedTime"):
+        return f"{PREFIX}:cache:drive:rev:{file_id}:{meta['modifiedTime']}:{meta.get('version', '')}"
+    return None
+
+async def cache_get(key: Optional[str]) -> Optional[str]:
+    """Best-effort Redis read; cache failures never fail the request"""
+    if not redis or not key:
+        return None
+    try:
+        return await redis.get(key)
+    except Exception as e:
+        print(f"Redis cache read failed: {e}")
+        return None
+
+async def iter_drive_document(file_id: str, access_token: str):
+    """
+    Resolve a Drive file to text, re-using cached extractions whenever the bytes are unchanged.
+    
+    Yields events in the same shape as analyze_contract_stream:
+    - {"type": "progress", "data": {...}} once per extracted page (only on a cache miss)
+    - {"type": "document", "data": {"text": "...", "contentHash": "..."}} last
+    """
+    # Metadata is cheap and tells us whether the file changed since we last saw it
+    meta = await asyncio.to_thread(fetch_file_metadata, file_id, access_token)
+    mime_type = meta.get('mimeType')
+    revision_key = drive_revision_cache_key(file_id, meta)
+    
+    # Unchanged revision: no download, no parse
+    digest = await cache_get(revision_key)
+    if digest:
+        cached_text = await cache_get(extraction_cache_key(digest))
+        if cached_text:
+            yield {"type": "document", "data": {"text": cached_text, "contentHash": digest}}
+            return
+    
+    content_bytes = await asyncio.to_thread(download_file_content, file_id, access_token)
+    digest = content_hash(content_bytes)
+    text_key = extraction_cache_key(digest)
+    
+    # Same bytes seen before (e.g. another Drive copy or an edit that was reverted): no parse
+    text = await cache_get(text_key)
+    if not text:
+        pages = []
+        async for page_number, total_pages, page_text in iter_extracted_pages(content_bytes, mime_type):
+            pages.append(page_text)
+            yield {
+                "type": "progress",
+                "data": {
+                    "stage": "extraction",
+                    "current": page_number,
+                    "total": total_pages,
+                    "message": f"Extracted {page_number}/{total_pages} pages"
+                }
+            }
+        text = "\n".join(pages)
     
-    current = redis.incr(key)
-    if current == 1:
-        redis.expire(key, window)
+    if redis and text:
+        try:
+            batch = redis.pipeline().set(text_key, text, ex=EXTRACTION_CACHE_TTL_SECONDS)
+            if revision_key:
+                batch.set(revision_key, digest, ex=EXTRACTION_CACHE_TTL_SECONDS)
+            await batch.execute()
+        except Exception as e:
+            print(f"Redis cache write failed: {e}")
     
-    return current <= limit
+    yield {"type": "document", "data": {"text": text, "contentHash": digest}}
+
+async def wait_for_remote_analysis(result_cache_key: str) -> Optional[Dict[str, Any]]:
+    """
+    Another worker holds the analysis lock: wait for its result to land in the analysis cache.
+    Returns None if the owner released the lock (or it expired) without producing a result.
+    """
+    lock_key = f"{result_cache_key}:lock"
+    deadline = time.monotonic() + ANALYSIS_LOCK_TTL_SECONDS
+    while time.monotonic() < deadline:
+        await asyncio.sleep(ANALYSIS_LOCK_POLL_SECONDS)
+        result = await get_cached_analysis(redis, result_cache_key)
+        if result:
+            return result
+        if not await lock_held(redis, lock_key):
+            return await get_cached_analysis(redis, result_cache_key)
+    return None
 
-def extract_text_from_bytes(content: bytes, mime_type: str) -> str:
-    text = ""
+async def analyze_once(result_cache_key: str, text: str, questions: Optional[List[str]]) -> Dict[str, Any]:
+    """
+    Run analyze_contract at most once per cache key at a time.
+    Callers in this worker share one coroutine; callers in other workers wait on the Redis lock
+    and pick the result up from the analysis cache.
+    """
+    lock_key = f"{result_cache_key}:lock"
+    
+    async def analyze():
+        # The owner may have failed; after a few takeovers just run it ourselves
+        for _ in range(3):
+            result = await get_cached_analysis(redis, result_cache_key)
+            if result:
+                return result
+            token = await acquire_lock(redis, lock_key, ANALYSIS_LOCK_TTL_SECONDS)
+            if token:
+                try:
+                    result = await analyze_contract(text, {"questions": questions})
+                    await store_analysis(redis, result_cache_key, result)
+                    return result
+                finally:
+                    await release_lock(redis, lock_key, token)
+            result = await wait_for_remote_analysis(result_cache_key)
+            if result:
+                return result
+        return await analyze_contract(text, {"questions": questions})
+    
+    return await analysis_flights.run(result_cache_key, analyze)
+
+async def analysis_event_source(result_cache_key: str, text: str, questions: Optional[List[str]]):
+    """
+    Events for one streaming analysis: a cache replay, a wait on another worker's identical
+    analysis, or a fresh analyze_contract_stream whose result is cached when it succeeds.
+    """
+    cached_result = await get_cached_analysis(redis, result_cache_key)
+    if cached_result:
+        async for event in iter_cached_analysis_events(cached_result):
+            yield event
+        return
+    
+    lock_key = f"{result_cache_key}:lock"
+    token = await acquire_lock(redis, lock_key, ANALYSIS_LOCK_TTL_SECONDS)
+    if not token:
+        yield {"type": "status", "data": {"status": "analyzing", "message": "Joining an identical analysis in progress..."}}
+        remote_result = await wait_for_remote_analysis(result_cache_key)
+        if remote_result:
+            async for event in iter_cached_analysis_events(remote_result):
+                yield event
+            return
+        # Owner gave up without a result; run it here (with the lock if we can get it)
+        token = await acquire_lock(redis, lock_key, ANALYSIS_LOCK_TTL_SECONDS)
+    
     try:
-        if mime_type == 'application/pdf':
-            if PdfReader:
-                reader = PdfReader(io.BytesIO(content))
-                for page in reader.pages:
-                    text += page.extract_text() + "\n"
-            else:
-                text = "[PDF extraction unavailable - install pypdf]"
-        elif mime_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
-            if docx:
-                doc = docx.Document(io.BytesIO(content))
-                for para in doc.paragraphs:
-                    text += para.text + "\n"
-            else:
-                 text = "[Docx extraction unavailable - install python-docx]"
-        else:
-            # Assume text/plain
-            text = content.decode('utf-8', errors='ignore')
+        clauses = []
+        summary_data = None
+        failed = False
+        async for event in analyze_contract_stream(text, {"questions": questions}):
+            if event["type"] == "clause":
+                clauses.append(event["data"])
+            elif event["type"] == "summary":
+                summary_data = event["data"]
+            elif event["type"] == "error":
+                failed = True
+            yield event
+        
+        if summary_data and not failed:
+            await store_analysis(redis, result_cache_key, {
+                "overallRisk": summary_data.get("overallRisk", "medium"),
+                "summary": summary_data.get("summary", "Analysis complete."),
+                "clauses": clauses
+            })
+    finally:
+        if token:
+            await release_lock(redis, lock_key, token)
+
+def job_credentials_key(job_id: str) -> str:
+    return f"{PREFIX}:job:{job_id}:credentials"
+
+async def store_job_credentials(job_id: str, access_token: str):
+    """
+    Drive access tokens are never written to the jobs table, so the worker picks them up from a
+    short-lived Redis key instead (Google access tokens are only valid for an hour anyway).
+    """
+    if redis:
+        await redis.set(job_credentials_key(job_id), access_token, ex=JOB_CREDENTIALS_TTL_SECONDS)
+
+async def load_job_credentials(job_id: str) -> Optional[str]:
+    return await cache_get(job_credentials_key(job_id))
+
+def job_document_key(job_id: str) -> str:
+    return f"{PREFIX}:job:{job_id}:document"
+
+async def load_prefetched_document(job_id: str) -> Optional[str]:
+    """Text of the job's Drive file if it was read ahead of time and is still in the extraction cache"""
+    digest = await cache_get(job_document_key(job_id))
+    return await cache_get(extraction_cache_key(digest)) if digest else None
+
+def job_state_key(job_id: str) -> str:
+    return f"{PREFIX}:job:{job_id}"
+
+def cache_job_state(job_id: str, state: Dict[str, Any]):
+    """Keep the local job status cache in step with a state this process just wrote or read"""
+    ttl = JOB_CACHE_TERMINAL_TTL_SECONDS if state.get("status") in JOB_TERMINAL_STATUSES else JOB_CACHE_ACTIVE_TTL_SECONDS
+    job_status_cache.set(job_id, state, ttl)
+
+def message_timestamps(count: int) -> List[datetime]:
+    """
+    Distinct, increasing created_at values for messages written together. Rows of one multi-row
+    INSERT would all get the same now(), leaving their order in GET /messages to the random id.
+    """
+    now = datetime.now(timezone.utc)
+    return [now + timedelta(microseconds=i) for i in range(count)]
+
+async def fail_job(job_id: str, error: str):
+    """
+    Record a terminal error in the database, then in Redis and the local status cache.
+    The two writes are independent, so a Redis outage can't leave the row running until its lease expires.
+    """
+    try:
+        await finish_job(job_id, "error", {"error": error}, error)
     except Exception as e:
-        print(f"Extraction error: {e}")
-        text = f"[Error extracting text: {str(e)}]"
-    
-    return text
+        print(f"Failed to update job error status: {e}")
 
-async def process_contract_analysis(job_id: str, project_id: str, input_data: AgentInput):
+    error_state = {
+        "status": "error",
+        "result": {"error": error},
+        "updated_at": time.time()
+    }
+    cache_job_state(job_id, error_state)
+    if redis:
+        try:
+            await (
+                redis.pipeline()
+                .set(job_state_key(job_id), json.dumps(error_state))
+                .delete(job_credentials_key(job_id), job_document_key(job_id))
+                .execute()
+            )
+        except Exception as e:
+            print(f"Redis cache failed: {e}")
+
+async def process_contract_analysis(
+    job_id: str,
+    project_id: str,
+    input_data: AgentInput,
+    attempt: int = 1,
+    max_attempts: int = 1
+):
     """
-    Background task to run analysis and update storage.
+    Run one queued analysis job and update storage (called by the job worker).
+    Transient failures are re-queued with backoff until max_attempts; bad input fails immediately.
     """
     try:
         # 1. Update status to running
+        update_payload = {"status": "running", "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+        cache_job_state(job_id, update_payload)
         if redis:
-            update_payload = {"status": "running", "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
-            redis.set(f"{PREFIX}:job:{job_id}", json.dumps(update_payload))
+            await redis.set(job_state_key(job_id), json.dumps(update_payload))
         
         # 2. Resolve Text (Drive vs Direct)
         text_to_analyze = input_data.text
         
         if input_data.driveFileId:
+            # Batch jobs usually had their file read right after submission
+            text_to_analyze = await load_prefetched_document(job_id)
+        
+        if input_data.driveFileId and not text_to_analyze:
             if not input_data.accessToken:
-                 raise ValueError("Drive File ID provided but no access token")
-            
-            # Check Redis Cache
-            cache_key = f"{PREFIX}:cache:drive:file:{input_data.driveFileId}"
-            cached_text = None
-            if redis:
-                cached_text = redis.get(cache_key)
+                 raise ValueError("Drive File ID provided but no access token (it may have expired in the queue)")
             
-            if cached_text:
-                text_to_analyze = cached_text
-            else:
-                # Fetch metadata to know mime type
-                meta = fetch_file_metadata(input_data.driveFileId, input_data.accessToken)
-                mime_type = meta.get('mimeType')
-                
-                # Download content
-                content_bytes = download_file_content(input_data.driveFileId, input_data.accessToken)
-                
-                # Extract text
-                text_to_analyze = extract_text_from_bytes(content_bytes, mime_type)
-                
-                # Cache
-                if redis and text_to_analyze:
-                    redis.set(cache_key, text_to_analyze, ex=1800) # 30 mins
+            async for event in iter_drive_document(input_data.driveFileId, input_data.accessToken):
+                if event["type"] == "document":
+                    text_to_analyze = event["data"]["text"]
 
         if not text_to_analyze:
              raise ValueError("No text provided or extracted")
 
-        # 3. Run Analysis
-        result = await analyze_contract(text_to_analyze, {"questions": input_data.questions})
+        # 3. Run Analysis (cached results are reused; identical analyses already running
+        # here or in another worker are joined, not repeated)
+        result_cache_key = analysis_cache_key(PREFIX, text_to_analyze, input_data.questions)
+        result = await analyze_once(result_cache_key, text_to_analyze, input_data.questions)
         
-        # 4. Save User Message
-        # Sanitize input for storage (don't store large text if redundant, but for now ok)
+        # 4. Save User + Assistant Messages and clause rows, and mark the job done, in one transaction
         stored_input = input_data.model_dump()
         if len(stored_input.get("text", "") or "") > 1000:
              stored_input["text"] = "(truncated)..."
         if stored_input.get("accessToken"):
              stored_input["accessToken"] = "***"
-
-        # 4. Save User Message
+        user_at, assistant_at = message_timestamps(2)
         user_msg = {
             "project_id": project_id,
             "role": "user",
             "content": json.dumps(stored_input),
-            "meta": json.dumps({"jobId": job_id})
+            "meta": json.dumps({"jobId": job_id}),
+            "created_at": user_at
         }
-        try:
-            execute_insert("messages", user_msg)
-        except Exception as e:
-            print(f"Failed to insert user message: {e}")
-
-        # 5. Save Assistant Message (Summary)
         assistant_msg = {
             "project_id": project_id,
             "role": "assistant",
             "content": result.get("summary", "Analysis complete."),
-            "meta": json.dumps({"jobId": job_id, "risk": result.get("overallRisk")})
+            "meta": json.dumps({"jobId": job_id, "risk": result.get("overallRisk")}),
+            "created_at": assistant_at
         }
-        try:
-            execute_insert("messages", assistant_msg)
-        except Exception as e:
-            print(f"Failed to insert assistant message: {e}")
+        unit = UnitOfWork().insert("messages", user_msg).insert("messages", assistant_msg)
+        add_clauses(unit, job_id, project_id, result.get("clauses", []))
+        add_finish_job(unit, job_id, "done", result)
+
+        # Committed before anyone is told the job is done; a failure here goes through the retry path
+        await persist(unit, wait=True)
 
-        # 6. Update Job Status to Done
+        # 5. Update Job Status to Done
         final_job_state = {
             "status": "done",
             "result": result,
@@ -235,43 +639,40 @@ async def process_contract_analysis(job_id: str, project_id: str, input_data: Ag
             "project_id": project_id
         }
         
+        cache_job_state(job_id, final_job_state)
         if redis:
-            redis.set(f"{PREFIX}:job:{job_id}", json.dumps(final_job_state))
-        
-        try:
-            # Use raw SQL for updated_at to use PostgreSQL's NOW() function
-            execute_raw_sql(
-                """
-                UPDATE jobs 
-                SET status = %s, result = %s, updated_at = NOW()
-                WHERE id = %s
-                """,
-                ("done", json.dumps(result), job_id)
-            )
-        except Exception as e:
-            print(f"Failed to update job: {e}")
+            try:
+                await (
+                    redis.pipeline()
+                    .set(job_state_key(job_id), json.dumps(final_job_state))
+                    .delete(job_credentials_key(job_id), job_document_key(job_id))
+                    .execute()
+                )
+            except Exception as e:
+                # The job is committed as done; re-running it over a stale cache entry would be worse
+                print(f"Redis cache failed: {e}")
 
     except Exception as e:
+        # Bad input (ValueError) won't get better on retry; anything else (OpenAI, network) might
+        if attempt < max_attempts and not isinstance(e, ValueError):
+            print(f"Job {job_id} attempt {attempt}/{max_attempts} failed, retrying: {e}")
+            try:
+                delay = await schedule_retry(job_id, str(e), attempt)
+                retry_state = {
+                    "status": "queued",
+                    "attempt": attempt,
+                    "retryInSeconds": round(delay),
+                    "updated_at": time.time()
+                }
+                cache_job_state(job_id, retry_state)
+                if redis:
+                    await redis.set(job_state_key(job_id), json.dumps(retry_state))
+                return
+            except Exception as e2:
+                print(f"Failed to schedule retry: {e2}")
+        
         print(f"Job failed: {e}")
-        error_state = {
-            "status": "error",
-            "result": {"error": str(e)},
-            "updated_at": time.time()
-        }
-        if redis:
-            redis.set(f"{PREFIX}:job:{job_id}", json.dumps(error_state))
-        try:
-            # Use raw SQL for updated_at to use PostgreSQL's NOW() function
-            execute_raw_sql(
-                """
-                UPDATE jobs 
-                SET status = %s, result = %s, updated_at = NOW()
-                WHERE id = %s
-                """,
-                ("error", json.dumps({"error": str(e)}), job_id)
-            )
-        except Exception as e2:
-            print(f"Failed to update job error status: {e2}")
+        await fail_job(job_id, str(e))
 
 @app.get("/")
 async def root():
@@ -289,7 +690,7 @@ async def health_check():
     try:
         if redis:
             # Test Redis connection with a simple get
-            redis.get(f"{PREFIX}:health:test")
+            await redis.get(f"{PREFIX}:health:test")
             health["services"]["redis"] = "connected"
         else:
             health["services"]["redis"] = "not_configured"
@@ -300,7 +701,7 @@ async def health_check():
     # Check PostgreSQL (direct connection, no schema exposure needed)
     try:
         # Simple query to test connection
-        result = execute_query("SELECT 1 as test", ())
+        result = await execute_query_async("SELECT 1 as test", ())
         if result:
             health["services"]["postgresql"] = f"connected (direct connection, schema: {get_schema()})"
         else:
@@ -318,6 +719,11 @@ async def health_check():
         health["services"]["openai"] = "not_configured"
         health["status"] = "degraded"
     
+    # In-process cache counters, for tuning sizes and TTLs
+    health["caches"] = {"jobStatus": job_status_cache.stats()}
+    # Viewers of live analysis streams in this worker
+    health["streams"] = stream_hub.stats()
+    
     return health
 
 @app.get("/auth/google/url")
@@ -332,29 +738,47 @@ async def google_auth_exchange(body: ExchangeCodeBody):
     return tokens
 
 @app.post("/agent/run")
-async def run_agent(body: RunBody, background_tasks: BackgroundTasks, request: Request):
+async def run_agent(body: RunBody, request: Request, response: Response):
+    """
+    Queue an analysis. Repeating a request (same Idempotency-Key, or the same content within
+    IDEMPOTENCY_DERIVED_TTL_SECONDS) returns the original jobId instead of queueing another job.
+    """
     try:
-        # Rate Limiting (per IP)
-        client_ip = "unknown"
-        if request.client:
-            client_ip = request.client.host
-        
-        rate_key = f"{PREFIX}:rate:{client_ip}"
-        
-        # Only check rate limit if redis is available to avoid crashing
-        if redis:
-            try:
-                allowed = check_rate_limit(rate_key, limit=5, window=60) # 5 reqs / min
-                if not allowed:
-                    raise HTTPException(status_code=429, detail="Rate limit exceeded")
-            except HTTPException:
-                raise
-            except Exception as e:
-                print(f"Rate limit check failed: {e}")
-                # Proceed if rate limit check fails (fail open) or handle as needed
-                pass
+        # A retry gets the original job back before it counts against the rate limit
+        fingerprint = request_fingerprint(body.projectId, body.input.model_dump())
+        idempotency = request_idempotency_key(request, "agent_run", body.projectId, fingerprint)
+        if idempotency:
+            original_job_id = replayed_job_id(await get_idempotent_response(redis, idempotency[0]), fingerprint)
+            if original_job_id:
+                response.headers["Idempotent-Replayed"] = "true"
+                return {"jobId": original_job_id}
+
+        # The worker only gets Drive tokens through Redis; without it the job could never read the file
+        if body.input.driveFileId and not redis:
+            raise HTTPException(
+                status_code=503,
+                detail="Drive inputs need Redis to reach the job worker; use /agent/run/stream or send text"
+            )
+
+        # Rate Limiting (per IP and project, weighted by estimated OpenAI tokens)
+        rate = await check_rate_limit(
+            request, "agent_run", body.projectId,
+            estimate_analysis_tokens(body.input.text, bool(body.input.driveFileId))
+        )
+        if not rate.allowed:
+            raise HTTPException(status_code=429, detail="Rate limit exceeded", headers=rate_limit_headers(rate))
 
         job_id = str(uuid.uuid4())
+
+        # Record the response before doing any work; of two concurrent retries only one gets to create a job
+        record = {"jobId": job_id, "fingerprint": fingerprint}
+        if idempotency:
+            original_job_id = replayed_job_id(
+                await claim_idempotency_key(redis, idempotency[0], idempotency[1], record), fingerprint
+            )
+            if original_job_id:
+                response.headers["Idempotent-Replayed"] = "true"
+                return {"jobId": original_job_id}
         
         # Initial Job State
         initial_job = {
@@ -367,14 +791,26 @@ async def run_agent(body: RunBody, background_tasks: BackgroundTasks, request: R
         }
 
         # 1. Cache in Redis
+        cache_job_state(job_id, initial_job)
         if redis:
             try:
-                redis.set(f"{PREFIX}:job:{job_id}", json.dumps(initial_job))
+                await redis.set(job_state_key(job_id), json.dumps(initial_job))
             except Exception as e:
                 print(f"Redis cache failed: {e}")
                 # Continue even if Redis fails, rely on DB
 
-        # 2. Persist in PostgreSQL (direct connection, no schema exposure)
+        # 2. Drive token for the worker, stored before the job row exists so the worker never
+        # claims a Drive job it has no credentials for
+        if body.input.accessToken:
+            try:
+                await store_job_credentials(job_id, body.input.accessToken)
+            except Exception as e:
+                print(f"Failed to store job credentials: {e}")
+                if idempotency:
+                    await release_idempotency_key(redis, idempotency[0], record)
+                raise HTTPException(status_code=503, detail="Could not hand the Drive access token to the job worker")
+
+        # 3. Persist in PostgreSQL (direct connection, no schema exposure)
         try:
             db_job = {
                 "id": job_id,
@@ -382,16 +818,18 @@ async def run_agent(body: RunBody, background_tasks: BackgroundTasks, request: R
                 "kind": "contract_review",
                 "status": "queued",
                 "payload": json.dumps(body.input.model_dump(exclude={"accessToken"})),
+                "max_attempts": JOB_MAX_ATTEMPTS,
             }
-            execute_insert("jobs", db_job)
+            await execute_insert_async("jobs", db_job)
         except Exception as e:
             print(f"Database insert failed: {e}")
+            # No job was created, so a retry must be free to start over
+            if idempotency:
+                await release_idempotency_key(redis, idempotency[0], record)
             # If DB fails, we probably shouldn't continue as user can't retrieve result
             raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-        # 3. Trigger Background Processing
-        background_tasks.add_task(process_contract_analysis, job_id, body.projectId, body.input)
-
+        # 4. Hand off to the job worker (the row above is the queue entry, see api/worker.py)
         return {"jobId": job_id}
         
     except HTTPException:
@@ -401,22 +839,195 @@ async def run_agent(body: RunBody, background_tasks: BackgroundTasks, request: R
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
+def validate_batch_input(index: int, input_data: AgentInput):
+    """Reject inputs the worker could only fail on, before any job is created"""
+    if not input_data.text and not input_data.driveFileId:
+        raise HTTPException(status_code=400, detail=f"inputs[{index}]: text or driveFileId is required")
+    if input_data.driveFileId and not input_data.accessToken:
+        raise HTTPException(status_code=400, detail=f"inputs[{index}]: Drive File ID provided but no access token")
+
+async def prefetch_drive_document(job_id: str, file_id: str):
+    """
+    Read a queued job's Drive file while its access token is still valid and leave the job a
+    reference to the extracted text (content hash), so it can run after the token has expired.
+    Failures are only logged: the worker then reads the file itself, with the token if it's still there.
+    """
+    async with drive_prefetch_slots:
+        try:
+            access_token = await load_job_credentials(job_id)
+            if not access_token:
+                return
+            async for event in iter_drive_document(file_id, access_token):
+                if event["type"] == "document":
+                    await redis.set(job_document_key(job_id), event["data"]["contentHash"], ex=EXTRACTION_CACHE_TTL_SECONDS)
+        except Exception as e:
+            print(f"Drive prefetch failed for job {job_id}: {e}")
+
+def prefetch_drive_documents(drive_jobs: List[Tuple[str, str]]):
+    """Start prefetching (job id, Drive file id) pairs in the background, DRIVE_PREFETCH_CONCURRENCY at a time"""
+    for job_id, file_id in drive_jobs:
+        task = asyncio.create_task(prefetch_drive_document(job_id, file_id))
+        drive_prefetch_tasks.add(task)
+        task.add_done_callback(drive_prefetch_tasks.discard)
+
+@app.post("/agent/run/batch")
+async def run_agent_batch(body: BatchRunBody, request: Request):
+    """
+    Queue one analysis per input in a single request. The batch row and every job row go in with
+    one multi-row INSERT; workers run at most maxConcurrency of the batch's jobs at a time.
+    Drive files are read in the background right after submission, independently of that cap, so
+    jobs further back in the queue don't depend on an access token that expires within the hour.
+    GET /batches/{batchId} reports progress for the whole set.
+    """
+    if not body.inputs:
+        raise HTTPException(status_code=400, detail="inputs must not be empty")
+    if len(body.inputs) > BATCH_MAX_JOBS:
+        raise HTTPException(status_code=400, detail=f"A batch can have at most {BATCH_MAX_JOBS} inputs")
+    for index, input_data in enumerate(body.inputs):
+        validate_batch_input(index, input_data)
+    if not redis and any(input_data.driveFileId for input_data in body.inputs):
+        # Same constraint as /agent/run: tokens and prefetched documents reach the worker through Redis
+        raise HTTPException(status_code=503, detail="Drive inputs need Redis to reach the job worker; send text")
+
+    try:
+        # One rate limit hit for the whole batch, weighted by the tokens of every contract in it
+        rate = await check_rate_limit(
+            request, "agent_run_batch", body.projectId,
+            sum(estimate_analysis_tokens(i.text, bool(i.driveFileId)) for i in body.inputs)
+        )
+        if not rate.allowed:
+            raise HTTPException(status_code=429, detail="Rate limit exceeded", headers=rate_limit_headers(rate))
+
+        batch_id = str(uuid.uuid4())
+        max_concurrency = min(max(body.maxConcurrency or BATCH_DEFAULT_CONCURRENCY, 1), BATCH_MAX_CONCURRENCY)
+        job_ids = [str(uuid.uuid4()) for _ in body.inputs]
+        drive_jobs = [(job_id, i.driveFileId) for job_id, i in zip(job_ids, body.inputs) if i.driveFileId]
+
+        # 1. Drive tokens in one Redis round trip, before any job row exists
+        if drive_jobs:
+            tokens = redis.pipeline()
+            for job_id, input_data in zip(job_ids, body.inputs):
+                if input_data.accessToken:
+                    tokens.set(job_credentials_key(job_id), input_data.accessToken, ex=JOB_CREDENTIALS_TTL_SECONDS)
+            try:
+                await tokens.execute()
+            except Exception as e:
+                print(f"Failed to store job credentials: {e}")
+                raise HTTPException(status_code=503, detail="Could not hand the Drive access tokens to the job worker")
+
+        # 2. Persist the batch and its jobs in one transaction (the job rows are the queue entries)
+        unit = UnitOfWork().insert("batches", {
+            "id": batch_id,
+            "project_id": body.projectId,
+            "total": len(job_ids),
+            "max_concurrency": max_concurrency,
+        })
+        for job_id, input_data in zip(job_ids, body.inputs):
+            unit.insert("jobs", {
+                "id": job_id,
+                "project_id": body.projectId,
+                "kind": "contract_review",
+                "status": "queued",
+                "payload": json.dumps(input_data.model_dump(exclude={"accessToken"})),
+                "max_attempts": JOB_MAX_ATTEMPTS,
+                "batch_id": batch_id,
+            })
+        try:
+            await unit.commit()
+        except Exception as e:
+            print(f"Database insert failed: {e}")
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+        prefetch_drive_documents(drive_jobs)
+
+        # 3. Initial job states in one Redis round trip (contract text stays in the jobs table)
+        created_at = time.time()
+        batch = redis.pipeline() if redis else None
+        for job_id, input_data in zip(job_ids, body.inputs):
+            initial_job = {
+                "id": job_id,
+                "project_id": body.projectId,
+                "kind": "contract_review",
+                "status": "queued",
+                "payload": input_data.model_dump(exclude={"accessToken", "text"}),
+                "batchId": batch_id,
+                "created_at": created_at
+            }
+            cache_job_state(job_id, initial_job)
+            if batch is not None:
+                batch.set(job_state_key(job_id), json.dumps(initial_job))
+        if batch is not None:
+            try:
+                await batch.execute()
+            except Exception as e:
+                print(f"Redis cache failed: {e}")
+
+        return {"batchId": batch_id, "jobIds": job_ids, "maxConcurrency": max_concurrency}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+@app.get("/batches/{batch_id}")
+async def get_batch(batch_id: str):
+    """Aggregate progress of a batch: its jobs counted by status, in one query"""
+    try:
+        uuid.UUID(batch_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    try:
+        results = await execute_query_async(BATCH_PROGRESS_SQL, (batch_id,), prepare=True)
+    except Exception as e:
+        print(f"Database select failed: {e}")
+        raise HTTPException(status_code=500, detail="Failed to load batch")
+    if not results:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    row = dict(results[0])
+    counts = {status: row.get(status) or 0 for status in ("queued", "running", "done", "error")}
+    finished = counts["done"] + counts["error"]
+    total = row["total"]
+    if finished >= total:
+        status = "done"
+    elif counts["running"] or finished:
+        status = "running"
+    else:
+        status = "queued"
+    updated_at = row.get("updated_at") or row.get("created_at")
+    return {
+        "batchId": str(row["id"]),
+        "projectId": row["project_id"],
+        "status": status,
+        "total": total,
+        "finished": finished,
+        "progress": round(finished / total, 4) if total else 1.0,
+        "counts": counts,
+        "maxConcurrency": row["max_concurrency"],
+        "createdAt": row["created_at"].isoformat() if row.get("created_at") else None,
+        "updatedAt": updated_at.isoformat() if updated_at else None,
+    }
+
 @app.get("/jobs/{job_id}")
 async def get_job(job_id: str):
-    # 1. Try Redis
+    # 1. In-process cache (no network hop, no re-parsing finished results)
+    job = job_status_cache.get(job_id)
+    if job is not None:
+        return job
+
+    # 2. Try Redis
     if redis:
-        cached = redis.get(f"{PREFIX}:job:{job_id}")
+        cached = await redis.get(job_state_key(job_id))
         if cached:
-            if isinstance(cached, str):
-                return json.loads(cached)
-            return cached
+            job = json.loads(cached) if isinstance(cached, str) else cached
+            cache_job_state(job_id, job)
+            return job
 
-    # 2. Fallback to PostgreSQL (direct connection)
+    # 3. Fallback to PostgreSQL (direct connection)
     try:
-        results = execute_query(
-            "SELECT * FROM jobs WHERE id = %s LIMIT 1",
-            (job_id,)
-        )
+        results = await execute_query_async(JOB_LOOKUP_SQL, (job_id,), prepare=True)
         if results and len(results) > 0:
             job = dict(results[0])
             # Parse JSON fields
@@ -424,21 +1035,144 @@ async def get_job(job_id: str):
                 job["payload"] = json.loads(job["payload"])
             if isinstance(job.get("result"), str):
                 job["result"] = json.loads(job["result"])
+            cache_job_state(job_id, job)
             return job
     except Exception as e:
         print(f"Database select failed: {e}")
     
     raise HTTPException(status_code=404, detail="Job not found")
 
+async def load_job_state(job_id: str) -> Optional[Dict[str, Any]]:
+    """Current status/version of a job; the result is included once the job has finished"""
+    results = await execute_query_async(JOB_STATE_SQL, (job_id,), prepare=True)
+    if not results:
+        return None
+    row = dict(results[0])
+    state = {
+        "jobId": str(row["id"]),
+        "status": row["status"],
+        "version": row.get("version") or 0,
+        "updatedAt": row["updated_at"].isoformat() if row.get("updated_at") else None,
+    }
+    if row["status"] in JOB_TERMINAL_STATUSES:
+        result = row.get("result")
+        state["result"] = json.loads(result) if isinstance(result, str) else result
+        if row.get("last_error"):
+            state["error"] = row["last_error"]
+    return state
+
+async def wait_for_job_event(queue: asyncio.Queue, timeout: float) -> bool:
+    """Wait for a notification about this job; False on timeout"""
+    try:
+        await asyncio.wait_for(queue.get(), timeout=timeout)
+        # Collapse a burst of transitions into a single re-read
+        while not queue.empty():
+            queue.get_nowait()
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+@app.get("/jobs/{job_id}/events")
+async def job_status_events(
+    job_id: str,
+    request: Request,
+    since: Optional[int] = Query(None, description="Long-poll: return once the job version is greater than this"),
+    timeout: float = Query(25, ge=0, le=60)
+):
+    """
+    Push job status transitions (queued -> running -> done/error).
+
+    Without `since` this is an SSE stream with one `status` event per version, closed after a terminal status.
+    With `since` it is a long-poll returning the job state as JSON as soon as its version passes `since`
+    (or after `timeout` seconds, unchanged).
+    """
+    # Subscribe before reading so a transition between the read and the wait isn't missed
+    queue = job_events.subscribe(job_id)
+    try:
+        state = await load_job_state(job_id)
+    except Exception as e:
+        job_events.unsubscribe(job_id, queue)
+        print(f"Database select failed: {e}")
+        raise HTTPException(status_code=500, detail="Failed to load job")
+    if not state:
+        job_events.unsubscribe(job_id, queue)
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if since is not None:
+        try:
+            deadline = time.monotonic() + timeout
+            while state["version"] <= since and state["status"] not in JOB_TERMINAL_STATUSES:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                await wait_for_job_event(queue, min(remaining, JOB_EVENTS_RECHECK_SECONDS))
+                state = await load_job_state(job_id) or state
+            return state
+        finally:
+            job_events.unsubscribe(job_id, queue)
+
+    async def generate_events():
+        nonlocal state
+        try:
+            yield format_sse_event(StreamingEventTypes.STATUS, state)
+            deadline = time.monotonic() + JOB_EVENTS_MAX_SECONDS
+            while state["status"] not in JOB_TERMINAL_STATUSES and time.monotonic() < deadline:
+                if await request.is_disconnected():
+                    return
+                if not await wait_for_job_event(queue, JOB_EVENTS_RECHECK_SECONDS):
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                latest = await load_job_state(job_id)
+                if latest and latest["version"] > state["version"]:
+                    state = latest
+                    yield format_sse_event(StreamingEventTypes.STATUS, state)
+        except Exception as e:
+            yield format_sse_event(StreamingEventTypes.ERROR, {"error": str(e)})
+        finally:
+            job_events.unsubscribe(job_id, queue)
+
+    return StreamingResponse(
+        generate_events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+def encode_message_cursor(row: Dict[str, Any]) -> str:
+    # UTC with a Z suffix: a "+00:00" offset would turn into a space in an unencoded query string
+    created_at = row["created_at"].astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    return f"{created_at},{row['id']}"
+
+def decode_message_cursor(cursor: str):
+    """Parse before=<created_at>,<id> into query params"""
+    try:
+        created_at, message_id = cursor.rsplit(",", 1)
+        return datetime.fromisoformat(created_at), str(uuid.UUID(message_id))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor: expected before=<created_at>,<id>")
+
 @app.get("/messages")
-async def get_messages(projectId: str = Query(..., alias="projectId")):
+async def get_messages(
+    projectId: str = Query(..., alias="projectId"),
+    before: Optional[str] = Query(None, description="Cursor from nextCursor: <created_at>,<id>"),
+    limit: int = Query(MESSAGES_DEFAULT_PAGE_SIZE, ge=1, le=200)
+):
+    """Newest messages first; pass nextCursor back as `before` for the next (older) page"""
     try:
-        results = execute_query(
-            "SELECT * FROM messages WHERE project_id = %s ORDER BY created_at DESC LIMIT 50",
-            (projectId,)
-        )
+        # One extra row tells us whether an older page exists
+        if before:
+            created_at, message_id = decode_message_cursor(before)
+            results = await execute_query_async(
+                MESSAGES_PAGE_SQL, (projectId, created_at, message_id, limit + 1), prepare=True
+            )
+        else:
+            results = await execute_query_async(MESSAGES_LIST_SQL, (projectId, limit + 1), prepare=True)
+
         items = []
-        for row in results:
+        for row in results[:limit]:
             item = dict(row)
             # Parse JSON fields
             if isinstance(item.get("meta"), str):
@@ -447,15 +1181,91 @@ async def get_messages(projectId: str = Query(..., alias="projectId")):
                 except:
                     pass
             items.append(item)
+        next_cursor = encode_message_cursor(results[limit - 1]) if len(results) > limit else None
+        return {"items": items, "nextCursor": next_cursor}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/projects/{project_id}/clauses")
+async def get_project_clauses(
+    project_id: str,
+    type: Optional[str] = Query(None, description="Clause type, e.g. liability"),
+    risk: Optional[str] = Query(None, pattern="^(low|medium|high)$"),
+    textHash: Optional[str] = Query(None, description="Same clause text across contracts"),
+    jobId: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=500)
+):
+    """Analyzed clauses across every contract in a project, filtered in SQL"""
+    try:
+        items = await query_clauses(project_id, type, risk, textHash, jobId, limit)
         return {"items": items}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/projects/{project_id}/clauses/stats")
+async def get_project_clause_stats(project_id: str):
+    """Clause counts by type and risk, and clauses recurring across contracts"""
+    try:
+        return await clause_stats(project_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 
 # ============================================
 # STREAMING ENDPOINT - Real-time Analysis
 # ============================================
 
+async def follow_job_stream(job_id: str, after: int = 0):
+    """SSE for a logged analysis stream: replay after `after`, then follow the live tail"""
+    retry_ms = STREAM_RETRY_MS
+    try:
+        async for event in stream_log.follow(redis, job_id, after):
+            yield encode_sse_event(event["type"], event["data"], event["id"], retry_ms)
+            retry_ms = None
+    except Exception as e:
+        print(f"Stream follow error for job {job_id}: {e}")
+        yield format_sse_event("error", {"error": str(e)})
+
+
+async def replay_job_stream(job_id: str):
+    """
+    SSE for a repeated /agent/run/stream request: the original job's stream from its log, or,
+    once the log has expired, the job's stored result replayed as the same events.
+    """
+    try:
+        if await stream_log.read(redis, job_id) is not None:
+            async for frame in follow_job_stream(job_id):
+                yield frame
+            return
+        state = await load_job_state(job_id)
+    except Exception as e:
+        print(f"Stream replay failed for job {job_id}: {e}")
+        yield format_sse_event("error", {"error": str(e), "jobId": job_id})
+        return
+    
+    yield encode_sse_event("job", {"jobId": job_id, "replayed": True})
+    if state and state["status"] == "done" and state.get("result"):
+        async for event in iter_cached_analysis_events(state["result"]):
+            yield encode_sse_event(event["type"], event["data"])
+    else:
+        yield format_sse_event("error", {"error": (state or {}).get("error") or "Original analysis is no longer available", "jobId": job_id})
+
+def replayed_stream_response(job_id: str) -> StreamingResponse:
+    return StreamingResponse(
+        sse_stream(replay_job_stream(job_id)),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+            "Idempotent-Replayed": "true",
+        }
+    )
+
+
 @app.post("/agent/run/stream")
 async def run_agent_stream(body: RunBody, request: Request):
     """
@@ -467,32 +1277,42 @@ async def run_agent_stream(body: RunBody, request: Request):
     - summary: Final summary and overall risk
     - complete: Analysis finished
     - error: If something goes wrong
+    
+    Every event carries an `id`. The analysis keeps running if the client disconnects;
+    GET /jobs/{jobId}/stream with Last-Event-ID (or ?after=) resumes where it left off, and lets
+    any number of other viewers watch the same analysis (one OpenAI call per job).
+    
+    Repeating a request (same Idempotency-Key, or the same content within IDEMPOTENCY_DERIVED_TTL_SECONDS)
+    replays the original job's stream instead of starting another analysis.
     """
     try:
-        # Rate Limiting (per IP) - same as regular endpoint
-        client_ip = "unknown"
-        if request.client:
-            client_ip = request.client.host
-        
-        rate_key = f"{PREFIX}:rate:{client_ip}"
+        # A retry replays the original stream before it counts against the rate limit
+        fingerprint = request_fingerprint(body.projectId, body.input.model_dump())
+        idempotency = request_idempotency_key(request, "agent_run_stream", body.projectId, fingerprint)
+        if idempotency:
+            original_job_id = replayed_job_id(await get_idempotent_response(redis, idempotency[0]), fingerprint)
+            if original_job_id:
+                return replayed_stream_response(original_job_id)
         
-        if redis:
-            try:
-                allowed = check_rate_limit(rate_key, limit=5, window=60)
-                if not allowed:
-                    async def rate_limit_error():
-                        yield format_sse_event("error", {"error": "Rate limit exceeded"})
-                    return StreamingResponse(
-                        rate_limit_error(),
-                        media_type="text/event-stream",
-                        headers={
-                            "Cache-Control": "no-cache",
-                            "Connection": "keep-alive",
-                            "X-Accel-Buffering": "no",
-                        }
-                    )
-            except Exception as e:
-                print(f"Rate limit check failed: {e}")
+        # Rate Limiting - same budgets as the regular endpoint
+        rate = await check_rate_limit(
+            request, "agent_run", body.projectId,
+            estimate_analysis_tokens(body.input.text, bool(body.input.driveFileId))
+        )
+        if not rate.allowed:
+            async def rate_limit_error():
+                yield format_sse_event("error", {"error": "Rate limit exceeded", "retryAfter": rate.retry_after})
+            return StreamingResponse(
+                rate_limit_error(),
+                status_code=429,
+                media_type="text/event-stream",
+                headers={
+                    "Cache-Control": "no-cache",
+                    "Connection": "keep-alive",
+                    "X-Accel-Buffering": "no",
+                    **rate_limit_headers(rate),
+                }
+            )
         
         # Resolve text from input
         text_to_analyze = body.input.text
@@ -511,26 +1331,7 @@ async def run_agent_stream(body: RunBody, request: Request):
                     }
                 )
             
-            # Check Redis cache first
-            cache_key = f"{PREFIX}:cache:drive:file:{body.input.driveFileId}"
-            cached_text = None
-            if redis:
-                cached_text = redis.get(cache_key)
-            
-            if cached_text:
-                text_to_analyze = cached_text
-            else:
-                # Fetch from Drive
-                meta = fetch_file_metadata(body.input.driveFileId, body.input.accessToken)
-                mime_type = meta.get('mimeType')
-                content_bytes = download_file_content(body.input.driveFileId, body.input.accessToken)
-                text_to_analyze = extract_text_from_bytes(content_bytes, mime_type)
-                
-                # Cache the extracted text
-                if redis and text_to_analyze:
-                    redis.set(cache_key, text_to_analyze, ex=1800)
-        
-        if not text_to_analyze:
+        if not text_to_analyze and not body.input.driveFileId:
             async def no_text_error():
                 yield format_sse_event("error", {"error": "No text provided or extracted"})
             return StreamingResponse(
@@ -547,25 +1348,46 @@ async def run_agent_stream(body: RunBody, request: Request):
         job_id = str(uuid.uuid4())
         
         async def generate_stream():
-            """Generator that yields SSE events."""
+            """Runs the analysis and logs its events; independent of the client connection."""
+            failed = False
+            
+            async def emit(event_type: str, event_data: Dict[str, Any]):
+                nonlocal failed
+                failed = failed or event_type == "error"
+                await stream_log.append(redis, job_id, event_type, event_data)
+            
             collected_clauses = []
             final_summary = None
             overall_risk = "medium"
             
             try:
-                # Yield initial job info
-                yield format_sse_event("job", {"jobId": job_id, "projectId": body.projectId})
+                # Resolve Drive documents inside the stream so the client sees per-page progress
+                document_text = text_to_analyze
+                if body.input.driveFileId:
+                    async for event in iter_drive_document(body.input.driveFileId, body.input.accessToken):
+                        if event["type"] == "document":
+                            document_text = event["data"]["text"]
+                        else:
+                            await emit(event["type"], event["data"])
+                    
+                    if not document_text:
+                        await emit("error", {"error": "No text provided or extracted"})
+                        return
+                
+                # Cached results replay instantly; an identical analysis already streaming in this
+                # worker is shared rather than started again
+                result_cache_key = analysis_cache_key(PREFIX, document_text, body.input.questions)
+                events = analysis_flights.stream(
+                    result_cache_key,
+                    lambda: analysis_event_source(result_cache_key, document_text, body.input.questions)
+                )
                 
-                # Stream analysis from OpenAI
-                async for event in analyze_contract_stream(
-                    text_to_analyze, 
-                    {"questions": body.input.questions}
-                ):
+                async for event in events:
                     event_type = event.get("type", "message")
                     event_data = event.get("data", {})
                     
-                    # Forward the event to the client
-                    yield format_sse_event(event_type, event_data)
+                    # Log the event for every connected (or reconnecting) client
+                    await emit(event_type, event_data)
                     
                     # Collect clauses for saving
                     if event_type == "clause":
@@ -573,10 +1395,6 @@ async def run_agent_stream(body: RunBody, request: Request):
                     elif event_type == "summary":
                         final_summary = event_data.get("summary")
                         overall_risk = event_data.get("overallRisk", "medium")
-                    
-                    # Small delay between clause events for visual effect
-                    if event_type == "clause":
-                        await asyncio.sleep(0.3)
                 
                 # Save results to database after streaming completes
                 try:
@@ -595,32 +1413,38 @@ async def run_agent_stream(body: RunBody, request: Request):
                         "payload": json.dumps(body.input.model_dump(exclude={"accessToken"})),
                         "result": json.dumps(result_data)
                     }
-                    execute_insert("jobs", db_job)
-                    
                     # Save messages
+                    user_at, assistant_at = message_timestamps(2)
                     user_msg = {
                         "project_id": body.projectId,
                         "role": "user",
                         "content": "(streaming analysis)",
-                        "meta": json.dumps({"jobId": job_id, "streaming": True})
+                        "meta": json.dumps({"jobId": job_id, "streaming": True}),
+                        "created_at": user_at
                     }
-                    execute_insert("messages", user_msg)
                     
                     assistant_msg = {
                         "project_id": body.projectId,
                         "role": "assistant",
                         "content": final_summary or "Analysis complete.",
-                        "meta": json.dumps({"jobId": job_id, "risk": overall_risk, "clauseCount": len(collected_clauses)})
+                        "meta": json.dumps({"jobId": job_id, "risk": overall_risk, "clauseCount": len(collected_clauses)}),
+                        "created_at": assistant_at
                     }
-                    execute_insert("messages", assistant_msg)
+                    # Job row, both messages and the clause rows in one transaction and one round trip
+                    unit = (
+                        UnitOfWork()
+                        .insert("jobs", db_job)
+                        .insert("messages", user_msg)
+                        .insert("messages", assistant_msg)
+                    )
+                    add_clauses(unit, job_id, body.projectId, collected_clauses)
+                    await persist(unit, wait=True)
                     
-                    # Cache in Redis
+                    # Cache in Redis, once the rows are committed
+                    done_state = {"id": job_id, "status": "done", "result": result_data}
+                    cache_job_state(job_id, done_state)
                     if redis:
-                        redis.set(f"{PREFIX}:job:{job_id}", json.dumps({
-                            "id": job_id,
-                            "status": "done",
-                            "result": result_data
-                        }))
+                        await redis.set(job_state_key(job_id), json.dumps(done_state))
                     
                 except Exception as save_error:
                     print(f"Failed to save streaming results: {save_error}")
@@ -628,10 +1452,36 @@ async def run_agent_stream(body: RunBody, request: Request):
                 
             except Exception as e:
                 print(f"Streaming error: {e}")
-                yield format_sse_event("error", {"error": str(e)})
+                await emit("error", {"error": str(e)})
+            finally:
+                await stream_log.close(redis, job_id)
+                # A failed analysis isn't worth replaying: let a retry start a fresh one
+                if failed and idempotency:
+                    await release_idempotency_key(redis, idempotency[0], record)
+        
+        # The job event goes in before the producer starts, so the log exists once the response begins
+        await stream_log.append(redis, job_id, "job", {"jobId": job_id, "projectId": body.projectId})
+        # Recorded only once the log exists, so a concurrent retry that loses the race can replay it right away
+        record = {"jobId": job_id, "fingerprint": fingerprint}
+        if idempotency:
+            try:
+                original_job_id = replayed_job_id(
+                    await claim_idempotency_key(redis, idempotency[0], idempotency[1], record), fingerprint
+                )
+            except Exception:
+                await stream_log.discard(redis, job_id)
+                raise
+            if original_job_id:
+                # Lost the race to an identical request: this job never runs, so its log goes too
+                await stream_log.discard(redis, job_id)
+                return replayed_stream_response(original_job_id)
+        producer = asyncio.create_task(generate_stream())
+        stream_producers.add(producer)
+        producer.add_done_callback(stream_producers.discard)
         
         return StreamingResponse(
-            generate_stream(),
+            # Heartbeats while the model is thinking; events that pile up behind a slow client go out together
+            sse_stream(follow_job_stream(job_id)),
             media_type="text/event-stream",
             headers={
                 "Cache-Control": "no-cache",
@@ -640,6 +1490,21 @@ async def run_agent_stream(body: RunBody, request: Request):
             }
         )
         
+    except HTTPException as e:
+        # Invalid or reused Idempotency-Key (`e` is unbound once the except block ends, so copy it)
+        detail = e.detail
+        async def request_error():
+            yield format_sse_event("error", {"error": detail})
+        return StreamingResponse(
+            request_error(),
+            status_code=e.status_code,
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "Connection": "keep-alive",
+                "X-Accel-Buffering": "no",
+            }
+        )
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -658,6 +1523,42 @@ async def run_agent_stream(body: RunBody, request: Request):
         )
 
 
+@app.get("/jobs/{job_id}/stream")
+async def resume_job_stream(
+    job_id: str,
+    request: Request,
+    after: Optional[int] = Query(None, ge=0, description="Replay events with a greater id (default: Last-Event-ID header)")
+):
+    """
+    Watch or resume a /agent/run/stream analysis: replays the events after `after`, then follows the live stream.
+    404 once the stream log has expired; the finished job is still available from GET /jobs/{id}.
+    """
+    if after is None:
+        last_event_id = request.headers.get("last-event-id")
+        try:
+            after = int(last_event_id) if last_event_id else 0
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+    
+    try:
+        logged = await stream_log.read(redis, job_id, after)
+    except Exception as e:
+        print(f"Stream log read failed: {e}")
+        raise HTTPException(status_code=500, detail="Failed to load stream")
+    if logged is None:
+        raise HTTPException(status_code=404, detail="Stream not found or expired")
+    
+    return StreamingResponse(
+        sse_stream(follow_job_stream(job_id, after)),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+
 # =============================================================================
 # NEGOTIATION TIPS ENDPOINT
 # =============================================================================
@@ -670,44 +1571,107 @@ class NegotiationTipsRequest(BaseModel):
     context: Optional[str] = None
 
 
+async def call_negotiation_tips(body: NegotiationTipsRequest) -> Dict[str, Any]:
+    return await generate_negotiation_tips(
+        clause_text=body.clauseText,
+        clause_type=body.clauseType,
+        risk_level=body.riskLevel,
+        clause_title=body.clauseTitle or "",
+        context=body.context or ""
+    )
+
+async def wait_for_remote_tips(cache_key: str) -> Optional[Dict[str, Any]]:
+    """
+    Another worker holds the tips lock: wait for its fresh tips to land in the cache.
+    Returns None if the owner released the lock (or it expired) without caching them.
+    """
+    lock_key = f"{cache_key}:lock"
+    deadline = time.monotonic() + TIPS_LOCK_TTL_SECONDS
+    while True:
+        cached = await get_cached_tips(redis, cache_key)
+        if cached and not cached[1]:
+            return cached[0]
+        if time.monotonic() >= deadline or not await lock_held(redis, lock_key):
+            return None
+        await asyncio.sleep(TIPS_LOCK_POLL_SECONDS)
+
+async def generate_tips_once(cache_key: str, body: NegotiationTipsRequest, wait: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Generate and cache tips at most once per cache key at a time.
+    Callers in this worker share one OpenAI call; callers in other workers wait on the Redis lock
+    and pick the result up from the cache. With wait=False (background refresh) they give up instead.
+    """
+    lock_key = f"{cache_key}:lock"
+
+    async def generate():
+        token = await acquire_lock(redis, lock_key, TIPS_LOCK_TTL_SECONDS)
+        if not token:
+            if not wait:
+                return None
+            cached = await wait_for_remote_tips(cache_key)
+            if cached:
+                return cached
+            # Owner finished without caching fresh tips (e.g. OpenAI failed); run it here
+            token = await acquire_lock(redis, lock_key, TIPS_LOCK_TTL_SECONDS)
+        try:
+            result = await call_negotiation_tips(body)
+            await store_tips(redis, cache_key, result)
+            return result
+        finally:
+            if token:
+                await release_lock(redis, lock_key, token)
+
+    return await tips_flights.run(cache_key, generate)
+
+def refresh_tips_in_background(cache_key: str, body: NegotiationTipsRequest):
+    """Regenerate stale tips without making the current request wait (once per key across workers)"""
+    if tips_flights.in_flight(cache_key):
+        return
+
+    async def refresh():
+        try:
+            await generate_tips_once(cache_key, body, wait=False)
+        except Exception as e:
+            print(f"Tips refresh failed: {e}")
+
+    task = asyncio.create_task(refresh())
+    tips_refresh_tasks.add(task)
+    task.add_done_callback(tips_refresh_tasks.discard)
+
+
 @app.post("/negotiate/tips")
-async def get_negotiation_tips(body: NegotiationTipsRequest):
+async def get_negotiation_tips(body: NegotiationTipsRequest, request: Request):
     """
     Generate smart negotiation tips for a specific clause.
     Returns AI-powered suggestions for improving contract terms.
+    Cached tips are served immediately; stale ones are refreshed in the background.
     """
     try:
-        # Optional: Check cache first
-        cache_key = None
-        if redis:
-            import hashlib
-            clause_hash = hashlib.md5(body.clauseText.encode()).hexdigest()[:16]
-            cache_key = f"{PREFIX}:tips:{clause_hash}"
-            cached = redis.get(cache_key)
-            if cached:
-                try:
-                    return json.loads(cached)
-                except:
-                    pass
-        
-        # Generate tips using OpenAI
-        result = await generate_negotiation_tips(
-            clause_text=body.clauseText,
-            clause_type=body.clauseType,
-            risk_level=body.riskLevel,
-            clause_title=body.clauseTitle or "",
-            context=body.context or ""
+        cache_key = tips_cache_key(
+            PREFIX, body.clauseText, body.clauseType, body.riskLevel, body.clauseTitle, body.context
         )
-        
-        # Cache the result for 1 hour
-        if redis and cache_key and result.get("tips"):
-            try:
-                redis.set(cache_key, json.dumps(result), ex=3600)
-            except Exception as e:
-                print(f"Failed to cache tips: {e}")
-        
+        cached = await get_cached_tips(redis, cache_key)
+        if cached:
+            result, stale = cached
+            if stale:
+                refresh_tips_in_background(cache_key, body)
+            return result
+
+        # Only calls that reach OpenAI count against the budget; joining one already running here is free
+        if not tips_flights.in_flight(cache_key):
+            rate = await check_rate_limit(request, "negotiate_tips", tokens=estimate_analysis_tokens(body.clauseText))
+            if not rate.allowed:
+                raise HTTPException(status_code=429, detail="Rate limit exceeded", headers=rate_limit_headers(rate))
+
+        result = await generate_tips_once(cache_key, body)
+        if result is None:
+            # Joined a background refresh that yielded to another worker's lock: wait for that
+            # worker's tips like any foreground caller, and only generate here if it gave up
+            result = await wait_for_remote_tips(cache_key) or await generate_tips_once(cache_key, body)
         return result
-        
+
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
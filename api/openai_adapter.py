@@ -1,15 +1,97 @@
 import os
 import json
+import asyncio
 import logging
 import uuid
-from typing import Dict, Any, List, Optional, AsyncGenerator
+from typing import Dict, Any, List, Optional, AsyncGenerator, Tuple
+import httpx
 from openai import AsyncOpenAI
 from pydantic import BaseModel, Field
 
+try:
+    from api.incremental_json import ArrayItemStreamParser
+    from api.chunking import split_contract, merge_clauses, combine_overall_risk, is_duplicate_clause
+except ImportError:
+    from incremental_json import ArrayItemStreamParser
+    from chunking import split_contract, merge_clauses, combine_overall_risk, is_duplicate_clause
+
 # Configure logger
 logger = logging.getLogger("openai_adapter")
 logger.setLevel(logging.INFO)
 
+# HTTP connection pool for the shared OpenAI client
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+OPENAI_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_SECONDS", "60"))
+OPENAI_HTTP2 = os.getenv("OPENAI_HTTP2", "false").lower() in ("1", "true", "yes")
+OPENAI_CONNECT_TIMEOUT_SECONDS = float(os.getenv("OPENAI_CONNECT_TIMEOUT_SECONDS", "10"))
+# Read timeout covers the gap between streamed chunks, not the whole completion
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "120"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+ANALYSIS_MODEL = os.getenv("OPENAI_ANALYSIS_MODEL", "gpt-4.1-mini")
+# Bump whenever an analysis prompt changes so cached results from the old prompt are not served
+ANALYSIS_PROMPT_VERSION = "4"
+
+TIPS_MODEL = os.getenv("OPENAI_TIPS_MODEL", "gpt-4.1-mini")
+# Bump whenever the negotiation tips prompt changes (part of the tips cache key)
+TIPS_PROMPT_VERSION = "1"
+
+# Contracts longer than this are analyzed in section-aligned parts instead of being truncated
+ANALYSIS_CHUNK_CHARS = int(os.getenv("ANALYSIS_CHUNK_CHARS", "24000"))
+# Max concurrent OpenAI calls per analysis when a contract is split into parts
+ANALYSIS_MAX_CONCURRENCY = int(os.getenv("ANALYSIS_MAX_CONCURRENCY", "4"))
+
+# App-lifetime client so analyses re-use warm keep-alive connections instead of a new TLS handshake each
+_client: Optional[AsyncOpenAI] = None
+
+
+def init_openai_client() -> Optional[AsyncOpenAI]:
+    """Create the shared OpenAI client (returns None if OPENAI_API_KEY is not set)"""
+    global _client
+
+    if _client:
+        return _client
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return None
+
+    http2 = OPENAI_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("OPENAI_HTTP2 is set but the h2 package is not installed, using HTTP/1.1")
+            http2 = False
+
+    http_client = httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(OPENAI_TIMEOUT_SECONDS, connect=OPENAI_CONNECT_TIMEOUT_SECONDS),
+    )
+    _client = AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=OPENAI_MAX_RETRIES)
+    logger.info(f"OpenAI client initialized (pool {OPENAI_MAX_CONNECTIONS}, http2={http2})")
+    return _client
+
+
+def get_openai_client() -> Optional[AsyncOpenAI]:
+    """Return the shared OpenAI client, creating it on first use"""
+    return _client or init_openai_client()
+
+
+async def close_openai_client():
+    """Close the shared OpenAI client and its connection pool"""
+    global _client
+
+    if _client:
+        await _client.close()
+        _client = None
+
 class Clause(BaseModel):
     id: str = Field(description="Unique UUID for the clause")
     type: str = Field(description="Type of the clause (payment, ip, confidentiality, termination, liability, other)")
@@ -25,19 +107,7 @@ class ContractAnalysis(BaseModel):
     summary: str = Field(description="Executive summary of the contract")
     clauses: List[Clause] = Field(description="List of extracted key clauses")
 
-async def analyze_contract(text: str, options: Dict[str, Any] = None) -> Dict[str, Any]:
-    """
-    Analyzes a contract text using OpenAI to extract clauses and assess risk.
-    Returns a dictionary matching the ContractAnalysis schema.
-    """
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        logger.warning("OPENAI_API_KEY not found. Returning stubbed error.")
-        return {"error": "Missing OpenAI API Key"}
-
-    client = AsyncOpenAI(api_key=api_key)
-    
-    system_prompt = """You are ContractCoach, an expert contract lawyer and trusted AI advisor.
+ANALYSIS_SYSTEM_PROMPT = """You are ContractCoach, an expert contract lawyer and trusted AI advisor.
 
 Your mission is to help non-lawyers understand contracts by:
 1. Identifying the most important clauses that could impact them financially or legally
@@ -54,55 +124,8 @@ ANALYSIS GUIDELINES:
 - Keep summaries conversational and jargon-free
 
 TONE: Be helpful and protective of the user's interests, like a trusted advisor explaining things to a friend."""
-    
-    user_prompt = f"Analyze the following contract text:\n\n{text[:50000]}" # Truncate for safety if needed
-
-    if options and options.get("questions"):
-        user_prompt += f"\n\nAlso answer these specific questions in your summary: {', '.join(options['questions'])}"
-
-    try:
-        completion = await client.beta.chat.completions.parse(
-            model="gpt-4.1-mini", # Using a known structured-output capable model
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            response_format=ContractAnalysis,
-        )
-        
-        result = completion.choices[0].message.parsed
-        return result.model_dump()
-        
-    except Exception as e:
-        logger.error(f"OpenAI analysis failed: {e}")
-        raise e
 
-
-async def analyze_contract_stream(
-    text: str, 
-    options: Dict[str, Any] = None
-) -> AsyncGenerator[Dict[str, Any], None]:
-    """
-    Streams contract analysis results clause-by-clause using OpenAI.
-    
-    Yields events:
-    - {"type": "status", "data": {"status": "starting"}}
-    - {"type": "progress", "data": {"current": 1, "total": 5, "message": "..."}}
-    - {"type": "clause", "data": {clause_object}}
-    - {"type": "summary", "data": {"overallRisk": "...", "summary": "..."}}
-    - {"type": "complete", "data": {"status": "done"}}
-    """
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        yield {"type": "error", "data": {"error": "Missing OpenAI API Key"}}
-        return
-
-    client = AsyncOpenAI(api_key=api_key)
-    
-    # Yield starting status
-    yield {"type": "status", "data": {"status": "starting", "message": "Initializing analysis..."}}
-    
-    system_prompt = """You are ContractCoach, an expert contract lawyer and trusted AI advisor who helps non-lawyers understand contracts.
+STREAMING_ANALYSIS_SYSTEM_PROMPT = """You are ContractCoach, an expert contract lawyer and trusted AI advisor who helps non-lawyers understand contracts.
 
 YOUR MISSION: Review contracts and explain them like a trusted friend who happens to be a brilliant lawyer. Be protective of the user's interests.
 
@@ -140,11 +163,183 @@ CLAUSE SELECTION PRIORITY:
 
 Return 5-10 clauses depending on contract length. Always include liability/indemnification if present."""
 
+
+SUMMARY_SYSTEM_PROMPT = """You are ContractCoach. You are given the summaries of consecutive parts of one contract.
+Write a single summary of the whole contract in 2-4 plain-English sentences for a non-lawyer:
+what the agreement is, the most important risks, and anything the user should negotiate.
+Keep any answers to the user's questions. Reply with the summary only."""
+
+
+def _part_note(part: int, total_parts: int) -> str:
+    """Prompt addendum telling the model it only sees one section of a longer contract"""
+    if total_parts <= 1:
+        return ""
+    return (
+        f"\n\nNOTE: This is part {part} of {total_parts} of a longer contract, split on section boundaries. "
+        "Only report clauses that appear in this part, and base the risk assessment and summary on this part alone."
+    )
+
+
+async def _combine_summaries(client: AsyncOpenAI, summaries: List[str], options: Optional[Dict[str, Any]]) -> str:
+    """
+    One short model pass turning the per-part summaries into a summary of the whole contract.
+    If it fails, the first part's summary is kept and says how many parts there were.
+    """
+    total_parts = len(summaries)
+    summaries = [summary for summary in summaries if summary]
+    if len(summaries) <= 1:
+        return summaries[0] if summaries else "Analysis complete."
+
+    user_prompt = "\n\n".join(f"Part {i}: {summary}" for i, summary in enumerate(summaries, 1))
+    if options and options.get("questions"):
+        user_prompt += f"\n\nThe user asked: {', '.join(options['questions'])}"
+
+    try:
+        completion = await client.chat.completions.create(
+            model=ANALYSIS_MODEL,
+            messages=[
+                {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt},
+            ],
+            temperature=0.3,
+            max_tokens=300,
+        )
+        summary = (completion.choices[0].message.content or "").strip()
+        if summary:
+            return summary
+    except Exception as e:
+        logger.warning(f"Summary pass failed, keeping the first part's summary: {e}")
+    return f"{summaries[0]} (Summary of part 1 of {total_parts}; the clauses cover the whole contract.)"
+
+
+async def _reduce_analyses(
+    client: AsyncOpenAI,
+    parts: List[Dict[str, Any]],
+    options: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Combine per-chunk analyses into one ContractAnalysis-shaped result"""
+    summaries = [(part.get("summary") or "").strip() for part in parts]
+    return {
+        "overallRisk": combine_overall_risk(part.get("overallRisk") for part in parts),
+        "summary": await _combine_summaries(client, summaries, options),
+        "clauses": merge_clauses(part.get("clauses", []) for part in parts),
+    }
+
+
+async def _analyze_chunk(
+    client: AsyncOpenAI,
+    text: str,
+    options: Optional[Dict[str, Any]],
+    part: int = 1,
+    total_parts: int = 1
+) -> Dict[str, Any]:
+    """Structured-output analysis of one chunk of contract text"""
+    user_prompt = f"Analyze the following contract text:\n\n{text}" + _part_note(part, total_parts)
+
+    if options and options.get("questions"):
+        user_prompt += f"\n\nAlso answer these specific questions in your summary: {', '.join(options['questions'])}"
+
+    completion = await client.beta.chat.completions.parse(
+        model=ANALYSIS_MODEL, # Using a known structured-output capable model
+        messages=[
+            {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ],
+        response_format=ContractAnalysis,
+    )
+    
+    result = completion.choices[0].message.parsed
+    return result.model_dump()
+
+
+async def analyze_contract(text: str, options: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    Analyzes a contract text using OpenAI to extract clauses and assess risk.
+    Returns a dictionary matching the ContractAnalysis schema.
+    Contracts longer than ANALYSIS_CHUNK_CHARS are split on section boundaries, analyzed
+    concurrently (at most ANALYSIS_MAX_CONCURRENCY calls at once) and merged.
+    """
+    client = get_openai_client()
+    if not client:
+        logger.warning("OPENAI_API_KEY not found. Returning stubbed error.")
+        return {"error": "Missing OpenAI API Key"}
+    
+    chunks = split_contract(text, ANALYSIS_CHUNK_CHARS)
+    semaphore = asyncio.Semaphore(ANALYSIS_MAX_CONCURRENCY)
+
+    async def analyze_part(part: int, chunk: str) -> Dict[str, Any]:
+        async with semaphore:
+            return await _analyze_chunk(client, chunk, options, part, len(chunks))
+
+    try:
+        if len(chunks) == 1:
+            return await _analyze_chunk(client, text, options)
+
+        logger.info(f"Analyzing contract in {len(chunks)} parts ({len(text)} chars)")
+        parts = await asyncio.gather(*(analyze_part(i + 1, chunk) for i, chunk in enumerate(chunks)))
+        return await _reduce_analyses(client, parts, options)
+        
+    except Exception as e:
+        logger.error(f"OpenAI analysis failed: {e}")
+        raise e
+
+
+def _clause_events(clause: Dict[str, Any], index: int) -> List[Dict[str, Any]]:
+    """Progress + clause events for one streamed clause (total is unknown until the model finishes)"""
+    # Add unique ID if not present
+    if "id" not in clause:
+        clause["id"] = str(uuid.uuid4())
+    
+    return [
+        {
+            "type": "progress",
+            "data": {
+                "current": index,
+                "total": 0,
+                "message": f"Analyzing {clause.get('title', 'clause')}..."
+            }
+        },
+        {"type": "clause", "data": clause},
+    ]
+
+
+def _parse_json_response(response: str) -> Dict[str, Any]:
+    """Parse the model's full JSON response, tolerating markdown code fences"""
+    # Clean up response (remove markdown code blocks if present)
+    clean_response = response.strip()
+    if clean_response.startswith("```json"):
+        clean_response = clean_response[7:]
+    if clean_response.startswith("```"):
+        clean_response = clean_response[3:]
+    if clean_response.endswith("```"):
+        clean_response = clean_response[:-3]
+    clean_response = clean_response.strip()
+    
+    try:
+        return json.loads(clean_response)
+    except json.JSONDecodeError as e:
+        logger.error(f"JSON parse error: {e}")
+        logger.error(f"Response was: {clean_response[:500]}")
+        raise ValueError(f"Failed to parse AI response: {str(e)}")
+
+
+async def _stream_chunk(
+    client: AsyncOpenAI,
+    text: str,
+    options: Optional[Dict[str, Any]],
+    part: int = 1,
+    total_parts: int = 1
+) -> AsyncGenerator[Tuple[str, Any], None]:
+    """
+    Stream the analysis of one chunk of contract text.
+    Yields ("open", None) once tokens start flowing, ("clause", clause) as soon as each clause
+    is complete, then ("result", parsed_response). Raises ValueError if the response isn't valid JSON.
+    """
     user_prompt = f"""Analyze this contract from the perspective of someone who would be SIGNING it (the receiving party).
 
 CONTRACT TEXT:
 ---
-{text[:50000]}
+{text}
 ---
 
 Instructions:
@@ -153,81 +348,129 @@ Instructions:
 3. For each clause, explain what it means and why it matters
 4. Suggest specific improvements where clauses are unfavorable
 
-Return ONLY the JSON response, no other text."""
+Return ONLY the JSON response, no other text.""" + _part_note(part, total_parts)
     
     if options and options.get("questions"):
         user_prompt += f"\n\n🔍 USER QUESTIONS (incorporate answers into your summary):\n- " + "\n- ".join(options['questions'])
     
-    yield {"type": "status", "data": {"status": "analyzing", "message": "Analyzing contract with AI..."}}
+    # Parse clauses out of the token stream as soon as each one is complete
+    parser = ArrayItemStreamParser("clauses")
+    
+    stream = await client.chat.completions.create(
+        model=ANALYSIS_MODEL,
+        messages=[
+            {"role": "system", "content": STREAMING_ANALYSIS_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ],
+        stream=True,
+        temperature=0.3,  # More deterministic for structured output
+    )
+    
+    yield "open", None
+    
+    async for chunk in stream:
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+        for clause in parser.feed(chunk.choices[0].delta.content):
+            yield "clause", clause
+    
+    result = _parse_json_response(parser.text)
+    
+    # Anything the incremental parser couldn't recognise mid-stream goes out now, by position,
+    # since a clause that failed to decode can sit between ones that were streamed
+    for index, clause in enumerate(result.get("clauses", [])):
+        if index not in parser.emitted:
+            yield "clause", clause
+    
+    yield "result", result
+
+
+async def analyze_contract_stream(
+    text: str, 
+    options: Dict[str, Any] = None
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Streams contract analysis results clause-by-clause using OpenAI.
+    Long contracts are split into section-aligned parts that stream concurrently;
+    clauses are forwarded as soon as any part produces them, with duplicates dropped.
+    
+    Yields events:
+    - {"type": "status", "data": {"status": "starting"}}
+    - {"type": "progress", "data": {"current": 1, "total": 0, "message": "..."}}
+    - {"type": "clause", "data": {clause_object}}
+    - {"type": "summary", "data": {"overallRisk": "...", "summary": "..."}}
+    - {"type": "complete", "data": {"status": "done"}}
+    """
+    client = get_openai_client()
+    if not client:
+        yield {"type": "error", "data": {"error": "Missing OpenAI API Key"}}
+        return
+    
+    # Yield starting status
+    yield {"type": "status", "data": {"status": "starting", "message": "Initializing analysis..."}}
+    
+    chunks = split_contract(text, ANALYSIS_CHUNK_CHARS)
+    message = "Analyzing contract with AI..."
+    if len(chunks) > 1:
+        message = f"Analyzing contract with AI ({len(chunks)} sections in parallel)..."
+    yield {"type": "status", "data": {"status": "analyzing", "message": message}}
+    
+    # Fan the per-part streams into one queue so clauses go out in arrival order
+    queue: asyncio.Queue = asyncio.Queue()
+    semaphore = asyncio.Semaphore(ANALYSIS_MAX_CONCURRENCY)
+
+    async def run_part(part: int, chunk: str):
+        try:
+            async with semaphore:
+                async for kind, payload in _stream_chunk(client, chunk, options, part, len(chunks)):
+                    if kind == "result":
+                        payload = (part, payload)
+                    await queue.put((kind, payload))
+        except Exception as e:
+            await queue.put(("error", e))
+        finally:
+            await queue.put(("done", part))
+
+    tasks = [asyncio.create_task(run_part(i + 1, chunk)) for i, chunk in enumerate(chunks)]
     
     try:
-        # Use streaming to get the response progressively
-        full_response = ""
-        
-        stream = await client.chat.completions.create(
-            model="gpt-4.1-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            stream=True,
-            temperature=0.3,  # More deterministic for structured output
-        )
-        
-        yield {"type": "status", "data": {"status": "streaming", "message": "Receiving analysis..."}}
+        results = {}
+        seen_clauses = set()
+        clause_count = 0
+        streaming_announced = False
+        remaining = len(tasks)
         
-        async for chunk in stream:
-            if chunk.choices[0].delta.content:
-                full_response += chunk.choices[0].delta.content
+        while remaining:
+            kind, payload = await queue.get()
+            if kind == "done":
+                remaining -= 1
+            elif kind == "error":
+                raise payload
+            elif kind == "open" and not streaming_announced:
+                streaming_announced = True
+                yield {"type": "status", "data": {"status": "streaming", "message": "Receiving analysis..."}}
+            elif kind == "clause":
+                if len(chunks) > 1 and is_duplicate_clause(payload, seen_clauses):
+                    continue
+                clause_count += 1
+                for event in _clause_events(payload, clause_count):
+                    yield event
+            elif kind == "result":
+                part, result = payload
+                results[part] = result
         
-        # Parse the complete JSON response
         yield {"type": "status", "data": {"status": "parsing", "message": "Processing results..."}}
         
-        # Clean up response (remove markdown code blocks if present)
-        clean_response = full_response.strip()
-        if clean_response.startswith("```json"):
-            clean_response = clean_response[7:]
-        if clean_response.startswith("```"):
-            clean_response = clean_response[3:]
-        if clean_response.endswith("```"):
-            clean_response = clean_response[:-3]
-        clean_response = clean_response.strip()
-        
-        try:
-            result = json.loads(clean_response)
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON parse error: {e}")
-            logger.error(f"Response was: {clean_response[:500]}")
-            yield {"type": "error", "data": {"error": f"Failed to parse AI response: {str(e)}"}}
-            return
-        
-        clauses = result.get("clauses", [])
-        total_clauses = len(clauses)
-        
-        # Stream each clause with a small delay for visual effect
-        for i, clause in enumerate(clauses):
-            # Add unique ID if not present
-            if "id" not in clause:
-                clause["id"] = str(uuid.uuid4())
-            
-            yield {
-                "type": "progress", 
-                "data": {
-                    "current": i + 1, 
-                    "total": total_clauses,
-                    "message": f"Analyzing {clause.get('title', 'clause')}..."
-                }
-            }
-            
-            yield {"type": "clause", "data": clause}
+        ordered = [results[part] for part in sorted(results)]
+        combined = ordered[0] if len(ordered) == 1 else await _reduce_analyses(client, ordered, options)
         
         # Send final summary
         yield {
             "type": "summary", 
             "data": {
-                "overallRisk": result.get("overallRisk", "medium"),
-                "summary": result.get("summary", "Analysis complete."),
-                "totalClauses": total_clauses
+                "overallRisk": combined.get("overallRisk", "medium"),
+                "summary": combined.get("summary", "Analysis complete."),
+                "totalClauses": clause_count
             }
         }
         
@@ -236,6 +479,9 @@ Return ONLY the JSON response, no other text."""
     except Exception as e:
         logger.error(f"Streaming analysis failed: {e}")
         yield {"type": "error", "data": {"error": str(e)}}
+    finally:
+        for task in tasks:
+            task.cancel()
 
 
 # ============================================================================
@@ -275,12 +521,10 @@ async def generate_negotiation_tips(
     Returns:
         Dictionary with 'tips' array containing negotiation suggestions
     """
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
+    client = get_openai_client()
+    if not client:
         logger.warning("OPENAI_API_KEY not found. Returning empty tips.")
         return {"tips": [], "error": "Missing OpenAI API Key"}
-
-    client = AsyncOpenAI(api_key=api_key)
     
     system_prompt = """You are ContractCoach's Negotiation Expert, a seasoned contract negotiator who has handled thousands of deals.
 
@@ -335,7 +579,7 @@ Order tips from highest confidence to lowest. Make the first tip something they'
 
     try:
         completion = await client.beta.chat.completions.parse(
-            model="gpt-4.1-mini",
+            model=TIPS_MODEL,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt},
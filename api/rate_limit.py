@@ -0,0 +1,171 @@
+# Sliding-window rate limiting with weighted budgets (requests and estimated OpenAI tokens)
+# One atomic Lua call checks every budget a request draws from and records it only if all of them allow it;
+# an in-process limiter with the same semantics takes over whenever Redis is missing or unreachable.
+import math
+import os
+import time
+import uuid
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional, Tuple
+
+# Budgets are "<amount>/<window seconds>"; empty or 0 disables that budget
+RATE_LIMIT_AGENT_RUN = os.getenv("RATE_LIMIT_AGENT_RUN", "5/60")
+RATE_LIMIT_NEGOTIATE_TIPS = os.getenv("RATE_LIMIT_NEGOTIATE_TIPS", "30/60")
+# Whole batches (POST /agent/run/batch); their contracts still draw from the token budget
+RATE_LIMIT_AGENT_RUN_BATCH = os.getenv("RATE_LIMIT_AGENT_RUN_BATCH", "2/60")
+# Requests per project across all analysis routes
+RATE_LIMIT_PROJECT = os.getenv("RATE_LIMIT_PROJECT", "20/60")
+# Estimated OpenAI tokens per client, so a few huge contracts cost as much as many small ones
+RATE_LIMIT_TOKENS = os.getenv("RATE_LIMIT_TOKENS", "500000/3600")
+# Prompt + completion overhead per analysis, and the estimate for Drive files (size unknown up front)
+RATE_LIMIT_ANALYSIS_OVERHEAD_TOKENS = int(os.getenv("RATE_LIMIT_ANALYSIS_OVERHEAD_TOKENS", "3000"))
+RATE_LIMIT_DRIVE_FILE_TOKENS = int(os.getenv("RATE_LIMIT_DRIVE_FILE_TOKENS", "20000"))
+
+# KEYS: one sorted set per budget. ARGV: now_ms, request id, then (limit, window_ms, cost) per key.
+# Members are "<request id>:<cost>" scored by time; expired members are trimmed on every call.
+# Returns {1, 0, 0} if recorded, else {0, retry_after_ms, index of the first exhausted budget}.
+SLIDING_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local blocked = 0
+local retry_after = 0
+for i = 1, #KEYS do
+    local limit = tonumber(ARGV[3 * i])
+    local window = tonumber(ARGV[3 * i + 1])
+    local cost = tonumber(ARGV[3 * i + 2])
+    redis.call('ZREMRANGEBYSCORE', KEYS[i], '-inf', now - window)
+    local entries = redis.call('ZRANGE', KEYS[i], 0, -1, 'WITHSCORES')
+    local used = 0
+    for j = 1, #entries, 2 do
+        used = used + tonumber(string.match(entries[j], ':(%d+)$'))
+    end
+    if used + cost > limit then
+        -- Wait until enough of the oldest entries have left the window
+        local excess = used + cost - limit
+        local wait = window
+        for j = 1, #entries, 2 do
+            excess = excess - tonumber(string.match(entries[j], ':(%d+)$'))
+            if excess <= 0 then
+                wait = tonumber(entries[j + 1]) + window - now
+                break
+            end
+        end
+        if blocked == 0 then blocked = i end
+        if wait > retry_after then retry_after = wait end
+    end
+end
+if blocked > 0 then
+    return {0, retry_after, blocked}
+end
+for i = 1, #KEYS do
+    redis.call('ZADD', KEYS[i], now, ARGV[2] .. ':' .. ARGV[3 * i + 2])
+    redis.call('PEXPIRE', KEYS[i], ARGV[3 * i + 1])
+end
+return {1, 0, 0}
+"""
+
+
+class RateLimitPolicy(NamedTuple):
+    name: str
+    limit: int
+    window_seconds: int
+
+
+class RateLimitCheck(NamedTuple):
+    key: str
+    policy: RateLimitPolicy
+    cost: int = 1
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    retry_after: int = 0
+    policy: Optional[str] = None
+
+
+def parse_policy(name: str, spec: Optional[str]) -> Optional[RateLimitPolicy]:
+    """'5/60' -> 5 per 60 seconds; None when the budget is disabled"""
+    if not spec or spec.strip() in ("0", ""):
+        return None
+    amount, _, window = spec.partition("/")
+    return RateLimitPolicy(name, int(amount), int(window or 60))
+
+
+ROUTE_POLICIES: Dict[str, Optional[RateLimitPolicy]] = {
+    "agent_run": parse_policy("agent_run", RATE_LIMIT_AGENT_RUN),
+    "negotiate_tips": parse_policy("negotiate_tips", RATE_LIMIT_NEGOTIATE_TIPS),
+    "agent_run_batch": parse_policy("agent_run_batch", RATE_LIMIT_AGENT_RUN_BATCH),
+}
+PROJECT_POLICY = parse_policy("project", RATE_LIMIT_PROJECT)
+TOKEN_POLICY = parse_policy("tokens", RATE_LIMIT_TOKENS)
+
+
+def estimate_analysis_tokens(text: Optional[str], drive_file: bool = False) -> int:
+    """Rough OpenAI token cost of analyzing a contract (~4 characters per token)"""
+    if not text:
+        return RATE_LIMIT_DRIVE_FILE_TOKENS if drive_file else RATE_LIMIT_ANALYSIS_OVERHEAD_TOKENS
+    return math.ceil(len(text) / 4) + RATE_LIMIT_ANALYSIS_OVERHEAD_TOKENS
+
+
+class LocalRateLimiter:
+    """In-process sliding-window log with the same semantics as SLIDING_WINDOW_SCRIPT (per worker, not shared)"""
+
+    def __init__(self):
+        self._windows: Dict[str, Deque[Tuple[float, int]]] = {}
+
+    def check(self, checks: List[RateLimitCheck], now: Optional[float] = None) -> RateLimitResult:
+        now = time.monotonic() if now is None else now
+        result = RateLimitResult(True)
+        for check in checks:
+            window = self._windows.setdefault(check.key, deque())
+            while window and window[0][0] <= now - check.policy.window_seconds:
+                window.popleft()
+            used = sum(cost for _, cost in window)
+            if used + check.cost <= check.policy.limit:
+                continue
+            excess = used + check.cost - check.policy.limit
+            wait = check.policy.window_seconds
+            for recorded_at, cost in window:
+                excess -= cost
+                if excess <= 0:
+                    wait = recorded_at + check.policy.window_seconds - now
+                    break
+            if result.allowed or wait > result.retry_after:
+                result = RateLimitResult(False, max(1, math.ceil(wait)), result.policy or check.policy.name)
+
+        if result.allowed:
+            for check in checks:
+                self._windows[check.key].append((now, check.cost))
+        # Don't let idle keys accumulate forever
+        if len(self._windows) > 10000:
+            self._windows = {key: window for key, window in self._windows.items() if window}
+        return result
+
+
+_local_limiter = LocalRateLimiter()
+
+
+async def check_rate_limits(redis, checks: List[RateLimitCheck]) -> RateLimitResult:
+    """
+    Atomically check and record every budget a request draws from (one round trip).
+    Falls back to the in-process limiter when Redis is not configured or fails.
+    """
+    # A single request bigger than a whole budget uses all of it rather than being blocked forever
+    checks = [check._replace(cost=max(1, min(check.cost, check.policy.limit))) for check in checks if check.policy]
+    if not checks:
+        return RateLimitResult(True)
+
+    if redis:
+        args: List[str] = [str(int(time.time() * 1000)), uuid.uuid4().hex]
+        for check in checks:
+            args += [str(check.policy.limit), str(check.policy.window_seconds * 1000), str(check.cost)]
+        try:
+            allowed, retry_after_ms, blocked = await redis.eval(
+                SLIDING_WINDOW_SCRIPT, keys=[check.key for check in checks], args=args
+            )
+            if int(allowed):
+                return RateLimitResult(True)
+            return RateLimitResult(False, max(1, math.ceil(int(retry_after_ms) / 1000)), checks[int(blocked) - 1].policy.name)
+        except Exception as e:
+            print(f"Rate limit check failed, using local limiter: {e}")
+
+    return _local_limiter.check(checks)
@@ -0,0 +1,154 @@
+# Async Redis access with a pluggable backend
+# REDIS_URL (redis:// or rediss://) uses native RESP via redis-py, e.g. a local Redis in dev and tests;
+# otherwise UPSTASH_REDIS_REST_URL/TOKEN use Upstash's async REST client. Neither blocks the event loop.
+# String values are compressed past a size threshold on SET and decompressed on GET (see cache_codec.py).
+import os
+from typing import Any, Dict, List, Optional
+
+try:
+    from api.cache_codec import encode_value, decode_value
+except ImportError:
+    from cache_codec import encode_value, decode_value
+
+
+class RedisBatch:
+    """
+    Commands queued and sent in one round trip: a pipeline, or MULTI/EXEC when transaction=True.
+    Command methods return the batch so calls can be chained; execute() returns the replies in order.
+    """
+
+    def __init__(self, pipe, backend: str):
+        self._pipe = pipe
+        self._backend = backend
+        # Positions of GET replies, which may need decompressing
+        self._gets: List[int] = []
+        self._size = 0
+
+    def _queue(self, command: str, *args, **kwargs) -> "RedisBatch":
+        getattr(self._pipe, command)(*args, **kwargs)
+        self._size += 1
+        return self
+
+    def get(self, key: str) -> "RedisBatch":
+        self._gets.append(self._size)
+        return self._queue("get", key)
+
+    def set(self, key: str, value: Any, ex: Optional[int] = None, nx: bool = False) -> "RedisBatch":
+        return self._queue("set", key, encode_value(value), ex=ex, nx=nx or None)
+
+    def delete(self, *keys: str) -> "RedisBatch":
+        return self._queue("delete", *keys)
+
+    def incr(self, key: str) -> "RedisBatch":
+        return self._queue("incr", key)
+
+    def expire(self, key: str, seconds: int, nx: bool = False) -> "RedisBatch":
+        return self._queue("expire", key, seconds, nx=nx)
+
+    def zadd(self, key: str, scores: Dict[str, float]) -> "RedisBatch":
+        return self._queue("zadd", key, scores)
+
+    def zcard(self, key: str) -> "RedisBatch":
+        return self._queue("zcard", key)
+
+    def rpush(self, key: str, *values: str) -> "RedisBatch":
+        return self._queue("rpush", key, *values)
+
+    def lrange(self, key: str, start: int, end: int) -> "RedisBatch":
+        return self._queue("lrange", key, start, end)
+
+    def publish(self, channel: str, message: str) -> "RedisBatch":
+        return self._queue("publish", channel, message)
+
+    async def execute(self) -> List[Any]:
+        if self._backend == "upstash":
+            replies = await self._pipe.exec()
+        else:
+            replies = await self._pipe.execute()
+        for index in self._gets:
+            replies[index] = decode_value(replies[index])
+        return replies
+
+
+class AsyncRedis:
+    """The Redis commands this app uses, with the same signatures on both backends"""
+
+    def __init__(self, client, backend: str):
+        self.client = client
+        self.backend = backend
+
+    async def get(self, key: str) -> Any:
+        return decode_value(await self.client.get(key))
+
+    async def set(self, key: str, value: Any, ex: Optional[int] = None, nx: bool = False) -> Any:
+        return await self.client.set(key, encode_value(value), ex=ex, nx=nx or None)
+
+    async def delete(self, *keys: str) -> int:
+        return await self.client.delete(*keys)
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(key)
+
+    async def expire(self, key: str, seconds: int, nx: bool = False) -> Any:
+        return await self.client.expire(key, seconds, nx=nx)
+
+    async def zadd(self, key: str, scores: Dict[str, float]) -> int:
+        return await self.client.zadd(key, scores)
+
+    async def zcard(self, key: str) -> int:
+        return await self.client.zcard(key)
+
+    async def zpopmin(self, key: str, count: int = 1) -> List[Any]:
+        return await self.client.zpopmin(key, count)
+
+    async def rpush(self, key: str, *values: str) -> int:
+        return await self.client.rpush(key, *values)
+
+    async def lrange(self, key: str, start: int, end: int) -> List[Any]:
+        return await self.client.lrange(key, start, end)
+
+    async def publish(self, channel: str, message: str) -> int:
+        return await self.client.publish(channel, message)
+
+    @property
+    def supports_pubsub(self) -> bool:
+        # Upstash's REST API can PUBLISH but has no long-lived connection to SUBSCRIBE on
+        return self.backend == "resp"
+
+    def pubsub(self):
+        """A redis-py PubSub on its own connection, or None when the backend can't subscribe"""
+        return self.client.pubsub() if self.supports_pubsub else None
+
+    async def eval(self, script: str, keys: Optional[List[str]] = None, args: Optional[List[Any]] = None) -> Any:
+        keys, args = keys or [], args or []
+        if self.backend == "upstash":
+            return await self.client.eval(script, keys=keys, args=args)
+        return await self.client.eval(script, len(keys), *keys, *args)
+
+    def pipeline(self, transaction: bool = False) -> RedisBatch:
+        if self.backend == "upstash":
+            return RedisBatch(self.client.multi() if transaction else self.client.pipeline(), self.backend)
+        return RedisBatch(self.client.pipeline(transaction=transaction), self.backend)
+
+    async def close(self):
+        if self.backend == "upstash":
+            await self.client.close()
+        else:
+            await self.client.aclose()
+
+
+def create_redis() -> Optional[AsyncRedis]:
+    """Client for the configured backend, or None when Redis isn't configured"""
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        import redis.asyncio as redis_asyncio
+
+        return AsyncRedis(redis_asyncio.from_url(redis_url, decode_responses=True), "resp")
+
+    rest_url = os.getenv("UPSTASH_REDIS_REST_URL")
+    rest_token = os.getenv("UPSTASH_REDIS_REST_TOKEN")
+    if rest_url and rest_token:
+        from upstash_redis.asyncio import Redis as UpstashRedis
+
+        return AsyncRedis(UpstashRedis(url=rest_url, token=rest_token), "upstash")
+    return None
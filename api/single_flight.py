@@ -0,0 +1,143 @@
+# Coalescing of identical in-flight work
+# Double clicks, retries and extra tabs attach to the analysis already running instead of starting another
+import asyncio
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class SharedEventStream:
+    """
+    Events from one producer, buffered so any number of consumers can replay them from the start
+    and then follow the live tail.
+    """
+
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+        self.done = False
+        self._changed = asyncio.Condition()
+
+    async def publish(self, event: Dict[str, Any]):
+        async with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    async def close(self):
+        async with self._changed:
+            self.done = True
+            self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[Dict[str, Any]]:
+        position = 0
+        while True:
+            while position < len(self.events):
+                yield self.events[position]
+                position += 1
+            if self.done:
+                return
+            async with self._changed:
+                await self._changed.wait_for(lambda: position < len(self.events) or self.done)
+
+
+class SingleFlight:
+    """
+    In-process registry of running work keyed by content hash.
+    run() shares one coroutine's result between callers; stream() shares one event stream.
+    """
+
+    def __init__(self):
+        self._results: Dict[str, asyncio.Task] = {}
+        self._streams: Dict[str, SharedEventStream] = {}
+        # Strong references so running pumps aren't garbage collected
+        self._tasks: Set[asyncio.Task] = set()
+
+    def in_flight(self, key: str) -> bool:
+        """Whether run() is currently executing for key in this worker"""
+        return key in self._results
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn once per key; concurrent callers with the same key await the same result.
+        fn runs in its own task owned by the flight, so cancelling any caller (the first one
+        included) only stops that caller's wait, never the shared work.
+        """
+        task = self._results.get(key)
+        if not task:
+            task = asyncio.create_task(fn())
+            self._results[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._results.get(key) is task:
+            del self._results[key]
+        # Retrieve it so an exception with no waiters left isn't logged as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    def stream(self, key: str, source_factory: Callable[[], AsyncIterator[Dict[str, Any]]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Subscribe to the event stream for key, starting source_factory() if nothing is running yet.
+        The source runs in its own task, so it finishes even if every subscriber disconnects.
+        """
+        shared = self._streams.get(key)
+        if not shared:
+            shared = SharedEventStream()
+            self._streams[key] = shared
+            task = asyncio.create_task(self._pump(key, shared, source_factory()))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return shared.subscribe()
+
+    async def _pump(self, key: str, shared: SharedEventStream, source: AsyncIterator[Dict[str, Any]]):
+        try:
+            async for event in source:
+                await shared.publish(event)
+        except Exception as e:
+            await shared.publish({"type": "error", "data": {"error": str(e)}})
+        finally:
+            self._streams.pop(key, None)
+            await shared.close()
+
+
+async def acquire_lock(redis, key: str, ttl_seconds: int) -> Optional[str]:
+    """
+    Take a cross-worker lock with SET NX. Returns the owner token, or None if another worker holds it.
+    Without Redis there are no other workers to coordinate with, so the lock is always granted.
+    """
+    token = str(uuid.uuid4())
+    if not redis:
+        return token
+    try:
+        if await redis.set(key, token, nx=True, ex=ttl_seconds):
+            return token
+        return None
+    except Exception as e:
+        # Fail open: duplicate work is better than no work
+        print(f"Lock acquire failed: {e}")
+        return token
+
+
+async def release_lock(redis, key: str, token: str):
+    """Release a lock only if we still own it (it may have expired and been taken over)"""
+    if not redis:
+        return
+    try:
+        await redis.eval(RELEASE_LOCK_SCRIPT, keys=[key], args=[token])
+    except Exception as e:
+        print(f"Lock release failed: {e}")
+
+
+async def lock_held(redis, key: str) -> bool:
+    if not redis:
+        return False
+    try:
+        return bool(await redis.get(key))
+    except Exception:
+        return False
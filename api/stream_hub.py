@@ -0,0 +1,146 @@
+# Fan-out of live stream events to every client watching a job (see stream_log.py)
+# Each subscriber gets a bounded queue; one that falls behind is evicted and catches up from the event log
+# instead of holding up the producer or growing without bound. Events produced in other workers arrive
+# over Redis pub/sub (RESP backend only; Upstash REST can't subscribe, so followers there poll the log).
+import asyncio
+import json
+import os
+from typing import Any, Dict, Optional, Set
+
+# Events buffered per subscriber before it counts as a slow consumer
+STREAM_SUBSCRIBER_QUEUE_SIZE = int(os.getenv("STREAM_SUBSCRIBER_QUEUE_SIZE", "256"))
+
+
+class StreamSubscription:
+    def __init__(self, job_id: str, remote: bool):
+        self.job_id = job_id
+        self.remote = remote
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_SUBSCRIBER_QUEUE_SIZE)
+        # Set when the queue overflowed; the reader re-syncs from the log and subscribes again
+        self.evicted = False
+
+
+class StreamHub:
+    """
+    Per-job sets of subscriber queues. Messages are events ({"id", "type", "data"}) or
+    {"end": <last id>} once the stream has finished.
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self._subscribers: Dict[str, Set[StreamSubscription]] = {}
+        self._pubsub = None
+        # Job channels this worker is subscribed to on Redis
+        self._channels: Set[str] = set()
+        self._listener: Optional[asyncio.Task] = None
+        # Wakes the idle listener as soon as a first channel is subscribed
+        self._channel_added = asyncio.Event()
+        self.evictions = 0
+
+    def channel(self, job_id: str) -> str:
+        return f"{self.prefix}:stream-events:{job_id}"
+
+    @property
+    def pubsub_active(self) -> bool:
+        return self._listener is not None
+
+    async def start(self, redis):
+        """Listen for events from other workers (no-op unless the Redis backend supports pub/sub)"""
+        if self._listener or not redis:
+            return
+        self._pubsub = redis.pubsub()
+        if self._pubsub is None:
+            return
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.aclose()
+            except Exception:
+                pass
+            self._pubsub = None
+            self._channels.clear()
+
+    async def subscribe(self, job_id: str, remote: bool) -> StreamSubscription:
+        """
+        Register a reader. remote=True means the producer runs in another worker, so this worker
+        subscribes to the job's Redis channel (before returning, so no later event is missed).
+        """
+        subscription = StreamSubscription(job_id, remote)
+        self._subscribers.setdefault(job_id, set()).add(subscription)
+        channel = self.channel(job_id)
+        if remote and self._pubsub is not None and channel not in self._channels:
+            try:
+                await self._pubsub.subscribe(channel)
+                self._channels.add(channel)
+                self._channel_added.set()
+            except Exception as e:
+                # The reader still catches up from the log, just by polling
+                print(f"Stream hub subscribe failed for job {job_id}: {e}")
+        return subscription
+
+    def unsubscribe(self, subscription: StreamSubscription):
+        subscribers = self._subscribers.get(subscription.job_id)
+        if subscribers:
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.job_id, None)
+        # The Redis channel itself is dropped by the listener loop once nobody in this worker watches it
+
+    def publish(self, job_id: str, message: Dict[str, Any]):
+        """Deliver a message to this worker's subscribers of the job (must run on the event loop)"""
+        for subscription in list(self._subscribers.get(job_id, ())):
+            try:
+                subscription.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                subscription.evicted = True
+                self.unsubscribe(subscription)
+                self.evictions += 1
+
+    async def _release_idle_channels(self):
+        channel_prefix = self.channel("")
+        idle = [channel for channel in self._channels if not self._subscribers.get(channel[len(channel_prefix):])]
+        if idle:
+            self._channels.difference_update(idle)
+            await self._pubsub.unsubscribe(*idle)
+
+    async def _listen(self):
+        channel_prefix = self.channel("")
+        while True:
+            try:
+                await self._release_idle_channels()
+                if not self._channels:
+                    # get_message fails on a pubsub with no subscriptions
+                    self._channel_added.clear()
+                    try:
+                        await asyncio.wait_for(self._channel_added.wait(), timeout=1.0)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message and message.get("type") == "message":
+                    job_id = message["channel"][len(channel_prefix):]
+                    self.publish(job_id, json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # redis-py reconnects and re-subscribes on the next call; readers re-sync from the log meanwhile
+                print(f"Stream hub listener error: {e}")
+                await asyncio.sleep(1.0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "jobs": len(self._subscribers),
+            "subscribers": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "redisChannels": len(self._channels),
+            "evictions": self.evictions,
+            "pubsub": self.pubsub_active,
+        }
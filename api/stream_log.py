@@ -0,0 +1,186 @@
+# Short-lived, per-job log of streaming analysis events, so a dropped SSE client can resume
+# Each event gets a monotonic id (1, 2, ...). The producer appends to an in-process log and mirrors it
+# to a Redis list. Live events reach readers through the StreamHub (in-process queues, Redis pub/sub
+# across workers); the log is what they replay from on connect and re-sync from after any gap.
+import asyncio
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+try:
+    from api.local_cache import LocalTTLCache
+    from api.stream_hub import StreamHub, StreamSubscription
+except ImportError:
+    from local_cache import LocalTTLCache
+    from stream_hub import StreamHub, StreamSubscription
+
+# How long a finished (or abandoned) stream can still be resumed
+STREAM_LOG_TTL_SECONDS = int(os.getenv("STREAM_LOG_TTL_SECONDS", "900"))
+# Readers in other workers poll Redis this often when pub/sub isn't available
+STREAM_LOG_POLL_SECONDS = float(os.getenv("STREAM_LOG_POLL_SECONDS", "0.5"))
+# A follower gives up if a live stream goes this long without a new event (e.g. its producer died)
+STREAM_LOG_IDLE_TIMEOUT_SECONDS = float(os.getenv("STREAM_LOG_IDLE_TIMEOUT_SECONDS", "300"))
+# Finished streams kept in memory per worker (running ones are always kept)
+STREAM_LOG_LOCAL_MAX_ENTRIES = int(os.getenv("STREAM_LOG_LOCAL_MAX_ENTRIES", "500"))
+# Readers fed by the hub re-check the log this often anyway, in case a pub/sub message was lost
+STREAM_LOG_RESYNC_SECONDS = 10.0
+
+
+class StreamLog:
+    """
+    Append-only event logs keyed by job id. Keys: <prefix>:stream:<job id> is the list of events
+    (JSON with id/type/data), <prefix>:stream:<job id>:end holds the last id once the stream finished.
+    """
+
+    def __init__(self, prefix: str, hub: Optional[StreamHub] = None):
+        self.prefix = prefix
+        self.hub = hub or StreamHub(prefix)
+        # job id -> {"events": [...], "done": bool, "mirrored": bool}
+        # Streams this worker is producing stay here until closed: if one were evicted or expired, its
+        # ids would restart at 1 while the Redis list kept growing. Finished streams move to the LRU.
+        self._active: Dict[str, Dict[str, Any]] = {}
+        self._local = LocalTTLCache(STREAM_LOG_LOCAL_MAX_ENTRIES)
+
+    def _key(self, job_id: str) -> str:
+        return f"{self.prefix}:stream:{job_id}"
+
+    def _lookup(self, job_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._active.get(job_id)
+        return entry if entry is not None else self._local.get(job_id)
+
+    def _entry(self, job_id: str) -> Dict[str, Any]:
+        entry = self._lookup(job_id)
+        if entry is None:
+            entry = {"events": [], "done": False, "mirrored": True}
+            self._active[job_id] = entry
+        return entry
+
+    async def _mirror(self, redis, job_id: str, entry: Dict[str, Any], write, message: Dict[str, Any]):
+        """Write to the job's Redis log and publish to other workers in the same round trip"""
+        if not redis or not entry["mirrored"]:
+            return
+        batch = write(redis.pipeline())
+        if redis.supports_pubsub:
+            batch.publish(self.hub.channel(job_id), json.dumps(message))
+        try:
+            await batch.execute()
+        except Exception as e:
+            # A gap would shift list positions, so stop mirroring; this worker can still serve resumes
+            entry["mirrored"] = False
+            print(f"Stream log write failed for job {job_id}: {e}")
+
+    async def append(self, redis, job_id: str, event_type: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Record an event, fan it out to live readers and return it with its id"""
+        entry = self._entry(job_id)
+        event = {"id": len(entry["events"]) + 1, "type": event_type, "data": data}
+        entry["events"].append(event)
+        self.hub.publish(job_id, event)
+
+        key = self._key(job_id)
+        await self._mirror(
+            redis, job_id, entry,
+            lambda batch: batch.rpush(key, json.dumps(event)).expire(key, STREAM_LOG_TTL_SECONDS),
+            event,
+        )
+        return event
+
+    async def close(self, redis, job_id: str):
+        """Mark the stream finished so followers stop once they have read everything"""
+        entry = self._entry(job_id)
+        entry["done"] = True
+        # Only replays are served from here now, so it can be evicted like any cached value
+        self._active.pop(job_id, None)
+        self._local.set(job_id, entry, STREAM_LOG_TTL_SECONDS)
+        end = {"end": len(entry["events"])}
+        self.hub.publish(job_id, end)
+        await self._mirror(
+            redis, job_id, entry,
+            lambda batch: batch.set(f"{self._key(job_id)}:end", str(end["end"]), ex=STREAM_LOG_TTL_SECONDS),
+            end,
+        )
+
+    async def discard(self, redis, job_id: str):
+        """Drop the log of a stream that will never run (its request turned out to be a retry)"""
+        self._active.pop(job_id, None)
+        self._local.invalidate(job_id)
+        if redis:
+            try:
+                await redis.delete(self._key(job_id))
+            except Exception as e:
+                print(f"Stream log delete failed for job {job_id}: {e}")
+
+    async def read(self, redis, job_id: str, after: int = 0) -> Optional[Tuple[List[Dict[str, Any]], bool]]:
+        """Events with id > after and whether the stream has finished; None if there is no log for the job"""
+        entry = self._lookup(job_id)
+        if entry is not None:
+            return entry["events"][after:], entry["done"]
+        if not redis:
+            return None
+
+        key = self._key(job_id)
+        # Event ids are list positions + 1. Reading from the last seen event (index after - 1) onwards
+        # tells an expired log (empty) apart from one with nothing new yet.
+        start = max(after - 1, 0)
+        raw_events, end = await redis.pipeline().lrange(key, start, -1).get(f"{key}:end").execute()
+        if not raw_events:
+            return None
+        events = [json.loads(raw) for raw in raw_events[after - start:]]
+        last_id = events[-1]["id"] if events else after
+        # The end marker is written after the last event, but both reads share one round trip
+        return events, end is not None and last_id >= int(end)
+
+    async def follow(self, redis, job_id: str, after: int = 0) -> AsyncIterator[Dict[str, Any]]:
+        """Replay events after `after`, then yield new ones until the stream finishes"""
+        remote = self._lookup(job_id) is None
+        # Subscribed before the first read so nothing published in between is missed
+        subscription = await self.hub.subscribe(job_id, remote)
+        # Without a live feed (remote job, no pub/sub) this degrades to polling the log
+        wait_seconds = STREAM_LOG_POLL_SECONDS if remote and not self.hub.pubsub_active else STREAM_LOG_RESYNC_SECONDS
+        last_event_at = time.monotonic()
+        resync = True
+        try:
+            while True:
+                if resync:
+                    if subscription.evicted:
+                        subscription = await self.hub.subscribe(job_id, remote)
+                    result = await self.read(redis, job_id, after)
+                    if result is None:
+                        return
+                    events, done = result
+                    for event in events:
+                        after = event["id"]
+                        yield event
+                    if done:
+                        return
+                    if events:
+                        last_event_at = time.monotonic()
+                    elif time.monotonic() - last_event_at > STREAM_LOG_IDLE_TIMEOUT_SECONDS:
+                        return
+
+                message = await self._next_message(subscription, wait_seconds)
+                if message is None:
+                    # Timed out, or evicted as a slow consumer: catch up from the log
+                    resync = True
+                elif "end" in message:
+                    if message["end"] <= after:
+                        return
+                    resync = True
+                elif message["id"] == after + 1:
+                    after = message["id"]
+                    last_event_at = time.monotonic()
+                    resync = False
+                    yield message
+                else:
+                    # Already replayed from the log (<= after), or something was missed (> after + 1)
+                    resync = message["id"] > after
+        finally:
+            self.hub.unsubscribe(subscription)
+
+    async def _next_message(self, subscription: StreamSubscription, timeout: float) -> Optional[Dict[str, Any]]:
+        if subscription.evicted and subscription.queue.empty():
+            return None
+        try:
+            return await asyncio.wait_for(subscription.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
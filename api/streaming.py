@@ -1,20 +1,157 @@
 # Created automatically by Cursor AI (2025-11-30)
 # Server-Sent Events (SSE) utilities for real-time streaming
 
+import asyncio
 import json
-from typing import Any, Dict, AsyncGenerator
+import os
+from typing import Any, Dict, AsyncGenerator, AsyncIterator, List, Optional, Union
 
-def format_sse_event(event_type: str, data: Dict[str, Any]) -> str:
+try:
+    import orjson
+except ImportError:  # optional: ~5-10x faster serialization of event payloads
+    orjson = None
+
+# Comment frame sent when a stream has been idle this long, so proxies don't cut the connection (0 disables)
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+# Extra time to wait for more events before writing (0 = only batch what is already queued)
+SSE_COALESCE_MS = float(os.getenv("SSE_COALESCE_MS", "0"))
+# Upper bound on one write, and frames buffered ahead of a slow client before the source is paused
+SSE_MAX_WRITE_BYTES = int(os.getenv("SSE_MAX_WRITE_BYTES", "65536"))
+SSE_BUFFER_FRAMES = int(os.getenv("SSE_BUFFER_FRAMES", "256"))
+
+SSE_HEARTBEAT = b": keep-alive\n\n"
+
+
+def dumps_json(data: Any) -> bytes:
+    """Compact JSON as UTF-8 bytes (orjson when installed)"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data)
+        except TypeError:
+            # e.g. integers beyond 64 bits, which the stdlib encoder handles
+            pass
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def encode_sse_event(
+    event_type: str,
+    data: Dict[str, Any],
+    event_id: Optional[int] = None,
+    retry_ms: Optional[int] = None
+) -> bytes:
     """
-    Format data as a Server-Sent Event string.
+    Encode one Server-Sent Event as bytes, ready to write.
     
     SSE format:
+    retry: <reconnect delay in ms>   (optional)
+    id: <event id>                   (optional; sent back as Last-Event-ID on reconnect)
     event: <type>
     data: <json>
     
     """
-    json_data = json.dumps(data)
-    return f"event: {event_type}\ndata: {json_data}\n\n"
+    fields = b""
+    if retry_ms is not None:
+        fields += b"retry: %d\n" % retry_ms
+    if event_id is not None:
+        fields += b"id: %d\n" % event_id
+    return b"%sevent: %s\ndata: %s\n\n" % (fields, event_type.encode("utf-8"), dumps_json(data))
+
+
+def format_sse_event(
+    event_type: str,
+    data: Dict[str, Any],
+    event_id: Optional[int] = None,
+    retry_ms: Optional[int] = None
+) -> str:
+    """
+    Format data as a Server-Sent Event string (see encode_sse_event).
+    """
+    return encode_sse_event(event_type, data, event_id, retry_ms).decode("utf-8")
+
+
+async def sse_stream(
+    frames: AsyncIterator[Union[str, bytes]],
+    heartbeat_seconds: float = SSE_HEARTBEAT_SECONDS,
+    coalesce_ms: float = SSE_COALESCE_MS,
+    max_write_bytes: int = SSE_MAX_WRITE_BYTES,
+) -> AsyncGenerator[bytes, None]:
+    """
+    Response body for an SSE endpoint.
+
+    The source runs in its own task and appends to a bounded buffer, so:
+    - a heartbeat comment goes out whenever nothing was written for heartbeat_seconds,
+      without cancelling whatever the source is waiting on (e.g. a long model call);
+    - every frame that piled up while the previous write was in flight goes out in a single write,
+      so a slow client gets fewer, larger writes and a fast one gets each event immediately;
+    - once SSE_BUFFER_FRAMES frames are pending the source is paused until the client catches up.
+    """
+    loop = asyncio.get_running_loop()
+    pending: List[bytes] = []
+    finished = False
+    last_write = loop.time()
+    # Frames pending, source finished, or heartbeat due
+    readable = asyncio.Event()
+    # Buffer has room again
+    writable = asyncio.Event()
+    writable.set()
+
+    async def pump():
+        nonlocal finished
+        try:
+            async for frame in frames:
+                pending.append(frame if isinstance(frame, bytes) else frame.encode("utf-8"))
+                readable.set()
+                if len(pending) >= SSE_BUFFER_FRAMES:
+                    writable.clear()
+                    await writable.wait()
+        except Exception as e:
+            pending.append(encode_sse_event("error", {"error": str(e)}))
+        finally:
+            finished = True
+            readable.set()
+
+    async def heartbeat():
+        # One timer for the whole stream rather than one per wait
+        while True:
+            idle = loop.time() - last_write
+            if idle >= heartbeat_seconds:
+                readable.set()
+                idle = 0
+            await asyncio.sleep(heartbeat_seconds - idle)
+
+    tasks = [asyncio.create_task(pump())]
+    if heartbeat_seconds > 0:
+        tasks.append(asyncio.create_task(heartbeat()))
+    try:
+        while True:
+            await readable.wait()
+            if pending and coalesce_ms > 0 and not finished:
+                await asyncio.sleep(coalesce_ms / 1000)
+            readable.clear()
+
+            if pending:
+                count, size = 0, 0
+                for frame in pending:
+                    if count and size + len(frame) > max_write_bytes:
+                        break
+                    count += 1
+                    size += len(frame)
+                chunk = pending[0] if count == 1 else b"".join(pending[:count])
+                del pending[:count]
+                if pending or finished:
+                    readable.set()
+                writable.set()
+                last_write = loop.time()
+                yield chunk
+            elif finished:
+                return
+            elif loop.time() - last_write >= heartbeat_seconds:
+                last_write = loop.time()
+                yield SSE_HEARTBEAT
+    finally:
+        # Client gone (or stream done): stop the source, which runs its own cleanup
+        for task in tasks:
+            task.cancel()
 
 
 def format_sse_message(data: Dict[str, Any]) -> str:
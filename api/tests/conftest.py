@@ -1,8 +1,9 @@
 import pytest
 from fastapi.testclient import TestClient
-from api.main import app, supabase, redis
-from unittest.mock import MagicMock
+from api.main import app, redis
+from unittest.mock import AsyncMock, MagicMock
 import os
+from api.redis_client import AsyncRedis, RedisBatch
 
 @pytest.fixture
 def client():
@@ -12,23 +13,35 @@ def client():
 @pytest.fixture(autouse=True)
 def mock_external_services(monkeypatch):
     """
-    Mock Supabase, Redis, and OpenAI by default to avoid external calls.
+    Mock PostgreSQL, Redis, and OpenAI by default to avoid external calls.
     """
-    # Mock Redis
-    mock_redis = MagicMock()
+    # Mock Redis (async commands are AsyncMocks via the spec; pipelines return a chainable batch)
+    mock_redis = MagicMock(spec=AsyncRedis)
     mock_redis.get.return_value = None
     mock_redis.set.return_value = True
     mock_redis.incr.return_value = 1
+    mock_redis.eval.return_value = [1, 0, 0]
+    mock_batch = MagicMock(spec=RedisBatch)
+    for command in ("get", "set", "delete", "incr", "expire", "zadd", "zcard", "rpush", "lrange"):
+        getattr(mock_batch, command).return_value = mock_batch
+    mock_batch.execute = AsyncMock(return_value=[1, True])
+    mock_redis.pipeline.return_value = mock_batch
     monkeypatch.setattr("api.main.redis", mock_redis)
 
-    # Mock Supabase
-    mock_supabase = MagicMock()
-    mock_table = MagicMock()
-    mock_table.insert.return_value.execute.return_value = None
-    mock_table.update.return_value.eq.return_value.execute.return_value = None
-    mock_table.select.return_value.eq.return_value.execute.return_value = MagicMock(data=[])
-    mock_supabase.table.return_value = mock_table
-    monkeypatch.setattr("api.main.supabase", mock_supabase)
+    # Mock PostgreSQL helpers
+    async def mock_insert(table, data):
+        return data.get("id", "mock-id")
+    async def mock_query(query, params=None, prepare=None):
+        return []
+    async def mock_raw_sql(query, params=None, prepare=None):
+        return 0
+    monkeypatch.setattr("api.main.execute_insert_async", mock_insert)
+    monkeypatch.setattr("api.main.execute_query_async", mock_query)
+    monkeypatch.setattr("api.main.execute_raw_sql_async", mock_raw_sql)
+    monkeypatch.setattr("api.job_queue.execute_raw_sql_async", mock_raw_sql)
+    async def mock_persist(unit, wait=False):
+        return None
+    monkeypatch.setattr("api.main.persist", mock_persist)
 
     # Mock OpenAI Adapter
     async def mock_analyze(*args, **kwargs):
@@ -54,3 +54,122 @@ def test_drive_import_flow(client, monkeypatch):
     assert response.status_code == 200
     assert "jobId" in response.json()
 
+
+def test_drive_run_fails_when_the_token_cannot_reach_the_worker(client, monkeypatch):
+    """
+    A Drive job is only queued once its access token is stored for the worker; otherwise the caller
+    gets a 503 and no job row is written.
+    """
+    inserted = []
+
+    async def mock_insert(table, data):
+        inserted.append(data["id"])
+        return data["id"]
+    monkeypatch.setattr("api.main.execute_insert_async", mock_insert)
+
+    async def failing_store(job_id, access_token):
+        raise ConnectionError("redis down")
+    monkeypatch.setattr("api.main.store_job_credentials", failing_store)
+
+    payload = {"projectId": "test-project", "input": {"driveFileId": "file-123", "accessToken": "mock-token"}}
+    assert client.post("/agent/run", json=payload).status_code == 503
+
+    # No credential store configured at all
+    monkeypatch.setattr("api.main.redis", None)
+    assert client.post("/agent/run", json=payload).status_code == 503
+    assert inserted == []
+
+def test_job_is_only_reported_done_after_its_results_commit(monkeypatch):
+    """
+    If saving the results fails, the job goes back through the retry path instead of being
+    published as done with nothing in the database.
+    """
+    import asyncio
+    from api import main
+
+    async def failing_persist(unit, wait=False):
+        raise ConnectionError("database went away")
+    monkeypatch.setattr("api.main.persist", failing_persist)
+
+    retries = []
+
+    async def mock_schedule_retry(job_id, error, attempt):
+        retries.append((job_id, attempt))
+        return 5
+    monkeypatch.setattr("api.main.schedule_retry", mock_schedule_retry)
+
+    input_data = main.AgentInput(text="This is a test contract.")
+    asyncio.run(main.process_contract_analysis("job-1", "p", input_data, attempt=1, max_attempts=3))
+
+    assert retries == [("job-1", 1)]
+    assert main.job_status_cache.get("job-1")["status"] == "queued"
+
+def test_job_messages_get_distinct_increasing_timestamps(monkeypatch):
+    """
+    The user and assistant messages share one INSERT, so they carry their own created_at values
+    (now() would tie and leave their order to the random id).
+    """
+    import asyncio
+    from api import main
+
+    statements = []
+
+    async def capture_persist(unit, wait=False):
+        statements.extend(unit.statements())
+    monkeypatch.setattr("api.main.persist", capture_persist)
+
+    input_data = main.AgentInput(text="This is a test contract.")
+    asyncio.run(main.process_contract_analysis("job-2", "p", input_data))
+
+    query, params, _ = next(s for s in statements if '"messages"' in s[0])
+    assert query.count("(%s") == 2
+    columns = query[query.index("(") + 1:query.index(")")].replace('"', "").split(", ")
+    rows = [dict(zip(columns, params[i:i + len(columns)])) for i in range(0, len(params), len(columns))]
+    assert [row["role"] for row in rows] == ["user", "assistant"]
+    assert rows[0]["created_at"] < rows[1]["created_at"]
+
+def test_abandoned_job_is_published_as_failed(monkeypatch):
+    """
+    A job given up on by the worker reaches the database, Redis and the status cache,
+    so GET /jobs/{id} stops reporting the state it had when its last worker died.
+    """
+    import asyncio
+    import json
+    from api import main, worker
+
+    finished = []
+
+    async def mock_finish_job(job_id, status, result, error=None):
+        finished.append((job_id, status))
+    monkeypatch.setattr("api.main.finish_job", mock_finish_job)
+    main.cache_job_state("job-3", {"status": "running"})
+
+    asyncio.run(worker.run_job({"id": "job-3", "project_id": "p", "attempts": 4, "max_attempts": 3}))
+
+    assert finished == [("job-3", "error")]
+    assert main.job_status_cache.get("job-3")["status"] == "error"
+    batch = main.redis.pipeline.return_value
+    key, value = batch.set.call_args.args
+    assert key == main.job_state_key("job-3")
+    assert json.loads(value)["status"] == "error"
+
+def test_failed_job_reaches_the_database_when_redis_is_down(monkeypatch):
+    """The error row is written even if publishing the error state to Redis fails."""
+    import asyncio
+    from api import main
+
+    async def failing_analyze(*args, **kwargs):
+        raise ValueError("model refused")
+    monkeypatch.setattr("api.main.analyze_contract", failing_analyze)
+    main.redis.pipeline.return_value.execute.side_effect = ConnectionError("redis went away")
+
+    finished = []
+
+    async def mock_finish_job(job_id, status, result, error=None):
+        finished.append((job_id, status))
+    monkeypatch.setattr("api.main.finish_job", mock_finish_job)
+
+    input_data = main.AgentInput(text="This is a test contract.")
+    asyncio.run(main.process_contract_analysis("job-4", "p", input_data))
+
+    assert finished == [("job-4", "error")]
@@ -0,0 +1,138 @@
+from datetime import datetime, timezone
+
+from api.db_helper import UnitOfWork
+
+
+def test_batch_run_inserts_all_jobs_in_one_statement(client, monkeypatch):
+    """
+    POST /agent/run/batch writes the batch row plus one multi-row INSERT for its jobs,
+    and the per-batch concurrency cap is clamped to the configured maximum.
+    """
+    committed = []
+
+    async def mock_commit(self):
+        committed.extend(self.statements())
+    monkeypatch.setattr(UnitOfWork, "commit", mock_commit)
+
+    async def mock_drive_document(file_id, access_token):
+        yield {"type": "document", "data": {"text": f"Text of {file_id}", "contentHash": "h"}}
+    monkeypatch.setattr("api.main.iter_drive_document", mock_drive_document)
+    from api import main
+
+    inputs = [{"text": f"Contract {i}"} for i in range(3)] + [{"driveFileId": "file-1", "accessToken": "token"}]
+    response = client.post(
+        "/agent/run/batch",
+        json={"projectId": "procurement", "inputs": inputs, "maxConcurrency": 1000}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["jobIds"]) == 4
+    assert data["maxConcurrency"] == 16
+
+    assert len(committed) == 2
+    batch_sql, batch_params, _ = committed[0]
+    jobs_sql, jobs_params, _ = committed[1]
+    assert '"batches"' in batch_sql and batch_params[0] == data["batchId"]
+    assert '"jobs"' in jobs_sql and jobs_sql.count("(%s") == 4
+    assert jobs_params.count(data["batchId"]) == 4
+    # Drive tokens go to Redis (with a TTL), never into the jobs table
+    assert all("token" not in str(param) for param in jobs_params if param != "contract_review")
+    credentials = [c.args for c in main.redis.pipeline.return_value.set.call_args_list if c.args[0].endswith(":credentials")]
+    assert credentials == [(main.job_credentials_key(data["jobIds"][3]), "token")]
+
+
+def test_prefetched_drive_document_outlives_the_token(monkeypatch):
+    """
+    A batch job's Drive file is read right after submission; when the job runs after its token
+    has expired, it analyzes the prefetched text instead of failing.
+    """
+    import asyncio
+    from api import main
+
+    store = {}
+
+    async def fake_get(key):
+        return store.get(key)
+
+    async def fake_set(key, value, ex=None, nx=False, **kwargs):
+        store[key] = value
+        return True
+    main.redis.get.side_effect = fake_get
+    main.redis.set.side_effect = fake_set
+
+    async def mock_drive_document(file_id, access_token):
+        assert access_token == "token"
+        store[main.extraction_cache_key("h")] = "Prefetched contract text"
+        yield {"type": "document", "data": {"text": "Prefetched contract text", "contentHash": "h"}}
+    monkeypatch.setattr("api.main.iter_drive_document", mock_drive_document)
+
+    analyzed = []
+
+    async def mock_analyze_once(cache_key, text, questions):
+        analyzed.append(text)
+        return {"summary": "ok", "overallRisk": "low", "clauses": []}
+    monkeypatch.setattr("api.main.analyze_once", mock_analyze_once)
+
+    async def run():
+        store[main.job_credentials_key("job-1")] = "token"
+        await main.prefetch_drive_document("job-1", "file-1")
+        del store[main.job_credentials_key("job-1")]  # expired while queued
+        await main.process_contract_analysis("job-1", "p", main.AgentInput(driveFileId="file-1"))
+
+    asyncio.run(run())
+    assert analyzed == ["Prefetched contract text"]
+    assert main.job_status_cache.get("job-1")["status"] == "done"
+
+
+def test_batch_run_needs_redis_for_drive_inputs(client, monkeypatch):
+    """
+    Without Redis a Drive token can't reach the worker, so such batches are refused up front.
+    """
+    async def fail_commit(self):
+        raise AssertionError("nothing should be committed")
+    monkeypatch.setattr(UnitOfWork, "commit", fail_commit)
+    monkeypatch.setattr("api.main.redis", None)
+
+    inputs = [{"text": "ok"}, {"driveFileId": "file-1", "accessToken": "token"}]
+    response = client.post("/agent/run/batch", json={"projectId": "p", "inputs": inputs})
+    assert response.status_code == 503
+
+
+def test_batch_run_rejects_bad_inputs(client, monkeypatch):
+    """
+    Empty batches and inputs the worker could only fail on are refused before anything is written.
+    """
+    async def fail_commit(self):
+        raise AssertionError("nothing should be committed")
+    monkeypatch.setattr(UnitOfWork, "commit", fail_commit)
+
+    response = client.post("/agent/run/batch", json={"projectId": "p", "inputs": []})
+    assert response.status_code == 400
+    response = client.post("/agent/run/batch", json={"projectId": "p", "inputs": [{"text": "ok"}, {"driveFileId": "f"}]})
+    assert response.status_code == 400
+    assert "inputs[1]" in response.json()["detail"]
+
+
+def test_get_batch_reports_aggregate_progress(client, monkeypatch):
+    """
+    GET /batches/{id} turns the per-status counts into progress for the whole batch.
+    """
+    batch_id = "7f9e2a52-4c1b-4f7e-9a0c-3d2b1e5f6a70"
+    row = {
+        "id": batch_id, "project_id": "procurement", "total": 10, "max_concurrency": 4,
+        "created_at": datetime(2026, 1, 1, tzinfo=timezone.utc), "updated_at": None,
+        "queued": 3, "running": 4, "done": 2, "error": 1,
+    }
+
+    async def mock_query(query, params=None, prepare=None):
+        return [row] if params == (batch_id,) else []
+    monkeypatch.setattr("api.main.execute_query_async", mock_query)
+
+    data = client.get(f"/batches/{batch_id}").json()
+    assert data["status"] == "running"
+    assert data["finished"] == 3
+    assert data["progress"] == 0.3
+    assert data["counts"] == {"queued": 3, "running": 4, "done": 2, "error": 1}
+
+    assert client.get("/batches/not-a-uuid").status_code == 404
+    assert client.get("/batches/00000000-0000-0000-0000-000000000000").status_code == 404
@@ -0,0 +1,32 @@
+import json
+
+from api.cache_codec import COMPRESSED_HEADER, decode_value, encode_value
+
+
+def test_large_values_round_trip_compressed():
+    """
+    Values past the threshold are stored with the format header and decode back exactly.
+    """
+    text = json.dumps({"summary": "Résumé of the agreement", "clauses": [{"title": f"Clause {i}"} for i in range(200)]})
+    encoded = encode_value(text)
+    assert encoded.startswith(COMPRESSED_HEADER)
+    assert len(encoded) < len(text)
+    assert decode_value(encoded) == text
+
+
+def test_small_and_legacy_values_pass_through():
+    """
+    Small values are not compressed, and plain values written before compression read back unchanged.
+    """
+    assert encode_value("queued") == "queued"
+    assert encode_value(42) == 42
+    legacy = "x" * 5000
+    assert decode_value(legacy) == legacy
+    assert decode_value(None) is None
+
+
+def test_corrupt_compressed_value_is_a_cache_miss():
+    """
+    A truncated or foreign payload behind the header reads as missing instead of raising.
+    """
+    assert decode_value(COMPRESSED_HEADER + "not-base64-zlib") is None
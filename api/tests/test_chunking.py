@@ -0,0 +1,97 @@
+from api.chunking import split_contract, merge_clauses, combine_overall_risk
+
+CONTRACT = "\n".join(
+    f"{n}. Section {n} heading\n" + ("Lorem ipsum dolor sit amet. " * 20)
+    for n in range(1, 13)
+)
+
+
+def test_short_contract_is_not_split():
+    assert split_contract("1. Payment\nPay in 30 days.", 1000) == ["1. Payment\nPay in 30 days."]
+
+
+def test_long_contract_splits_on_section_boundaries_without_dropping_text():
+    """
+    Chunks respect the size limit, start at a section heading and together cover the whole contract.
+    """
+    chunks = split_contract(CONTRACT, 2000)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 2000 for chunk in chunks)
+    assert all(chunk.lstrip()[0].isdigit() for chunk in chunks)
+    assert "\n".join(chunks).split() == CONTRACT.split()
+
+
+def test_oversized_section_is_split_further():
+    section = "1. Definitions\n" + "\n".join("A very long definition line." for _ in range(200))
+    chunks = split_contract(section, 500)
+
+    assert all(len(chunk) <= 500 for chunk in chunks)
+    assert "\n".join(chunks) == section
+
+
+def test_merge_clauses_dedupes_and_keeps_highest_risk():
+    part_one = [
+        {"type": "liability", "title": "Liability Cap", "risk": "medium", "originalText": "Liability is capped."},
+        {"type": "payment", "title": "Net 30", "risk": "low", "originalText": "Pay within 30 days."},
+    ]
+    part_two = [
+        {"type": "liability", "title": "Liability  cap", "risk": "high", "originalText": "Other wording."},
+        {"type": "ip", "title": "IP Assignment", "risk": "high", "originalText": "All IP is assigned."},
+    ]
+
+    merged = merge_clauses([part_one, part_two])
+
+    assert [c["title"] for c in merged] == ["Liability  cap", "Net 30", "IP Assignment"]
+    assert merged[0]["risk"] == "high"
+
+
+def test_combine_overall_risk():
+    assert combine_overall_risk(["low", "high", "medium"]) == "high"
+    assert combine_overall_risk(["low", None]) == "low"
+    assert combine_overall_risk([]) == "medium"
+
+
+class FakeCompletions:
+    def __init__(self, reply=None, error=None):
+        self.reply, self.error, self.calls = reply, error, []
+
+    async def create(self, **kwargs):
+        from types import SimpleNamespace
+        self.calls.append(kwargs)
+        if self.error:
+            raise self.error
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.reply))])
+
+
+def reduce_with(completions):
+    import asyncio
+    from types import SimpleNamespace
+    from api.openai_adapter import _reduce_analyses
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    parts = [
+        {"overallRisk": "low", "summary": "Payment terms are fair.", "clauses": []},
+        {"overallRisk": "high", "summary": "Liability is uncapped.", "clauses": []},
+    ]
+    return asyncio.run(_reduce_analyses(client, parts))
+
+
+def test_part_summaries_are_combined_by_a_final_pass():
+    """A split contract gets one summary written from all the part summaries, not their concatenation."""
+    completions = FakeCompletions(reply="A services deal with fair payment terms but uncapped liability.")
+    combined = reduce_with(completions)
+
+    assert combined["summary"] == "A services deal with fair payment terms but uncapped liability."
+    assert combined["overallRisk"] == "high"
+    prompt = completions.calls[0]["messages"][1]["content"]
+    assert "Payment terms are fair." in prompt and "Liability is uncapped." in prompt
+
+
+def test_failed_summary_pass_keeps_the_first_summary_and_the_part_count():
+    """If the summary pass fails the analysis still completes, saying its summary covers one part."""
+    completions = FakeCompletions(error=RuntimeError("rate limited"))
+    combined = reduce_with(completions)
+
+    assert combined["summary"].startswith("Payment terms are fair.")
+    assert "part 1 of 2" in combined["summary"]
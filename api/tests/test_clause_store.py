@@ -0,0 +1,25 @@
+from api.clause_store import add_clauses, clause_row, clause_text_hash
+from api.db_helper import UnitOfWork
+
+
+def test_clause_row_normalizes_type_risk_and_hash():
+    """
+    Type and risk are lowercased (unknown risks become medium); the text hash ignores case and spacing.
+    """
+    row = clause_row("job-1", "proj", 0, {"type": " Liability ", "risk": "HIGH", "originalText": "Vendor  shall\nIndemnify"})
+    assert row["type"] == "liability"
+    assert row["risk"] == "high"
+    assert row["text_hash"] == clause_text_hash("vendor shall indemnify")
+    assert clause_row("job-1", "proj", 1, {"risk": "severe"})["risk"] == "medium"
+
+
+def test_add_clauses_replaces_rows_in_one_insert():
+    """
+    A job's clauses are written as a delete plus a single multi-row insert.
+    """
+    unit = UnitOfWork()
+    add_clauses(unit, "job-1", "proj", [{"type": "ip", "risk": "low"}, {"type": "payment", "risk": "high"}])
+    statements = unit.statements()
+    assert statements[0][0].startswith("DELETE FROM clauses")
+    assert len(statements) == 2
+    assert '"clauses"' in statements[1][0]
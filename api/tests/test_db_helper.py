@@ -0,0 +1,120 @@
+import asyncio
+
+from api.db_helper import UnitOfWork, WriteBehindBuffer
+
+
+def test_unit_of_work_groups_consecutive_inserts():
+    """
+    Consecutive inserts into the same table become one multi-row INSERT; statements keep their order.
+    """
+    unit = (
+        UnitOfWork()
+        .insert("jobs", {"id": "j1", "status": "done"})
+        .insert("messages", {"role": "user", "content": "a"})
+        .insert("messages", {"role": "assistant", "content": "b"})
+        .execute("UPDATE jobs SET status = %s WHERE id = %s", ("done", "j1"), prepare=True)
+    )
+    statements = unit.statements()
+
+    assert len(statements) == 3
+    assert '"jobs"' in statements[0][0]
+    query, params, prepare = statements[1]
+    assert query.endswith("VALUES (%s, %s), (%s, %s)")
+    assert params == ("user", "a", "assistant", "b")
+    assert prepare is False
+    assert statements[2] == ("UPDATE jobs SET status = %s WHERE id = %s", ("done", "j1"), True)
+
+
+def test_unit_of_work_splits_inserts_with_different_columns():
+    """
+    Rows with different column sets can't share a VALUES list.
+    """
+    unit = UnitOfWork().insert("messages", {"role": "user"}).insert("messages", {"role": "user", "meta": "{}"})
+    assert len(unit.statements()) == 2
+
+
+def test_prepared_statements_off_behind_transaction_pooler():
+    """
+    Auto mode keeps prepared statements for direct connections and turns them off for the Supabase pooler.
+    """
+    from api.db_helper import prepared_statements_enabled
+    assert prepared_statements_enabled("postgresql://postgres:pw@db.abc.supabase.co:5432/postgres")
+    assert not prepared_statements_enabled("postgresql://postgres.abc:pw@aws-0-eu-west-1.pooler.supabase.com:6543/postgres")
+    assert not prepared_statements_enabled("postgresql://app:pw@pgbouncer.internal:6543/app")
+
+
+def test_write_behind_stop_keeps_the_batch_being_flushed(monkeypatch):
+    """
+    Stopping while a flush is in flight waits for it instead of cancelling it, then writes the rest.
+    """
+    committed = []
+
+    async def slow_commit(self):
+        await asyncio.sleep(0.05)
+        committed.extend(query for query, _, _ in self.statements())
+    monkeypatch.setattr(UnitOfWork, "commit", slow_commit)
+
+    async def run():
+        buffer = WriteBehindBuffer(max_batch=2, interval_ms=1)
+        buffer.start()
+        futures = [buffer.submit(UnitOfWork().execute(f"SELECT {i}")) for i in range(5)]
+        await asyncio.sleep(0.02)  # first batch of two is mid-commit
+        await buffer.stop()
+        return futures
+
+    futures = asyncio.run(run())
+    assert sorted(committed) == [f"SELECT {i}" for i in range(5)]
+    assert all(future.done() and future.exception() is None for future in futures)
+
+
+def test_settings_are_per_connection_unless_behind_the_pooler(monkeypatch):
+    """
+    Direct connections get search_path/statement_timeout as startup options and checkouts add no
+    statement; behind the transaction pooler every checkout sets them for its transaction instead.
+    """
+    from contextlib import asynccontextmanager
+    from unittest.mock import AsyncMock
+    from api import db_helper
+
+    assert "options" in db_helper._connection_kwargs("postgresql://u:pw@db.abc.supabase.co:5432/postgres")
+    assert db_helper._connection_kwargs("postgresql://u:pw@aws-0-eu-west-1.pooler.supabase.com:6543/postgres") == {}
+
+    conn = AsyncMock()
+
+    class FakePool:
+        @asynccontextmanager
+        async def connection(self):
+            yield conn
+    monkeypatch.setattr(db_helper, "_async_db_pool", FakePool())
+
+    async def checkout():
+        async with db_helper.get_async_db_connection():
+            pass
+
+    monkeypatch.setattr(db_helper, "_settings_per_transaction", False)
+    asyncio.run(checkout())
+    assert conn.execute.await_count == 0
+
+    monkeypatch.setattr(db_helper, "_settings_per_transaction", True)
+    asyncio.run(checkout())
+    assert conn.execute.await_args.args[0] == db_helper.SESSION_SETTINGS_SQL
+
+
+def test_job_events_never_listen_through_the_transaction_pooler(monkeypatch):
+    """
+    LISTEN goes to DATABASE_DIRECT_URL when set; with only a pooler URL, job events stay off
+    rather than listening on a connection that never receives a notification.
+    """
+    from api import job_events
+
+    pooler = "postgresql://u:p@aws-0-eu.pooler.supabase.com:6543/postgres"
+    direct = "postgresql://u:p@db.xyz.supabase.co:5432/postgres"
+    monkeypatch.delenv("DATABASE_DIRECT_URL", raising=False)
+    monkeypatch.setenv("DATABASE_URL", direct)
+    assert job_events.listen_url() == direct
+
+    monkeypatch.setenv("DATABASE_URL", pooler)
+    assert job_events.listen_url() is None
+
+    monkeypatch.setenv("DATABASE_DIRECT_URL", direct)
+    assert job_events.listen_url() == direct
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from api import main
+
+
+@pytest.fixture
+def drive(monkeypatch):
+    """
+    A Drive file whose metadata and bytes the test controls, a dict standing in for Redis,
+    and counters for downloads and parses.
+    """
+    store = {}
+    file = {"meta": {"mimeType": "application/pdf", "modifiedTime": "2026-01-01T00:00:00Z", "version": "1"},
+            "content": b"%PDF original"}
+    calls = {"download": 0, "parse": 0}
+
+    async def fake_get(key):
+        return store.get(key)
+    main.redis.get.side_effect = fake_get
+    batch = main.redis.pipeline.return_value
+    batch.set.side_effect = lambda key, value, ex=None: store.__setitem__(key, value) or batch
+
+    def fake_download(file_id, access_token):
+        calls["download"] += 1
+        return file["content"]
+
+    async def fake_pages(content, mime_type):
+        calls["parse"] += 1
+        yield 1, 1, content.decode()
+    monkeypatch.setattr("api.main.fetch_file_metadata", lambda file_id, access_token: dict(file["meta"]))
+    monkeypatch.setattr("api.main.download_file_content", fake_download)
+    monkeypatch.setattr("api.main.iter_extracted_pages", fake_pages)
+    return file, calls
+
+
+def resolve(file_id="file-1"):
+    async def run():
+        return [event async for event in main.iter_drive_document(file_id, "token")][-1]["data"]
+    return asyncio.run(run())
+
+
+def test_unchanged_revision_is_served_without_a_download(drive):
+    """A second fetch of the same revision comes straight from the cache: no download, no parse."""
+    file, calls = drive
+    first = resolve()
+    second = resolve()
+
+    assert second == first
+    assert second["text"] == "%PDF original"
+    assert calls == {"download": 1, "parse": 1}
+
+
+def test_same_bytes_under_a_new_revision_skip_the_parse(drive):
+    """A new revision (e.g. an edit that was reverted) is downloaded, but identical bytes aren't re-parsed."""
+    file, calls = drive
+    resolve()
+    file["meta"]["modifiedTime"] = "2026-01-02T00:00:00Z"
+    second = resolve()
+
+    assert second["text"] == "%PDF original"
+    assert calls == {"download": 2, "parse": 1}
+
+
+def test_edited_file_is_not_served_from_the_stale_cache(drive):
+    """After an edit the new revision is downloaded and parsed; the old text is never returned."""
+    file, calls = drive
+    first = resolve()
+    file["meta"].update(modifiedTime="2026-01-02T00:00:00Z", version="2")
+    file["content"] = b"%PDF edited"
+    second = resolve()
+
+    assert second["text"] == "%PDF edited"
+    assert second["contentHash"] != first["contentHash"]
+    assert calls == {"download": 2, "parse": 2}
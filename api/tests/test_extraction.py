@@ -0,0 +1,153 @@
+import asyncio
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from api import extraction
+
+
+# Pool worker entry points for the tests below (top level so spawned workers can import them)
+def sleep_and_return(seconds, value):
+    time.sleep(seconds)
+    return value
+
+
+def crash():
+    os._exit(1)
+
+
+def count_slowly(n, offset):
+    for i in range(offset, n):
+        time.sleep(0.2)
+        yield i
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(extraction, "EXTRACTION_WORKERS", 2)
+    extraction.shutdown_extraction_pool()
+    yield
+    extraction.shutdown_extraction_pool(wait=False)
+
+
+def test_stuck_task_is_killed_without_failing_its_neighbours(pool):
+    """
+    A task that overruns its timeout is killed; a healthy task running next to it in the same pool
+    is moved to the replacement pool and still completes.
+    """
+    async def run():
+        stuck = asyncio.ensure_future(extraction._run_in_pool(sleep_and_return, 30, "stuck", timeout=1))
+        healthy = asyncio.ensure_future(extraction._run_in_pool(sleep_and_return, 1.5, "ok", timeout=10))
+        results = await asyncio.gather(stuck, healthy, return_exceptions=True)
+        return results, extraction._pool
+
+    started = time.monotonic()
+    (stuck, healthy), replacement = asyncio.run(run())
+    assert isinstance(stuck, asyncio.TimeoutError)
+    assert healthy == "ok"
+    assert time.monotonic() - started < 15
+    assert replacement is None or not replacement.retired
+
+
+def test_time_spent_queued_does_not_count_towards_the_timeout(pool, monkeypatch):
+    """
+    With one worker, the second task waits behind the first for longer than its own timeout and
+    still succeeds, because only time on a worker counts.
+    """
+    monkeypatch.setattr(extraction, "EXTRACTION_WORKERS", 1)
+
+    async def run():
+        return await asyncio.gather(*(
+            extraction._run_in_pool(sleep_and_return, 0.6, i, timeout=1) for i in range(2)
+        ))
+
+    assert asyncio.run(run()) == [0, 1]
+
+
+def test_crashed_worker_fails_its_task_and_the_pool_recovers(pool):
+    """
+    A worker that dies takes its task down (after one resubmission); later calls get a fresh pool.
+    """
+    async def run():
+        with pytest.raises(BrokenProcessPool):
+            await extraction._run_in_pool(crash, timeout=10)
+        return await extraction._run_in_pool(sleep_and_return, 0, "after", timeout=10)
+
+    assert asyncio.run(run()) == "after"
+
+
+def make_pdf(pages):
+    """A minimal PDF with one line of Helvetica text per page"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+def test_pdf_pages_are_extracted_in_order(pool):
+    """
+    A PDF parsed in the pool comes back page by page, in order, with the page count.
+    """
+    if not extraction.PdfReader:
+        pytest.skip("pypdf not installed")
+    content = make_pdf([f"Page {i}" for i in range(1, 12)])
+
+    async def run():
+        return [page async for page in extraction.iter_extracted_pages(content, extraction.PDF_MIME_TYPE)]
+
+    pages = asyncio.run(run())
+    assert [(number, total) for number, total, _ in pages] == [(i, 11) for i in range(1, 12)]
+    assert [text.strip() for _, _, text in pages] == [f"Page {i}" for i in range(1, 12)]
+
+
+def test_streamed_task_resumes_after_its_pool_is_replaced(pool):
+    """
+    A streaming task whose pool breaks (another caller's stuck worker is killed) is resubmitted
+    from where it stopped: every item arrives exactly once, in order.
+    """
+    async def run():
+        stuck = asyncio.ensure_future(extraction._run_in_pool(sleep_and_return, 30, "stuck", timeout=1))
+        items = [item async for item in extraction._iter_in_pool(count_slowly, 15, timeout=10)]
+        with pytest.raises(asyncio.TimeoutError):
+            await stuck
+        return items
+
+    assert asyncio.run(run()) == list(range(15))
+
+
+def test_streamed_task_is_stopped_at_the_document_deadline(pool):
+    """
+    Every item arrives well inside the per-item timeout, but the whole run still can't outlast
+    the document deadline: the worker is killed and the caller gets a timeout.
+    """
+    async def run():
+        items = []
+        started = time.monotonic()
+        with pytest.raises(asyncio.TimeoutError):
+            async for item in extraction._iter_in_pool(count_slowly, 50, timeout=5, deadline=1.5):
+                items.append(item)
+        return items, time.monotonic() - started
+
+    items, elapsed = asyncio.run(run())
+    assert 0 < len(items) < 50
+    assert elapsed < 5
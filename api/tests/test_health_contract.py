@@ -20,3 +20,65 @@ def test_messages_endpoint_contract(client):
     assert "items" in response.json()
     assert isinstance(response.json()["items"], list)
 
+
+def test_job_events_unknown_job(client):
+    """
+    Ensure /jobs/{id}/events returns 404 for unknown job.
+    """
+    response = client.get("/jobs/non-existent-id/events?since=0&timeout=0")
+    assert response.status_code == 404
+
+def test_job_events_long_poll_returns_newer_version(client, monkeypatch):
+    """
+    Ensure the long-poll returns immediately when the job is already past `since`.
+    """
+    row = {"id": "job-1", "project_id": "p", "status": "done", "version": 3,
+           "result": '{"summary": "ok", "clauses": []}', "last_error": None, "updated_at": None}
+    async def mock_query(query, params=None, prepare=None):
+        return [row]
+    monkeypatch.setattr("api.main.execute_query_async", mock_query)
+    response = client.get("/jobs/job-1/events?since=1&timeout=5")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "done"
+    assert body["version"] == 3
+    assert body["result"]["summary"] == "ok"
+
+def test_messages_keyset_cursor(client, monkeypatch):
+    """
+    Ensure /messages returns a nextCursor when more rows exist, and rejects malformed cursors.
+    """
+    from datetime import datetime, timezone
+    rows = [
+        {"id": f"00000000-0000-0000-0000-00000000000{i}", "project_id": "p", "role": "user",
+         "content": str(i), "meta": "{}", "created_at": datetime(2025, 1, 1, 0, 0, i, tzinfo=timezone.utc)}
+        for i in range(3)
+    ]
+    async def mock_query(query, params=None, prepare=None):
+        return rows[:params[-1]]
+    monkeypatch.setattr("api.main.execute_query_async", mock_query)
+
+    body = client.get("/messages?projectId=p&limit=2").json()
+    assert len(body["items"]) == 2
+    assert body["nextCursor"] == "2025-01-01T00:00:01.000000Z,00000000-0000-0000-0000-000000000001"
+
+    response = client.get("/messages", params={"projectId": "p", "before": body["nextCursor"]})
+    assert response.status_code == 200
+    assert client.get("/messages?projectId=p&before=not-a-cursor").status_code == 400
+
+def test_finished_job_is_served_from_local_cache(client, monkeypatch):
+    """
+    A finished job is read from Redis once, then served from the in-process cache.
+    """
+    from api import main
+    main.job_status_cache.invalidate("job-cached")
+    main.redis.get.return_value = '{"status": "done", "result": {"summary": "ok"}}'
+
+    assert client.get("/jobs/job-cached").json()["status"] == "done"
+    assert client.get("/jobs/job-cached").json()["result"]["summary"] == "ok"
+    assert main.redis.get.await_count == 1
+
+    # A status notification from another process drops the entry
+    main.job_events.publish({"id": "job-cached", "status": "done", "version": 3})
+    client.get("/jobs/job-cached")
+    assert main.redis.get.await_count == 2
@@ -0,0 +1,126 @@
+import re
+
+import pytest
+
+from api.idempotency import idempotency_key, request_fingerprint
+
+
+@pytest.fixture
+def redis_store(monkeypatch):
+    """Give the mocked Redis real GET / SET NX semantics"""
+    from api import main
+    store = {}
+
+    async def fake_set(key, value, nx=False, ex=None, **kwargs):
+        if nx and key in store:
+            return None
+        store[key] = value
+        return True
+
+    async def fake_get(key):
+        return store.get(key)
+
+    main.redis.set.side_effect = fake_set
+    main.redis.get.side_effect = fake_get
+    return store
+
+
+def test_keys_are_scoped_and_ignore_the_access_token():
+    """
+    The same Idempotency-Key in two projects is two keys; the Drive token never changes the fingerprint.
+    """
+    a = request_fingerprint("p", {"driveFileId": "f", "accessToken": "token-1"})
+    b = request_fingerprint("p", {"driveFileId": "f", "accessToken": "token-2"})
+    assert a == b
+    assert idempotency_key("cc", "agent_run", "p1", "k", a) != idempotency_key("cc", "agent_run", "p2", "k", a)
+    key, ttl = idempotency_key("cc", "agent_run", "p1", None, a)
+    assert key.endswith(a) and ttl == 60
+
+
+def test_retried_run_returns_the_original_job(client, monkeypatch, redis_store):
+    """
+    A retry with the same Idempotency-Key gets the first jobId back without creating another job;
+    reusing the key for a different request is refused.
+    """
+    inserted = []
+
+    async def mock_insert(table, data):
+        inserted.append(data["id"])
+        return data["id"]
+    monkeypatch.setattr("api.main.execute_insert_async", mock_insert)
+
+    payload = {"projectId": "p", "input": {"text": "Idempotent contract"}}
+    headers = {"Idempotency-Key": "upload-42"}
+    first = client.post("/agent/run", json=payload, headers=headers)
+    retry = client.post("/agent/run", json=payload, headers=headers)
+    assert first.status_code == retry.status_code == 200
+    assert retry.json()["jobId"] == first.json()["jobId"]
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert inserted == [first.json()["jobId"]]
+
+    other = {"projectId": "p", "input": {"text": "A different contract"}}
+    assert client.post("/agent/run", json=other, headers=headers).status_code == 422
+    # Without a key, different content is a new job
+    assert client.post("/agent/run", json=other).json()["jobId"] != first.json()["jobId"]
+
+
+def test_retried_stream_replays_the_original_analysis(client, monkeypatch, redis_store):
+    """
+    A repeated /agent/run/stream request replays the first job's events instead of analyzing again.
+    """
+    calls = []
+
+    async def fake_stream(text, context):
+        calls.append(text)
+        yield {"type": "clause", "data": {"id": "c1", "title": "Term"}}
+        yield {"type": "summary", "data": {"summary": "ok", "overallRisk": "low"}}
+        yield {"type": "complete", "data": {"status": "done"}}
+    monkeypatch.setattr("api.main.analyze_contract_stream", fake_stream)
+
+    payload = {"projectId": "p", "input": {"text": "Streamed idempotent contract"}}
+    first = client.post("/agent/run/stream", json=payload)
+    retry = client.post("/agent/run/stream", json=payload)
+    job_id = re.search(r'"jobId":\s*"([^"]+)"', first.text).group(1)
+
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert re.search(r'"jobId":\s*"([^"]+)"', retry.text).group(1) == job_id
+    assert "event: summary" in retry.text and "event: complete" in retry.text
+    assert len(calls) == 1
+
+
+def test_stream_that_loses_the_claim_race_drops_its_log(client, monkeypatch, redis_store):
+    """
+    A stream request that passes the first lookup but loses the claim to a concurrent identical
+    request replays that request's job, and leaves no log of its own behind (running logs never expire).
+    """
+    from api import main
+    monkeypatch.setattr(main.stream_log, "_active", {})
+
+    payload = {"projectId": "p", "input": {"text": "Raced contract"}}
+    headers = {"Idempotency-Key": "race-1"}
+    fingerprint = request_fingerprint("p", main.AgentInput(**payload["input"]).model_dump())
+    key, _ = idempotency_key(main.PREFIX, "agent_run_stream", "p", headers["Idempotency-Key"], fingerprint)
+    redis_store[key] = '{"jobId": "winner", "fingerprint": "%s"}' % fingerprint
+
+    # The winner's record isn't visible yet to the first lookup, only to the claim
+    lookups = []
+    real_get = main.redis.get.side_effect
+
+    async def racing_get(k):
+        if k == key:
+            lookups.append(k)
+            if len(lookups) == 1:
+                return None
+        return await real_get(k)
+    main.redis.get.side_effect = racing_get
+
+    response = client.post("/agent/run/stream", json=payload, headers=headers)
+    assert response.headers["Idempotent-Replayed"] == "true"
+    assert main.stream_log._active == {}
+
+    # Same for a key that was first used with different content (422)
+    lookups.clear()
+    other = {"projectId": "p", "input": {"text": "Different contract"}}
+    assert client.post("/agent/run/stream", json=other, headers=headers).status_code == 422
+    assert main.stream_log._active == {}
+
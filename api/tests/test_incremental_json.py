@@ -0,0 +1,65 @@
+import json
+from api.incremental_json import ArrayItemStreamParser
+
+DOCUMENT = {
+    "overallRisk": "high",
+    "summary": "Watch the \"clauses\" about {liability} [and] indemnity.",
+    "clauses": [
+        {"type": "liability", "title": "Unlimited {Liability}", "risk": "high", "originalText": "a \\\"quoted\\\" ] text"},
+        {"type": "ip", "title": "IP Assignment", "risk": "medium", "nested": {"list": [1, 2, {"x": "}"}]}},
+        {"type": "other", "title": "Misc", "risk": "low"},
+    ],
+}
+
+
+def test_yields_each_clause_as_soon_as_it_closes():
+    """
+    Clauses come out one by one while the rest of the document is still streaming.
+    """
+    raw = "```json\n" + json.dumps(DOCUMENT, indent=2) + "\n```"
+    parser = ArrayItemStreamParser("clauses")
+
+    seen = []
+    first_clause_at = None
+    for i, char in enumerate(raw):
+        items = parser.feed(char)
+        if items and first_clause_at is None:
+            first_clause_at = i
+        seen.extend(items)
+
+    assert seen == DOCUMENT["clauses"]
+    assert first_clause_at < raw.index('"IP Assignment"')
+    assert parser.text == raw
+
+
+def test_handles_arbitrary_chunk_boundaries():
+    """
+    Token boundaries can fall anywhere, including inside strings and escapes.
+    """
+    raw = json.dumps(DOCUMENT)
+    for size in (2, 3, 7, 64, len(raw)):
+        parser = ArrayItemStreamParser("clauses")
+        seen = []
+        for start in range(0, len(raw), size):
+            seen.extend(parser.feed(raw[start:start + size]))
+        assert seen == DOCUMENT["clauses"]
+
+
+def test_ignores_other_arrays_and_incomplete_items():
+    """
+    Only objects in the named top-level array are returned, and only once complete.
+    """
+    parser = ArrayItemStreamParser("clauses")
+    assert parser.feed('{"tags": [{"a": 1}], "clauses": [{"b": 2}, {"c": ') == [{"b": 2}]
+    assert parser.feed('3}') == [{"c": 3}]
+
+
+def test_records_the_position_of_each_emitted_item():
+    """
+    Items that aren't streamed (not objects, or not decodable) still take up a position, so the
+    caller can send exactly the missing ones from the final parse.
+    """
+    parser = ArrayItemStreamParser("clauses")
+    items = parser.feed('{"clauses": [{"a": 1}, "note, with comma", {"b": }, {"c": [1, 2]}]}')
+    assert items == [{"a": 1}, {"c": [1, 2]}]
+    assert parser.emitted == {0, 3}
@@ -0,0 +1,66 @@
+import asyncio
+import os
+import uuid
+from pathlib import Path
+
+import pytest
+
+# Runs against a scratch Postgres database: the migrations in db/ are applied to it
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set")
+
+MIGRATIONS = sorted((Path(__file__).resolve().parents[2] / "db").glob("*.sql"))
+
+
+def test_concurrent_claims_respect_the_batch_cap(monkeypatch):
+    """
+    Many workers polling at once never run more of a batch's jobs than its max_concurrency,
+    and a finished job frees its slot for the next poll.
+    """
+    from api import db_helper, job_queue
+    monkeypatch.setenv("DATABASE_URL", TEST_DATABASE_URL)
+    monkeypatch.setattr(db_helper, "DB_POOL_MAX_SIZE", 8)
+
+    async def run():
+        await db_helper.init_async_db_pool()
+        await db_helper._async_db_pool.wait()
+        try:
+            async with db_helper.get_async_db_connection() as conn:
+                for migration in MIGRATIONS:
+                    await conn.execute(migration.read_text())
+
+            batch_id = str(uuid.uuid4())
+            unit = db_helper.UnitOfWork().insert("batches", {
+                "id": batch_id, "project_id": "p", "total": 20, "max_concurrency": 2,
+            })
+            for _ in range(20):
+                unit.insert("jobs", {
+                    "id": str(uuid.uuid4()), "project_id": "p", "kind": "cap_test",
+                    "status": "queued", "payload": "{}", "batch_id": batch_id,
+                })
+            await unit.commit()
+
+            claimed = []
+            for _ in range(5):
+                rounds = await asyncio.gather(*(
+                    job_queue.claim_jobs(f"worker-{i}", 10, kind="cap_test") for i in range(8)
+                ))
+                claimed.extend(job for jobs in rounds for job in jobs)
+                running = await db_helper.execute_query_async(
+                    "SELECT count(*) AS n FROM jobs WHERE batch_id = %s AND status = 'running'", (batch_id,)
+                )
+                assert running[0]["n"] <= 2
+
+            # Finishing one job lets exactly one more start
+            await job_queue.finish_job(claimed[0]["id"], "done", {})
+            more = await asyncio.gather(*(
+                job_queue.claim_jobs(f"worker-{i}", 10, kind="cap_test") for i in range(8)
+            ))
+            await db_helper.execute_raw_sql_async("DELETE FROM batches WHERE id = %s", (batch_id,))
+            return claimed, [job for jobs in more for job in jobs]
+        finally:
+            await db_helper.close_async_db_pool()
+
+    claimed, more = asyncio.run(run())
+    assert len(claimed) == 2
+    assert len(more) == 1
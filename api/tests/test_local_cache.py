@@ -0,0 +1,31 @@
+import time
+
+from api.local_cache import LocalTTLCache
+
+
+def test_lru_eviction_and_counters():
+    """
+    The least recently used entry is evicted past max_entries; hits and misses are counted.
+    """
+    cache = LocalTTLCache(max_entries=2)
+    cache.set("a", 1, 60)
+    cache.set("b", 2, 60)
+    assert cache.get("a") == 1
+    cache.set("c", 3, 60)
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (2, 1, 1)
+
+
+def test_entries_expire_after_their_ttl():
+    """
+    Each entry keeps the TTL it was stored with.
+    """
+    cache = LocalTTLCache(max_entries=10)
+    cache.set("short", 1, 0.01)
+    cache.set("long", 2, 60)
+    time.sleep(0.02)
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
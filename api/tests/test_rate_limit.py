@@ -0,0 +1,56 @@
+import asyncio
+
+from api.rate_limit import LocalRateLimiter, RateLimitCheck, RateLimitPolicy, check_rate_limits, parse_policy
+
+
+def test_local_limiter_sliding_window_and_retry_after():
+    """
+    Requests past the limit are refused until the oldest one leaves the window.
+    """
+    limiter = LocalRateLimiter()
+    checks = [RateLimitCheck("ip", RateLimitPolicy("route", 2, 60))]
+    assert limiter.check(checks, now=0).allowed
+    assert limiter.check(checks, now=10).allowed
+
+    blocked = limiter.check(checks, now=20)
+    assert not blocked.allowed
+    assert blocked.retry_after == 40
+    assert blocked.policy == "route"
+    assert limiter.check(checks, now=61).allowed
+
+
+def test_local_limiter_weighted_budget_records_nothing_when_blocked():
+    """
+    A request blocked by one budget doesn't consume any of its other budgets.
+    """
+    limiter = LocalRateLimiter()
+    route = RateLimitCheck("ip", RateLimitPolicy("route", 10, 60))
+    tokens = RateLimitPolicy("tokens", 1000, 60)
+    assert limiter.check([route, RateLimitCheck("tok", tokens, 800)], now=0).allowed
+
+    blocked = limiter.check([route, RateLimitCheck("tok", tokens, 300)], now=1)
+    assert blocked.policy == "tokens"
+    assert limiter.check([route, RateLimitCheck("tok", tokens, 200)], now=2).allowed
+    assert len(limiter._windows["ip"]) == 2
+
+
+def test_oversized_cost_is_clamped_to_the_budget():
+    """
+    A single request bigger than a whole budget uses all of it instead of never fitting.
+    """
+    policy = RateLimitPolicy("tokens", 100, 60)
+    result = asyncio.run(check_rate_limits(None, [RateLimitCheck("clamp-test", policy, 5000)]))
+    assert result.allowed
+    assert parse_policy("x", "0") is None
+    assert parse_policy("x", "5/60") == RateLimitPolicy("x", 5, 60)
+
+
+def test_agent_run_returns_retry_after(client, monkeypatch):
+    """
+    A refused request gets a 429 with Retry-After from the limiter.
+    """
+    from api import main
+    main.redis.eval.return_value = [0, 12000, 1]
+    response = client.post("/agent/run", json={"projectId": "p", "input": {"text": "contract"}})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "12"
@@ -0,0 +1,162 @@
+import asyncio
+import os
+import uuid
+
+import pytest
+
+from api.redis_client import AsyncRedis
+
+# Point at a local Redis (e.g. `docker run -p 6379:6379 redis`) to run these against the RESP backend
+TEST_REDIS_URL = os.getenv("TEST_REDIS_URL")
+pytestmark = pytest.mark.skipif(not TEST_REDIS_URL, reason="TEST_REDIS_URL not set")
+
+
+def run_with_redis(test):
+    async def runner():
+        import redis.asyncio as redis_asyncio
+        client = AsyncRedis(redis_asyncio.from_url(TEST_REDIS_URL, decode_responses=True), "resp")
+        try:
+            await test(client, f"test:{uuid.uuid4().hex}")
+        finally:
+            await client.close()
+    asyncio.run(runner())
+
+
+def test_pipeline_runs_commands_in_order():
+    """
+    A batch returns one reply per queued command, in order.
+    """
+    async def test(redis, prefix):
+        replies = await (
+            redis.pipeline()
+            .set(f"{prefix}:a", "1", ex=60)
+            .incr(f"{prefix}:a")
+            .expire(f"{prefix}:a", 30, nx=True)
+            .get(f"{prefix}:a")
+            .execute()
+        )
+        assert replies[1] == 2
+        assert replies[3] == "2"
+        await redis.delete(f"{prefix}:a")
+    run_with_redis(test)
+
+
+def test_lock_helpers_round_trip():
+    """
+    SET NX locks and the compare-and-delete release script work on the RESP backend.
+    """
+    from api.single_flight import acquire_lock, lock_held, release_lock
+
+    async def test(redis, prefix):
+        key = f"{prefix}:lock"
+        token = await acquire_lock(redis, key, 30)
+        assert token
+        assert await acquire_lock(redis, key, 30) is None
+        await release_lock(redis, key, "not-the-owner")
+        assert await lock_held(redis, key)
+        await release_lock(redis, key, token)
+        assert not await lock_held(redis, key)
+    run_with_redis(test)
+
+
+def test_analysis_cache_round_trip():
+    """
+    Cached analyses are stored through a pipeline and read back intact.
+    """
+    from api.analysis_cache import get_cached_analysis, store_analysis
+
+    async def test(redis, prefix):
+        key = f"{prefix}:cache:analysis:abc"
+        await store_analysis(redis, key, {"summary": "ok", "clauses": []})
+        assert (await get_cached_analysis(redis, key))["summary"] == "ok"
+        await redis.delete(key, f"{prefix}:cache:analysis:index")
+    run_with_redis(test)
+
+
+def test_sliding_window_script_is_atomic_across_budgets():
+    """
+    The Lua limiter records a request in every budget or in none, and reports Retry-After.
+    """
+    from api.rate_limit import RateLimitCheck, RateLimitPolicy, check_rate_limits
+
+    async def test(redis, prefix):
+        route = RateLimitCheck(f"{prefix}:route", RateLimitPolicy("route", 2, 60))
+        tokens = RateLimitPolicy("tokens", 100, 60)
+        assert (await check_rate_limits(redis, [route, RateLimitCheck(f"{prefix}:tok", tokens, 90)])).allowed
+        blocked = await check_rate_limits(redis, [route, RateLimitCheck(f"{prefix}:tok", tokens, 20)])
+        assert not blocked.allowed and blocked.policy == "tokens"
+        assert 0 < blocked.retry_after <= 60
+        assert await redis.client.zcard(f"{prefix}:route") == 1
+        assert (await check_rate_limits(redis, [route])).allowed
+        assert not (await check_rate_limits(redis, [route])).allowed
+        await redis.delete(f"{prefix}:route", f"{prefix}:tok")
+    run_with_redis(test)
+
+
+def test_large_values_are_compressed_transparently():
+    """
+    Large strings are stored compressed and come back intact from GET and pipelined GET.
+    """
+    from api.cache_codec import COMPRESSED_HEADER
+
+    async def test(redis, prefix):
+        text = "The Supplier shall indemnify the Customer. " * 200
+        await redis.set(f"{prefix}:text", text, ex=60)
+        assert (await redis.client.get(f"{prefix}:text")).startswith(COMPRESSED_HEADER)
+        assert await redis.get(f"{prefix}:text") == text
+        replies = await redis.pipeline().incr(f"{prefix}:n").get(f"{prefix}:text").execute()
+        assert replies == [1, text]
+        await redis.delete(f"{prefix}:text", f"{prefix}:n")
+    run_with_redis(test)
+
+
+def test_stream_log_resumes_from_another_worker():
+    """
+    A worker without the in-process log replays a stream from Redis after a given event id.
+    """
+    from api.stream_log import StreamLog
+
+    async def test(redis, prefix):
+        producer, other_worker = StreamLog(prefix), StreamLog(prefix)
+        for i in range(4):
+            await producer.append(redis, "job-1", "progress", {"current": i})
+        assert await other_worker.read(redis, "job-1", 2) == ([
+            {"id": 3, "type": "progress", "data": {"current": 2}},
+            {"id": 4, "type": "progress", "data": {"current": 3}},
+        ], False)
+        await producer.close(redis, "job-1")
+        assert [event["id"] async for event in other_worker.follow(redis, "job-1", 3)] == [4]
+        assert await other_worker.read(redis, "job-2") is None
+        await redis.delete(f"{prefix}:stream:job-1", f"{prefix}:stream:job-1:end")
+    run_with_redis(test)
+
+
+def test_stream_hub_delivers_events_across_workers_over_pubsub():
+    """
+    A viewer in another worker receives live events through Redis pub/sub, not by polling.
+    """
+    from api.stream_hub import StreamHub
+    from api.stream_log import StreamLog
+
+    async def test(redis, prefix):
+        producer, other_worker = StreamLog(prefix), StreamLog(prefix, StreamHub(prefix))
+        await other_worker.hub.start(redis)
+        try:
+            await producer.append(redis, "job-1", "job", {"jobId": "job-1"})
+            viewer = asyncio.create_task(asyncio.wait_for(
+                collect_ids(other_worker.follow(redis, "job-1")), timeout=5
+            ))
+            while not other_worker.hub.stats()["redisChannels"]:
+                await asyncio.sleep(0.01)
+            for i in range(3):
+                await producer.append(redis, "job-1", "progress", {"current": i})
+            await producer.close(redis, "job-1")
+            assert await viewer == [1, 2, 3, 4]
+        finally:
+            await other_worker.hub.stop()
+            await redis.delete(f"{prefix}:stream:job-1", f"{prefix}:stream:job-1:end")
+    run_with_redis(test)
+
+
+async def collect_ids(events):
+    return [event["id"] async for event in events]
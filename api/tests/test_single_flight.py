@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from api.single_flight import SingleFlight
+
+
+def test_cancelling_the_first_caller_does_not_cancel_the_others():
+    """
+    The shared work belongs to the flight: the caller that started it can go away and everyone
+    else still gets the result, from a single run.
+    """
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def run():
+        flight = SingleFlight()
+        leader = asyncio.ensure_future(flight.run("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.run("k", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        result = await follower
+        return result, flight.in_flight("k")
+
+    assert asyncio.run(run()) == ("result", False)
+    assert calls == [1]
+
+
+def test_errors_reach_every_caller_and_the_key_is_freed():
+    """
+    A failure is shared like a result, and the next call for the key starts fresh work.
+    """
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def ok():
+        return "again"
+
+    async def run():
+        flight = SingleFlight()
+        results = await asyncio.gather(flight.run("k", fail), flight.run("k", fail), return_exceptions=True)
+        return results, await flight.run("k", ok)
+
+    results, again = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert again == "again"
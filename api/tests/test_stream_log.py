@@ -0,0 +1,130 @@
+import asyncio
+import re
+
+from api.stream_log import StreamLog
+
+
+def test_follow_replays_after_id_then_tails_live_events():
+    """
+    A follower gets the events after its Last-Event-ID, then new ones until the stream closes.
+    """
+    log = StreamLog("test")
+
+    async def run():
+        for i in range(3):
+            await log.append(None, "job-1", "progress", {"current": i})
+
+        async def produce():
+            await asyncio.sleep(0.01)
+            await log.append(None, "job-1", "complete", {"status": "done"})
+            await log.close(None, "job-1")
+
+        producer = asyncio.create_task(produce())
+        events = [event async for event in log.follow(None, "job-1", after=1)]
+        await producer
+        return events
+
+    events = asyncio.run(run())
+    assert [event["id"] for event in events] == [2, 3, 4]
+    assert events[-1]["type"] == "complete"
+
+
+def test_running_streams_are_never_evicted(monkeypatch):
+    """
+    A stream still being produced keeps counting ids from where it was, however many other streams
+    come and go; only finished streams compete for the local cache.
+    """
+    from api import stream_log
+    monkeypatch.setattr(stream_log, "STREAM_LOG_LOCAL_MAX_ENTRIES", 2)
+    log = StreamLog("test")
+
+    async def run():
+        await log.append(None, "long", "progress", {"current": 1})
+        for i in range(5):
+            await log.append(None, f"short-{i}", "complete", {})
+            await log.close(None, f"short-{i}")
+        event = await log.append(None, "long", "progress", {"current": 2})
+        return event, await log.read(None, "short-0")
+
+    event, evicted = asyncio.run(run())
+    assert event["id"] == 2
+    assert evicted is None
+
+
+def test_unknown_stream_has_no_log():
+    """
+    Reading a job that never streamed (or whose log expired) returns None.
+    """
+    assert asyncio.run(StreamLog("test").read(None, "missing")) is None
+
+
+def test_dropped_client_resumes_from_last_event_id(client, monkeypatch):
+    """
+    /jobs/{id}/stream replays only the events after Last-Event-ID, with their original ids.
+    """
+    async def fake_stream(text, context):
+        yield {"type": "clause", "data": {"id": "c1", "title": "Term"}}
+        yield {"type": "summary", "data": {"summary": "ok", "overallRisk": "low"}}
+        yield {"type": "complete", "data": {"status": "done"}}
+    monkeypatch.setattr("api.main.analyze_contract_stream", fake_stream)
+
+    response = client.post("/agent/run/stream", json={"projectId": "p", "input": {"text": "Resumable contract"}})
+    assert response.text.startswith("retry: ")
+    job_id = re.search(r'"jobId":\s*"([^"]+)"', response.text).group(1)
+
+    resumed = client.get(f"/jobs/{job_id}/stream", headers={"Last-Event-ID": "2"})
+    assert resumed.status_code == 200
+    assert "id: 1\n" not in resumed.text and "id: 2\n" not in resumed.text
+    assert "id: 3\nevent: summary" in resumed.text
+    assert "event: complete" in resumed.text
+
+    # Not in this worker's log and not in Redis
+    from api import main
+    main.redis.pipeline.return_value.execute.return_value = [[], None]
+    assert client.get("/jobs/unknown-job/stream").status_code == 404
+
+
+def test_many_viewers_share_one_producer():
+    """
+    Every follower of a job receives the full stream from the single producer.
+    """
+    log = StreamLog("test")
+
+    async def run():
+        await log.append(None, "job-2", "job", {"jobId": "job-2"})
+        viewers = [asyncio.create_task(collect(log.follow(None, "job-2"))) for _ in range(5)]
+        await asyncio.sleep(0)
+        for i in range(10):
+            await log.append(None, "job-2", "progress", {"current": i})
+        await log.close(None, "job-2")
+        return await asyncio.gather(*viewers)
+
+    for ids in asyncio.run(run()):
+        assert ids == list(range(1, 12))
+
+
+def test_slow_consumer_is_evicted_and_catches_up_from_log(monkeypatch):
+    """
+    A subscriber whose queue overflows is dropped from the hub, then re-syncs from the log without gaps.
+    """
+    monkeypatch.setattr("api.stream_hub.STREAM_SUBSCRIBER_QUEUE_SIZE", 2)
+    log = StreamLog("test")
+
+    async def run():
+        await log.append(None, "job-3", "job", {"jobId": "job-3"})
+        follower = log.follow(None, "job-3")
+        first = await follower.__anext__()
+        # The follower is subscribed but not reading while the producer races ahead
+        for i in range(10):
+            await log.append(None, "job-3", "progress", {"current": i})
+        await log.close(None, "job-3")
+        rest = [event["id"] async for event in follower]
+        return [first["id"]] + rest
+
+    assert asyncio.run(run()) == list(range(1, 12))
+    assert log.hub.evictions == 1
+    assert log.hub.stats()["subscribers"] == 0
+
+
+async def collect(events):
+    return [event["id"] async for event in events]
@@ -0,0 +1,50 @@
+import asyncio
+import json
+
+from api.streaming import SSE_HEARTBEAT, encode_sse_event, format_sse_event, sse_stream
+
+
+def test_event_encoding_with_and_without_orjson(monkeypatch):
+    """
+    Events carry optional retry/id fields and the same JSON whichever serializer is used.
+    """
+    data = {"title": "Résumé", "n": 1, "items": [1.5, None, True]}
+    frame = encode_sse_event("clause", data, event_id=7, retry_ms=3000)
+    assert frame.startswith(b"retry: 3000\nid: 7\nevent: clause\ndata: ")
+    assert frame.endswith(b"\n\n")
+
+    monkeypatch.setattr("api.streaming.orjson", None)
+    fallback = format_sse_event("clause", data, event_id=7, retry_ms=3000)
+    assert json.loads(fallback.split("data: ")[1]) == json.loads(frame.decode().split("data: ")[1]) == data
+
+
+def test_heartbeat_while_source_is_quiet():
+    """
+    A quiet source gets keep-alive comments without being cancelled.
+    """
+    async def source():
+        await asyncio.sleep(0.05)
+        yield encode_sse_event("complete", {"status": "done"})
+
+    async def run():
+        return [chunk async for chunk in sse_stream(source(), heartbeat_seconds=0.01)]
+
+    chunks = asyncio.run(run())
+    assert chunks[0] == SSE_HEARTBEAT
+    assert chunks[-1].startswith(b"event: complete")
+
+
+def test_frames_queued_behind_a_write_are_coalesced():
+    """
+    Frames that are already buffered, or arrive within the flush window, go out in one write.
+    """
+    async def source():
+        for i in range(5):
+            yield encode_sse_event("progress", {"current": i})
+
+    async def run():
+        return [chunk async for chunk in sse_stream(source(), coalesce_ms=50)]
+
+    chunks = asyncio.run(run())
+    assert len(chunks) == 1
+    assert chunks[0].count(b"event: progress") == 5
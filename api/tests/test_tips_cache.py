@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+from api import main
+from api.tips_cache import _local_cache, get_cached_tips, store_tips, tips_cache_key
+
+
+def test_tips_key_covers_prompt_inputs_and_normalizes_whitespace():
+    """
+    Whitespace variants of a clause share a key; a different type, risk or title does not.
+    """
+    key = tips_cache_key("p", "The  Supplier shall\n indemnify.", "Liability", "high", "Indemnity")
+    assert key == tips_cache_key("p", "The Supplier shall indemnify. ", "liability", "HIGH", " Indemnity ")
+    assert key != tips_cache_key("p", "The Supplier shall indemnify.", "ip", "high", "Indemnity")
+    assert key != tips_cache_key("p", "The Supplier shall indemnify.", "liability", "low", "Indemnity")
+    assert key != tips_cache_key("p", "The Supplier shall indemnify.", "liability", "high", "Other")
+
+
+def test_concurrent_misses_share_one_openai_call(monkeypatch):
+    """
+    Identical tips requests arriving together make a single OpenAI call and get the same result.
+    """
+    calls = []
+
+    async def fake_tips(**kwargs):
+        calls.append(kwargs)
+        await asyncio.sleep(0.05)
+        return {"tips": [{"title": "Cap it"}]}
+    monkeypatch.setattr("api.main.generate_negotiation_tips", fake_tips)
+
+    body = main.NegotiationTipsRequest(clauseText="Unlimited liability.", clauseType="liability", riskLevel="high")
+    key = tips_cache_key("test-coalesce", body.clauseText, body.clauseType, body.riskLevel)
+
+    async def run():
+        return await asyncio.gather(*(main.generate_tips_once(key, body) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(result == {"tips": [{"title": "Cap it"}]} for result in results)
+
+
+def test_stale_tips_are_served_while_refreshing(monkeypatch):
+    """
+    A stale entry is returned immediately and replaced by one background refresh.
+    """
+    monkeypatch.setattr("api.main.redis", None)
+
+    async def fake_tips(**kwargs):
+        return {"tips": [{"title": "Fresh"}]}
+    monkeypatch.setattr("api.main.generate_negotiation_tips", fake_tips)
+
+    body = main.NegotiationTipsRequest(clauseText="Net 90 payment.", clauseType="payment", riskLevel="medium")
+    key = tips_cache_key(main.PREFIX, body.clauseText, body.clauseType, body.riskLevel)
+    _local_cache.set(key, {"storedAt": time.time() - 10 ** 6, "result": {"tips": [{"title": "Old"}]}}, 60)
+
+    async def run():
+        served = await main.get_negotiation_tips(body, request=None)
+        await asyncio.gather(*main.tips_refresh_tasks)
+        return served, await get_cached_tips(None, key)
+
+    served, refreshed = asyncio.run(run())
+    assert served["tips"][0]["title"] == "Old"
+    assert refreshed == ({"tips": [{"title": "Fresh"}]}, False)
+
+
+def test_request_joining_a_yielded_refresh_waits_for_the_other_worker(monkeypatch):
+    """
+    A request that joins a background refresh which gave way to another worker's lock waits for
+    that worker's tips instead of making its own OpenAI call.
+    """
+    calls = []
+
+    async def fake_tips(**kwargs):
+        calls.append(kwargs)
+        return {"tips": [{"title": "Ours"}]}
+    monkeypatch.setattr("api.main.generate_negotiation_tips", fake_tips)
+
+    body = main.NegotiationTipsRequest(clauseText="Auto renewal.", clauseType="term", riskLevel="medium")
+    key = tips_cache_key(main.PREFIX, body.clauseText, body.clauseType, body.riskLevel)
+    store = {f"{key}:lock": "other-worker"}
+
+    async def fake_set(k, value, nx=False, ex=None, **kwargs):
+        if nx and k in store:
+            return None
+        store[k] = value
+        return True
+
+    async def fake_get(k):
+        return store.get(k)
+    main.redis.set.side_effect = fake_set
+    main.redis.get.side_effect = fake_get
+    monkeypatch.setattr("api.main.TIPS_LOCK_POLL_SECONDS", 0.01)
+
+    async def other_worker_finishes():
+        await asyncio.sleep(0.05)
+        await store_tips(main.redis, key, {"tips": [{"title": "Theirs"}]})
+        del store[f"{key}:lock"]
+
+    async def run():
+        refresh = asyncio.ensure_future(main.generate_tips_once(key, body, wait=False))
+        await asyncio.sleep(0)
+        other = asyncio.ensure_future(other_worker_finishes())
+        served = await main.get_negotiation_tips(body, request=None)
+        await asyncio.gather(refresh, other)
+        return served
+
+    assert asyncio.run(run()) == {"tips": [{"title": "Theirs"}]}
+    assert calls == []
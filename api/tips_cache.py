@@ -0,0 +1,80 @@
+# Cache of negotiation tips, keyed by everything that goes into the tips prompt
+# Entries stay servable for a while after they go stale so a refresh never makes a user wait on OpenAI
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from api.analysis_cache import normalize_contract_text
+    from api.local_cache import LocalTTLCache
+    from api.openai_adapter import TIPS_MODEL, TIPS_PROMPT_VERSION
+except ImportError:
+    from analysis_cache import normalize_contract_text
+    from local_cache import LocalTTLCache
+    from openai_adapter import TIPS_MODEL, TIPS_PROMPT_VERSION
+
+# Tips younger than this are served as-is
+TIPS_CACHE_FRESH_SECONDS = int(os.getenv("TIPS_CACHE_FRESH_SECONDS", "3600"))
+# After that they are still served for this long while one background call refreshes them
+TIPS_CACHE_STALE_SECONDS = int(os.getenv("TIPS_CACHE_STALE_SECONDS", "604800"))
+# Cross-worker lock so only one worker calls OpenAI for the same tips key at a time
+TIPS_LOCK_TTL_SECONDS = int(os.getenv("TIPS_LOCK_TTL_SECONDS", "60"))
+TIPS_LOCK_POLL_SECONDS = float(os.getenv("TIPS_LOCK_POLL_SECONDS", "0.5"))
+
+# Used when Redis isn't configured (local dev); holds the same entries as Redis
+_local_cache = LocalTTLCache(max_entries=500)
+
+
+def tips_cache_key(
+    prefix: str,
+    clause_text: str,
+    clause_type: str,
+    risk_level: str,
+    clause_title: Optional[str] = None,
+    context: Optional[str] = None,
+) -> str:
+    """Cache key from normalized clause text, the other prompt inputs, model and prompt version"""
+    fingerprint = json.dumps({
+        "text": normalize_contract_text(clause_text),
+        "type": clause_type.strip().lower(),
+        "risk": risk_level.strip().lower(),
+        "title": " ".join((clause_title or "").split()),
+        "context": " ".join((context or "").split()),
+        "model": TIPS_MODEL,
+        "prompt": TIPS_PROMPT_VERSION,
+    }, sort_keys=True)
+    digest = hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+    return f"{prefix}:cache:tips:{digest}"
+
+
+async def get_cached_tips(redis, key: str) -> Optional[Tuple[Dict[str, Any], bool]]:
+    """Return (tips result, is_stale), or None on a miss (cache errors count as a miss)"""
+    if not redis:
+        entry = _local_cache.get(key)
+    else:
+        try:
+            cached = await redis.get(key)
+            entry = json.loads(cached) if isinstance(cached, str) else cached
+        except Exception as e:
+            print(f"Tips cache read failed: {e}")
+            return None
+    if not isinstance(entry, dict) or not entry.get("result"):
+        return None
+    return entry["result"], time.time() - entry.get("storedAt", 0) > TIPS_CACHE_FRESH_SECONDS
+
+
+async def store_tips(redis, key: str, result: Dict[str, Any]):
+    """Cache a successful tips result; failed or empty generations are never cached"""
+    if not result or result.get("error") or not result.get("tips"):
+        return
+    entry = {"storedAt": time.time(), "result": result}
+    ttl = TIPS_CACHE_FRESH_SECONDS + TIPS_CACHE_STALE_SECONDS
+    if not redis:
+        _local_cache.set(key, entry, ttl)
+        return
+    try:
+        await redis.set(key, json.dumps(entry), ex=ttl)
+    except Exception as e:
+        print(f"Tips cache write failed: {e}")
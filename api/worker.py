@@ -0,0 +1,128 @@
+# Standalone job worker: python -m api.worker (or `python worker.py` from /api)
+# Claims queued jobs from the jobs table and runs them, independently of the web process
+import asyncio
+import os
+import signal
+import socket
+import uuid
+from typing import Any, Dict
+
+try:
+    from api.main import AgentInput, fail_job, process_contract_analysis, load_job_credentials
+    from api.job_queue import claim_jobs, heartbeat_jobs, JOB_VISIBILITY_TIMEOUT_SECONDS
+    from api.openai_adapter import close_openai_client
+    from api.extraction import shutdown_extraction_pool
+    from api.db_helper import init_async_db_pool, close_async_db_pool, start_write_behind, stop_write_behind
+except ImportError:
+    from main import AgentInput, fail_job, process_contract_analysis, load_job_credentials
+    from job_queue import claim_jobs, heartbeat_jobs, JOB_VISIBILITY_TIMEOUT_SECONDS
+    from openai_adapter import close_openai_client
+    from extraction import shutdown_extraction_pool
+    from db_helper import init_async_db_pool, close_async_db_pool, start_write_behind, stop_write_behind
+
+# Jobs this worker runs at once
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "4"))
+# Idle wait between claim attempts when the queue is empty
+WORKER_POLL_INTERVAL_SECONDS = float(os.getenv("WORKER_POLL_INTERVAL_SECONDS", "1"))
+# Must stay well under JOB_VISIBILITY_TIMEOUT_SECONDS so live jobs are never re-claimed
+WORKER_HEARTBEAT_SECONDS = float(os.getenv("WORKER_HEARTBEAT_SECONDS", str(JOB_VISIBILITY_TIMEOUT_SECONDS / 4)))
+# On shutdown, how long running jobs get to finish before they are left for another worker
+WORKER_SHUTDOWN_GRACE_SECONDS = float(os.getenv("WORKER_SHUTDOWN_GRACE_SECONDS", "30"))
+
+
+async def run_job(job: Dict[str, Any]):
+    """Run one claimed job"""
+    job_id = job["id"]
+
+    # Re-claimed after its worker died too many times: give up instead of looping forever
+    if job["attempts"] > job["max_attempts"]:
+        # Redis and the status cache too, or GET /jobs/{id} keeps showing the last "running" state
+        await fail_job(job_id, "Job abandoned: worker stopped responding on every attempt")
+        return
+
+    input_data = AgentInput(**(job.get("payload") or {}))
+    if input_data.driveFileId:
+        input_data.accessToken = await load_job_credentials(job_id)
+
+    await process_contract_analysis(
+        job_id,
+        job["project_id"],
+        input_data,
+        attempt=job["attempts"],
+        max_attempts=job["max_attempts"]
+    )
+
+
+async def run_worker(concurrency: int = WORKER_CONCURRENCY, stop: asyncio.Event = None):
+    """Claim and run jobs until `stop` is set (or the task is cancelled)"""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    stop = stop or asyncio.Event()
+    running: Dict[str, asyncio.Task] = {}
+    slot_freed = asyncio.Event()
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(WORKER_HEARTBEAT_SECONDS)
+            try:
+                await heartbeat_jobs(worker_id, list(running))
+            except Exception as e:
+                print(f"Worker heartbeat failed: {e}")
+
+    def on_done(job_id: str):
+        running.pop(job_id, None)
+        slot_freed.set()
+
+    print(f"Worker {worker_id} started (concurrency {concurrency})")
+    heartbeat_task = asyncio.create_task(heartbeat())
+    try:
+        while not stop.is_set():
+            slot_freed.clear()
+            claimed = []
+            free_slots = concurrency - len(running)
+            if free_slots > 0:
+                try:
+                    claimed = await claim_jobs(worker_id, free_slots)
+                except Exception as e:
+                    print(f"Worker claim failed: {e}")
+
+            for job in claimed:
+                task = asyncio.create_task(run_job(job))
+                running[job["id"]] = task
+                task.add_done_callback(lambda _, job_id=job["id"]: on_done(job_id))
+
+            # Queue drained or all slots busy: wait for a slot, the poll interval, or shutdown
+            if not claimed or len(running) >= concurrency:
+                waiters = [asyncio.create_task(slot_freed.wait()), asyncio.create_task(stop.wait())]
+                await asyncio.wait(waiters, timeout=WORKER_POLL_INTERVAL_SECONDS, return_when=asyncio.FIRST_COMPLETED)
+                for waiter in waiters:
+                    waiter.cancel()
+    finally:
+        if running:
+            print(f"Worker {worker_id} waiting for {len(running)} running job(s)")
+            await asyncio.wait(list(running.values()), timeout=WORKER_SHUTDOWN_GRACE_SECONDS)
+        # Unfinished jobs keep their lease until the visibility timeout, then another worker takes them
+        heartbeat_task.cancel()
+        print(f"Worker {worker_id} stopped")
+
+
+def main():
+    async def serve():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await init_async_db_pool()
+        start_write_behind()
+        try:
+            await run_worker(stop=stop)
+        finally:
+            await close_openai_client()
+            await stop_write_behind()
+            await close_async_db_pool()
+            shutdown_extraction_pool()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
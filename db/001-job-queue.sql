@@ -0,0 +1,18 @@
+-- /db/001-job-queue.sql
+
+-- Durable job queue on top of contractcoach.jobs.
+-- Workers claim queued jobs with SELECT ... FOR UPDATE SKIP LOCKED, keep them alive with
+-- heartbeats, and a job whose heartbeat goes stale (worker crashed or was redeployed)
+-- becomes claimable again after the visibility timeout.
+
+alter table contractcoach.jobs
+  add column if not exists attempts int not null default 0,
+  add column if not exists max_attempts int not null default 3,
+  add column if not exists run_at timestamptz not null default now(),
+  add column if not exists locked_by text,
+  add column if not exists heartbeat_at timestamptz,
+  add column if not exists last_error text;
+
+-- Claim scans: due queued jobs, and running jobs whose heartbeat has gone stale
+create index if not exists idx_jobs_queued_run_at on contractcoach.jobs(run_at) where status = 'queued';
+create index if not exists idx_jobs_running_heartbeat on contractcoach.jobs(heartbeat_at) where status = 'running';
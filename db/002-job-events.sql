@@ -0,0 +1,42 @@
+-- /db/002-job-events.sql
+
+-- Push job status transitions to listeners instead of having clients poll GET /jobs/{id}.
+-- Every status change bumps jobs.version and sends a NOTIFY on contractcoach_job_events;
+-- the API LISTENs on that channel and forwards transitions to /jobs/{id}/events subscribers.
+
+alter table contractcoach.jobs
+  add column if not exists version int not null default 0;
+
+create or replace function contractcoach.jobs_bump_version() returns trigger as $$
+begin
+  if tg_op = 'INSERT' then
+    new.version := 1;
+  elsif new.status is distinct from old.status then
+    new.version := old.version + 1;
+  end if;
+  return new;
+end;
+$$ language plpgsql;
+
+create or replace function contractcoach.jobs_notify_status() returns trigger as $$
+begin
+  if tg_op = 'INSERT' or new.status is distinct from old.status then
+    -- Keep the payload small (NOTIFY caps it at 8000 bytes); listeners load the result themselves
+    perform pg_notify(
+      'contractcoach_job_events',
+      json_build_object('id', new.id, 'status', new.status, 'version', new.version)::text
+    );
+  end if;
+  return null;
+end;
+$$ language plpgsql;
+
+drop trigger if exists jobs_bump_version on contractcoach.jobs;
+create trigger jobs_bump_version
+  before insert or update on contractcoach.jobs
+  for each row execute function contractcoach.jobs_bump_version();
+
+drop trigger if exists jobs_notify_status on contractcoach.jobs;
+create trigger jobs_notify_status
+  after insert or update on contractcoach.jobs
+  for each row execute function contractcoach.jobs_notify_status();
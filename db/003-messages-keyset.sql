@@ -0,0 +1,14 @@
+-- /db/003-messages-keyset.sql
+
+-- Keyset pagination for GET /messages (?before=<created_at>,<id>).
+-- The index matches WHERE project_id = $1 [AND (created_at, id) < ($2, $3)]
+-- ORDER BY created_at DESC, id DESC LIMIT n, so every page is a short index range scan
+-- with no sort, however deep the history goes. id is the tie-breaker for equal timestamps,
+-- and is DESC (not ASC) so the row comparison walks the index in a single direction.
+-- Message bodies are deliberately not INCLUDEd: content can be large, and that would bloat
+-- the index and break inserts over the btree row size limit.
+create index if not exists idx_messages_project_created_id
+  on contractcoach.messages(project_id, created_at desc, id desc);
+
+-- The composite index has project_id as its leading column, so this one is redundant
+drop index if exists contractcoach.idx_messages_project_id;
@@ -0,0 +1,29 @@
+-- /db/004-clauses.sql
+
+-- One row per analyzed clause, written in the same transaction that completes the job
+-- (jobs.result keeps the full JSON for replay). Lets questions like "all high-risk
+-- indemnification clauses in this project" be answered with an index scan in SQL
+-- instead of loading and parsing every job's result blob.
+
+create table if not exists contractcoach.clauses (
+  id uuid primary key default gen_random_uuid(),
+  job_id uuid not null references contractcoach.jobs(id) on delete cascade,
+  project_id text not null,
+  position int not null,           -- order within the analysis
+  clause_key text,                 -- the model's clause id
+  type text not null,              -- lowercased: payment, ip, confidentiality, termination, liability, ...
+  risk text not null,              -- low | medium | high
+  title text,
+  original_text text,
+  summary text,
+  why_it_matters text,
+  suggested_edit text,
+  text_hash text,                  -- sha256 of the normalized original text; same clause across contracts
+  created_at timestamptz not null default now(),
+  unique (job_id, position)
+);
+
+-- Filters: project + type [+ risk], project + risk, and recurring text within a project
+create index if not exists idx_clauses_project_type_risk on contractcoach.clauses(project_id, type, risk);
+create index if not exists idx_clauses_project_risk on contractcoach.clauses(project_id, risk);
+create index if not exists idx_clauses_project_text_hash on contractcoach.clauses(project_id, text_hash);
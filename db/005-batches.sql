@@ -0,0 +1,19 @@
+-- /db/005-batches.sql
+
+-- Batch submission (POST /agent/run/batch): one row per batch, and the batch's jobs point at it.
+-- Workers never run more than max_concurrency jobs of one batch at a time (see claim_jobs in
+-- api/job_queue.py), so a 500-contract upload doesn't monopolize every worker slot.
+
+create table if not exists contractcoach.batches (
+  id uuid primary key default gen_random_uuid(),
+  project_id text not null,
+  total int not null,
+  max_concurrency int not null,
+  created_at timestamptz not null default now()
+);
+
+alter table contractcoach.jobs
+  add column if not exists batch_id uuid references contractcoach.batches(id) on delete cascade;
+
+-- GET /batches/{id} counts a batch's jobs by status, and claim_jobs counts its running jobs
+create index if not exists idx_jobs_batch_status on contractcoach.jobs(batch_id, status) where batch_id is not null;
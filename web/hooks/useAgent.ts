@@ -37,20 +37,25 @@ export function useAgent(projectId: string) {
 
       const { jobId } = await res.json();
 
+      // Long-poll: each request is held until the job's version moves past `since`
       let result: AgentResult | null = null;
-      for (let i = 0; i < 40; i++) {
-        const jr = await fetch(`/api/jobs/${jobId}`);
+      let version = -1;
+      const deadline = Date.now() + 5 * 60 * 1000;
+      while (Date.now() < deadline) {
+        const jr = await fetch(`/api/jobs/${jobId}/events?since=${version}&timeout=25`);
         if (!jr.ok) {
           throw new Error(`Job poll failed with status ${jr.status}`);
         }
         const data = await jr.json();
+        version = data.version;
 
         if (data.status === "done") {
           result = data.result;
           break;
         }
-
-        await new Promise((resolve) => setTimeout(resolve, 800));
+        if (data.status === "error") {
+          throw new Error(data.error ?? data.result?.error ?? "Analysis failed");
+        }
       }
 
       if (!result) {
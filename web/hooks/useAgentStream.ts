@@ -31,6 +31,9 @@ export interface StreamingResult {
   overallRisk: "low" | "medium" | "high" | null;
 }
 
+// Reconnects after a dropped connection before giving up (the analysis keeps running server-side)
+const MAX_RESUME_ATTEMPTS = 3;
+
 export interface UseAgentStreamOptions {
   onClause?: (clause: Clause) => void;
   onProgress?: (current: number, total: number) => void;
@@ -52,6 +55,10 @@ export function useAgentStream(projectId: string, options?: UseAgentStreamOption
   const [error, setError] = useState<string | null>(null);
   
   const abortControllerRef = useRef<AbortController | null>(null);
+  // Resume position: job id plus the id of the last event received
+  const jobIdRef = useRef<string | null>(null);
+  const lastEventIdRef = useRef<string | null>(null);
+  const finishedRef = useRef(false);
 
   const reset = useCallback(() => {
     setClauses([]);
@@ -86,6 +93,9 @@ export function useAgentStream(projectId: string, options?: UseAgentStreamOption
   }) => {
     // Reset state
     reset();
+    jobIdRef.current = null;
+    lastEventIdRef.current = null;
+    finishedRef.current = false;
     
     // Create abort controller
     abortControllerRef.current = new AbortController();
@@ -96,21 +106,7 @@ export function useAgentStream(projectId: string, options?: UseAgentStreamOption
       progress: { current: 0, total: 0 },
     });
 
-    try {
-      const response = await fetch("/api/agent/run/stream", {
-        method: "POST",
-        headers: { 
-          "Content-Type": "application/json",
-          "Accept": "text/event-stream",
-        },
-        body: JSON.stringify({ projectId, input }),
-        signal: abortControllerRef.current.signal,
-      });
-
-      if (!response.ok) {
-        throw new Error(`Request failed with status ${response.status}`);
-      }
-
+    const readEvents = async (response: Response) => {
       if (!response.body) {
         throw new Error("No response body");
       }
@@ -118,6 +114,7 @@ export function useAgentStream(projectId: string, options?: UseAgentStreamOption
       const reader = response.body.getReader();
       const decoder = new TextDecoder();
       let buffer = "";
+      let currentEventType = "";
 
       while (true) {
         const { done, value } = await reader.read();
@@ -132,19 +129,23 @@ export function useAgentStream(projectId: string, options?: UseAgentStreamOption
         const lines = buffer.split("\n");
         buffer = lines.pop() || ""; // Keep incomplete line in buffer
 
-        let currentEventType = "";
-        let currentEventData = "";
-
         for (const line of lines) {
-          if (line.startsWith("event: ")) {
+          if (line.startsWith("id: ")) {
+            lastEventIdRef.current = line.slice(4).trim();
+          } else if (line.startsWith("event: ")) {
             currentEventType = line.slice(7).trim();
           } else if (line.startsWith("data: ")) {
-            currentEventData = line.slice(6).trim();
+            const currentEventData = line.slice(6).trim();
             
             // Process the event
             if (currentEventType && currentEventData) {
               try {
                 const data = JSON.parse(currentEventData);
+                if (currentEventType === "job") {
+                  jobIdRef.current = data.jobId;
+                } else if (currentEventType === "complete" || currentEventType === "error") {
+                  finishedRef.current = true;
+                }
                 handleEvent(currentEventType, data);
               } catch (e) {
                 console.error("Failed to parse SSE data:", currentEventData);
@@ -152,10 +153,54 @@ export function useAgentStream(projectId: string, options?: UseAgentStreamOption
             }
             
             currentEventType = "";
-            currentEventData = "";
           }
         }
       }
+    };
+
+    try {
+      const response = await fetch("/api/agent/run/stream", {
+        method: "POST",
+        headers: { 
+          "Content-Type": "application/json",
+          "Accept": "text/event-stream",
+        },
+        body: JSON.stringify({ projectId, input }),
+        signal: abortControllerRef.current.signal,
+      });
+
+      if (response.status === 429) {
+        const retryAfter = response.headers.get("Retry-After");
+        throw new Error(`Rate limit exceeded${retryAfter ? `, try again in ${retryAfter}s` : ""}`);
+      }
+
+      if (!response.ok) {
+        throw new Error(`Request failed with status ${response.status}`);
+      }
+
+      // A dropped connection doesn't stop the analysis: pick the stream up after the last event seen
+      let stream = response;
+      for (let attempt = 0; ; attempt++) {
+        try {
+          if (attempt > 0) {
+            stream = await fetch(`/api/jobs/${jobIdRef.current}/stream?after=${lastEventIdRef.current ?? 0}`, {
+              headers: { "Accept": "text/event-stream" },
+              signal: abortControllerRef.current?.signal,
+            });
+            if (!stream.ok) {
+              throw new Error(`Resume failed with status ${stream.status}`);
+            }
+          }
+          await readEvents(stream);
+          break;
+        } catch (err: any) {
+          if (err?.name === "AbortError" || !jobIdRef.current || finishedRef.current || attempt >= MAX_RESUME_ATTEMPTS) {
+            throw err;
+          }
+          setStreamingState(prev => ({ ...prev, message: "Connection lost, reconnecting..." }));
+          await new Promise(resolve => setTimeout(resolve, 1000 * (attempt + 1)));
+        }
+      }
 
       // Final state update
       setStreamingState(prev => ({